@@ -0,0 +1,57 @@
+#!/usr/bin/env -S uv run
+# /// script
+# requires-python = ">=3.10"
+# dependencies = [
+#     "capsula",
+#     "rich",
+#     "typer",
+# ]
+#
+# [tool.uv.sources]
+# capsula = { path = "..", editable = true }
+# ///
+
+import timeit
+from collections.abc import Hashable, Sequence
+from functools import partial
+from typing import Any, NoReturn
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from capsula._utils import to_flat_dict, to_nested_dict
+
+
+def make_flat_dict(n_records: int, depth: int, fanout: int) -> dict[Sequence[Hashable], Any]:
+    """Make a flat dictionary like a capsule with `n_records` records whose keys have `depth` components."""
+    return {
+        (*(f"level{level}_{(i // fanout**level) % fanout}" for level in range(depth - 1)), f"record{i}"): float(i)
+        for i in range(n_records)
+    }
+
+
+def main(
+    n_records: list[int] = typer.Option([1_000, 10_000, 100_000], help="Numbers of records."),  # noqa: B008
+    depth: list[int] = typer.Option([1, 4, 16], help="Numbers of components of the keys."),  # noqa: B008
+    fanout: int = typer.Option(8, help="Number of children of each intermediate key."),
+    repeat: int = typer.Option(5, help="Number of repetitions. The best time is reported."),
+) -> NoReturn:
+    table = Table("records", "depth", "to_nested_dict [ms]", "to_flat_dict [ms]")
+    for n in n_records:
+        for d in depth:
+            flat_dict = make_flat_dict(n, d, fanout)
+            nested_dict = to_nested_dict(flat_dict)
+            assert to_flat_dict(nested_dict) == flat_dict
+
+            number = max(1, 100_000 // n)
+            nested_time = min(timeit.repeat(partial(to_nested_dict, flat_dict), number=number, repeat=repeat)) / number
+            flat_time = min(timeit.repeat(partial(to_flat_dict, nested_dict), number=number, repeat=repeat)) / number
+            table.add_row(str(n), str(d), f"{nested_time * 1e3:.2f}", f"{flat_time * 1e3:.2f}")
+
+    Console().print(table)
+    raise typer.Exit(0)
+
+
+if __name__ == "__main__":
+    typer.run(main)
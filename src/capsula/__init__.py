@@ -1,4 +1,5 @@
 __all__ = [
+    "ArtifactWatcher",
     "CapsulaConfigurationError",
     "CapsulaError",
     "CapsulaUninitializedError",
@@ -16,21 +17,42 @@ __all__ = [
     "FunctionContext",
     "GitRepositoryContext",
     "JsonDumpReporter",
+    "JsonLinesReporter",
+    "MsgpackReporter",
+    "PackagesContext",
     "PlatformContext",
     "ReporterBase",
     "Run",
+    "Session",
+    "SharedPreRun",
     "SlackReporter",
+    "Stage",
+    "StageResult",
+    "SweepResult",
     "TimeWatcher",
     "UncaughtExceptionWatcher",
     "WatcherBase",
     "__version__",
     "context",
     "current_run_name",
+    "export_runs",
+    "find_run_dir",
+    "grid_points",
+    "group_runs_by_environment",
+    "is_run_complete",
+    "iter_run_dirs",
+    "load_report",
     "pass_pre_run_capsule",
+    "random_points",
     "record",
     "reporter",
     "run",
+    "run_pipeline",
     "search_for_project_root",
+    "session",
+    "sweep",
+    "ulid_run_name_factory",
+    "verify_digests",
     "watcher",
 ]
 from ._capsule import Capsule
@@ -43,14 +65,27 @@ from ._context import (
     FileContext,
     FunctionContext,
     GitRepositoryContext,
+    PackagesContext,
     PlatformContext,
 )
 from ._decorator import context, pass_pre_run_capsule, reporter, run, watcher
 from ._encapsulator import Encapsulator
 from ._exceptions import CapsulaConfigurationError, CapsulaError, CapsulaUninitializedError
-from ._reporter import JsonDumpReporter, ReporterBase, SlackReporter
+from ._export import export_runs
+from ._pipeline import Stage, StageResult, run_pipeline
+from ._reporter import (
+    JsonDumpReporter,
+    JsonLinesReporter,
+    MsgpackReporter,
+    ReporterBase,
+    SlackReporter,
+    load_report,
+)
 from ._root import current_run_name, record
-from ._run import CapsuleParams, CommandInfo, FuncInfo, Run
-from ._utils import search_for_project_root
+from ._run import CapsuleParams, CommandInfo, FuncInfo, Run, SharedPreRun, ulid_run_name_factory
+from ._session import Session, session
+from ._sweep import SweepResult, grid_points, random_points, sweep
+from ._utils import search_for_project_root, verify_digests
+from ._vault import find_run_dir, group_runs_by_environment, is_run_complete, iter_run_dirs
 from ._version import __version__
-from ._watcher import TimeWatcher, UncaughtExceptionWatcher, WatcherBase
+from ._watcher import ArtifactWatcher, TimeWatcher, UncaughtExceptionWatcher, WatcherBase
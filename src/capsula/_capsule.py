@@ -27,6 +27,24 @@ class Capsule:
         self.fails = dict(fails)
 
 
+class LazyCapsule(Capsule):
+    """Capsule whose data is resolved on the first access, e.g., after the contexts encapsulated in the background."""
+
+    def __init__(self, resolve: Callable[[], Capsule]) -> None:
+        self._resolve = resolve
+
+    def resolve(self) -> Capsule:
+        return self._resolve()
+
+    @property
+    def data(self) -> dict[_ContextKey, Any]:  # type: ignore[override]
+        return self.resolve().data
+
+    @property
+    def fails(self) -> dict[_ContextKey, ExceptionInfo]:  # type: ignore[override]
+        return self.resolve().fails
+
+
 class CapsuleItem(ABC):
     @property
     @abstractmethod
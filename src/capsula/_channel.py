@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import shutil
+import socket
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import orjson
+
+from ._reporter._json import default_preset
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, MutableMapping
+
+    from typing_extensions import Self
+
+    from ._encapsulator import _CapsuleItemKey
+
+logger = logging.getLogger(__name__)
+
+RECORD_SOCKET_ENV_VAR = "CAPSULA_RECORD_SOCKET"
+
+# Maximum length of the path of a Unix domain socket is 104 or 108 bytes depending on the platform
+_MAX_SOCKET_PATH_LENGTH = 100
+_RECV_SIZE = 65536
+
+
+def _decode_key(key: Any) -> _CapsuleItemKey:
+    if isinstance(key, str):
+        return key
+    if isinstance(key, list) and key and all(isinstance(k, str) for k in key):
+        return tuple(key)
+    msg = f"Key must be a string or a non-empty list of strings, not {key!r}."
+    raise TypeError(msg)
+
+
+class RecordServer:
+    """Server to receive records from child processes over a Unix domain socket.
+
+    Each record is a line of JSON in the form `{"key": "name", "value": ...}`,
+    where `key` can also be a list of strings for a nested key.
+    While the server is active, the path of the socket is set to the `CAPSULA_RECORD_SOCKET` environment variable
+    in `env`, which defaults to the environment variables of the process inherited by child processes.
+    Pass the mapping given to a subprocess as `env` instead when several servers are active concurrently,
+    since they would otherwise overwrite the environment variable of each other.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        on_record: Callable[[_CapsuleItemKey, Any], None],
+        *,
+        env: MutableMapping[str, str] | None = None,
+    ) -> None:
+        self._tmp_dir: Path | None = None
+        if len(os.fsencode(path)) > _MAX_SOCKET_PATH_LENGTH:
+            self._tmp_dir = Path(tempfile.mkdtemp(prefix="capsula-"))
+            path = self._tmp_dir / path.name
+        self._path = path
+        self._on_record = on_record
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._listener: socket.socket | None = None
+        self._env: MutableMapping[str, str] = os.environ if env is None else env
+        self._previous_env_var: str | None = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def __enter__(self) -> Self:
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(str(self._path))
+        self._listener.listen()
+        self._listener.setblocking(False)  # noqa: FBT003
+        self._thread = threading.Thread(target=self._serve, name="capsula-record-server", daemon=True)
+        self._thread.start()
+        self._previous_env_var = self._env.get(RECORD_SOCKET_ENV_VAR)
+        self._env[RECORD_SOCKET_ENV_VAR] = str(self._path)
+        logger.debug(f"Record server listening on {self._path}")
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        if self._previous_env_var is None:
+            self._env.pop(RECORD_SOCKET_ENV_VAR, None)
+        else:
+            self._env[RECORD_SOCKET_ENV_VAR] = self._previous_env_var
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._listener is not None:
+            self._listener.close()
+        self._path.unlink(missing_ok=True)
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def _handle_line(self, line: bytes) -> None:
+        if not line.strip():
+            return
+        try:
+            message = orjson.loads(line)
+            self._on_record(_decode_key(message["key"]), message.get("value"))
+        except Exception:
+            logger.exception(f"Failed to handle a record received on {self._path}: {line!r}")
+
+    def _serve(self) -> None:
+        assert self._listener is not None
+        buffers: dict[socket.socket, bytearray] = {}
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._listener, selectors.EVENT_READ)
+
+            def poll(timeout: float) -> bool:
+                events = selector.select(timeout)
+                for key, _ in events:
+                    sock: socket.socket = key.fileobj  # type: ignore[assignment]
+                    if sock is self._listener:
+                        conn, _ = sock.accept()
+                        conn.setblocking(False)  # noqa: FBT003
+                        selector.register(conn, selectors.EVENT_READ)
+                        buffers[conn] = bytearray()
+                        continue
+                    data = sock.recv(_RECV_SIZE)
+                    buffer = buffers[sock]
+                    if not data:
+                        self._handle_line(bytes(buffer))
+                        selector.unregister(sock)
+                        sock.close()
+                        del buffers[sock]
+                        continue
+                    buffer += data
+                    *lines, rest = buffer.split(b"\n")
+                    for line in lines:
+                        self._handle_line(bytes(line))
+                    buffers[sock] = bytearray(rest)
+                return bool(events)
+
+            while not self._stop.is_set():
+                poll(0.05)
+            # Drain the data that has already arrived
+            while poll(0):
+                pass
+            for sock, buffer in buffers.items():
+                self._handle_line(bytes(buffer))
+                sock.close()
+
+
+_client_lock = threading.Lock()
+_client: tuple[int, str, socket.socket] | None = None
+
+
+def send_record(path: str, key: _CapsuleItemKey, value: Any) -> None:
+    """Send a record to the record server listening on `path`.
+
+    The connection is kept open and reused for subsequent records from the same process.
+    """
+    global _client  # noqa: PLW0603
+    line = orjson.dumps({"key": key, "value": value}, default=default_preset) + b"\n"
+    with _client_lock:
+        if _client is not None and _client[0] == os.getpid() and _client[1] == path:
+            try:
+                _client[2].sendall(line)
+            except OSError:
+                # The connection may have been closed by the server; reconnect below
+                _client[2].close()
+            else:
+                return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        _client = (os.getpid(), path, sock)
+        sock.sendall(line)
@@ -1,41 +1,127 @@
 from __future__ import annotations
 
 import logging
+import os
+import re
 import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime, timezone
 from enum import Enum
+from functools import partial
 from pathlib import Path
 from random import choices
 from string import ascii_letters, digits
-from typing import Annotated, Any, Literal, NoReturn
+from typing import TYPE_CHECKING, Annotated, Any, Literal, NoReturn
 
+import orjson
 import typer
 from rich.console import Console
+from rich.table import Table
 
 import capsula
 
+from . import _client
+from ._channel import RECORD_SOCKET_ENV_VAR, send_record
+from ._client import DAEMON_SOCKET_ENV_VAR
 from ._config import load_config
 from ._context import ContextBase
+from ._daemon import CapsulaDaemon
+from ._export import export_runs
 from ._run import (
+    RUN_NAME_FACTORIES,
     CapsuleParams,
+    CommandInfo,
     Run,
     RunDtoCommand,
     default_run_name_factory,
     get_default_vault_dir,
     get_project_root,
 )
+from ._sweep import grid_points, random_points
 from ._utils import get_default_config_path, search_for_project_root
+from ._vault import get_run_dir, record_vault_layout, validate_vault_layout
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
 
 logger = logging.getLogger(__name__)
 
+FINALIZE_LOG_NAME = "finalize.log"
+
 app = typer.Typer()
 console = Console()
 err_console = Console(stderr=True)
 
 
+class _VaultLayout(str, Enum):
+    flat = "flat"
+    date = "date"
+    hash = "hash"
+
+
+def _build_command_run_dto(  # noqa: C901
+    command: tuple[str, ...],
+    *,
+    run_name: str | None,
+    vault_dir: Path | None,
+    vault_layout: _VaultLayout | None,
+    record_channel: bool | None,
+    ignore_config: bool,
+    config_path: Path | None,
+) -> RunDtoCommand:
+    run_dto = RunDtoCommand(
+        run_name_factory=default_run_name_factory if run_name is None else lambda _x, _y, _z: run_name,
+        vault_dir=vault_dir,
+        command=command,
+    )
+    if vault_layout is not None:
+        run_dto.vault_layout = validate_vault_layout(vault_layout.value)
+    if record_channel is not None:
+        run_dto.record_channel = record_channel
+
+    if not ignore_config:
+        config = load_config(get_default_config_path() if config_path is None else config_path)
+        for phase in ("pre", "in", "post"):
+            phase_key = f"{phase}-run"
+            if phase_key not in config:
+                continue
+            for context in reversed(config[phase_key].get("contexts", [])):  # type: ignore[literal-required]
+                assert phase in {"pre", "post"}, f"Invalid phase for context: {phase}"
+                run_dto.add_context(context, mode=phase, append_left=True)  # type: ignore[arg-type]
+            for watcher in reversed(config[phase_key].get("watchers", [])):  # type: ignore[literal-required]
+                assert phase == "in", "Watcher can only be added to the in-run phase."
+                # No need to set append_left=True here, as watchers are added as the outermost context manager
+                run_dto.add_watcher(watcher, append_left=False)
+            for reporter in reversed(config[phase_key].get("reporters", [])):  # type: ignore[literal-required]
+                assert phase in {"pre", "in", "post"}, f"Invalid phase for reporter: {phase}"
+                run_dto.add_reporter(reporter, mode=phase, append_left=True)
+
+        run_dto.vault_dir = config["vault-dir"] if run_dto.vault_dir is None else run_dto.vault_dir
+        if run_name is None and config["run-name-factory"] is not None:
+            run_dto.run_name_factory = RUN_NAME_FACTORIES[config["run-name-factory"]]
+        if vault_layout is None and config["vault-layout"] is not None:
+            run_dto.vault_layout = config["vault-layout"]
+        if record_channel is None and config["record-channel"] is not None:
+            run_dto.record_channel = config["record-channel"]
+
+    # Set the vault directory if it is not set by the config file
+    if run_dto.vault_dir is None:
+        project_root = search_for_project_root(Path.cwd())
+        run_dto.vault_dir = project_root / "vault"
+
+    return run_dto
+
+
 @app.command()
 def run(
-    command: Annotated[list[str], typer.Argument(help="Command to run", show_default=False)],
+    command: Annotated[
+        list[str] | None,
+        typer.Argument(help="Command to run. Must be omitted with --batch.", show_default=False),
+    ] = None,
     *,
     run_name: Annotated[
         str | None,
@@ -51,6 +137,22 @@ def run(
             help="Vault directory. If not provided, it will be set to the default value.",
         ),
     ] = None,
+    vault_layout: Annotated[
+        _VaultLayout | None,
+        typer.Option(
+            ...,
+            help="Layout of the run directories in the vault directory. If not provided, the value in the "
+            "configuration file or 'flat' will be used.",
+        ),
+    ] = None,
+    record_channel: Annotated[
+        bool | None,
+        typer.Option(
+            "--record-channel/--no-record-channel",
+            help="Expose a socket through the CAPSULA_RECORD_SOCKET environment variable so that the command can "
+            "record values to the in-run capsule. If not provided, the value in the configuration file is used.",
+        ),
+    ] = None,
     ignore_config: Annotated[
         bool,
         typer.Option(
@@ -65,48 +167,528 @@ def run(
             help="Path to the Capsula configuration file.",
         ),
     ] = None,
+    detach_post_run: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Exit with the return code of the command as soon as it exits, leaving the post-run contexts and "
+            "reporters to a detached background process. The run directory gets a COMPLETED file when it finishes.",
+        ),
+    ] = False,
+    batch: Annotated[
+        str | None,
+        typer.Option(
+            ...,
+            help="File with one command per line to run, or '-' to read the commands from the standard input. "
+            "Blank lines and lines starting with '#' are ignored. The shareable pre-run contexts are encapsulated "
+            "only once, and each command gets its own run directory.",
+        ),
+    ] = None,
+    max_workers: Annotated[
+        int | None,
+        typer.Option(
+            ...,
+            help="Maximum number of commands to run concurrently with --batch. Defaults to the number of processors.",
+        ),
+    ] = None,
 ) -> NoReturn:
+    if batch is not None:
+        if command:
+            msg = "A command cannot be given with --batch."
+            raise typer.BadParameter(msg)
+        if run_name is not None or detach_post_run:
+            msg = "--run-name and --detach-post-run cannot be used with --batch."
+            raise typer.BadParameter(msg)
+        _run_batch(
+            _read_batch_commands(batch),
+            max_workers=max_workers,
+            vault_dir=vault_dir,
+            vault_layout=vault_layout,
+            record_channel=record_channel,
+            ignore_config=ignore_config,
+            config_path=config_path,
+        )
+    if not command:
+        msg = "A command is required unless --batch is given."
+        raise typer.BadParameter(msg)
+
     err_console.print(f"Running command '{shlex.join(command)}'...")
-    run_dto = RunDtoCommand(
-        run_name_factory=default_run_name_factory if run_name is None else lambda _x, _y, _z: run_name,
+    run_dto = _build_command_run_dto(
+        tuple(command),
+        run_name=run_name,
         vault_dir=vault_dir,
-        command=tuple(command),
+        vault_layout=vault_layout,
+        record_channel=record_channel,
+        ignore_config=ignore_config,
+        config_path=config_path,
     )
 
-    if not ignore_config:
-        config = load_config(get_default_config_path() if config_path is None else config_path)
-        for phase in ("pre", "in", "post"):
-            phase_key = f"{phase}-run"
-            if phase_key not in config:
-                continue
-            for context in reversed(config[phase_key].get("contexts", [])):  # type: ignore[literal-required]
-                assert phase in {"pre", "post"}, f"Invalid phase for context: {phase}"
-                run_dto.add_context(context, mode=phase, append_left=True)  # type: ignore[arg-type]
-            for watcher in reversed(config[phase_key].get("watchers", [])):  # type: ignore[literal-required]
-                assert phase == "in", "Watcher can only be added to the in-run phase."
-                # No need to set append_left=True here, as watchers are added as the outermost context manager
-                run_dto.add_watcher(watcher, append_left=False)
-            for reporter in reversed(config[phase_key].get("reporters", [])):  # type: ignore[literal-required]
-                assert phase in {"pre", "in", "post"}, f"Invalid phase for reporter: {phase}"
-                run_dto.add_reporter(reporter, mode=phase, append_left=True)
-
-        run_dto.vault_dir = config["vault-dir"] if run_dto.vault_dir is None else run_dto.vault_dir
-
-    # Set the vault directory if it is not set by the config file
-    if run_dto.vault_dir is None:
-        project_root = search_for_project_root(Path.cwd())
-        run_dto.vault_dir = project_root / "vault"
-
     run: Run[Any, Any] = Run(run_dto)
-    result, params = run.exec_command()
+    result, params = run.exec_command(post_run=not detach_post_run)
     console.print(result.stdout, end="")
     err_console.print(result.stderr, end="")
     err_console.print(f"Run directory: {params.run_dir}")
     err_console.print(f"Command exited with code {result.returncode}")
 
+    if detach_post_run:
+        assert run_dto.vault_dir is not None
+        pid = _spawn_finalizer(
+            command,
+            run_name=params.run_name,
+            run_dir=params.run_dir,
+            vault_dir=run_dto.vault_dir,
+            ignore_config=ignore_config,
+            config_path=config_path,
+        )
+        err_console.print(f"Post-run phase continues in the background (PID {pid})")
+
     raise typer.Exit(result.returncode)
 
 
+def _read_batch_commands(batch: str) -> list[tuple[str, ...]]:
+    text = sys.stdin.read() if batch == "-" else Path(batch).read_text(encoding="utf-8")
+    commands = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            commands.append(tuple(shlex.split(stripped)))
+    return commands
+
+
+def _run_batch(
+    commands: list[tuple[str, ...]],
+    *,
+    max_workers: int | None,
+    vault_dir: Path | None,
+    vault_layout: _VaultLayout | None,
+    record_channel: bool | None,
+    ignore_config: bool,
+    config_path: Path | None,
+) -> NoReturn:
+    err_console.print(f"Running {len(commands)} commands...")
+    run_dto = _build_command_run_dto(
+        ("batch",),
+        run_name=None,
+        vault_dir=vault_dir,
+        vault_layout=vault_layout,
+        record_channel=record_channel,
+        ignore_config=ignore_config,
+        config_path=config_path,
+    )
+    _exec_commands(
+        run_dto,
+        commands,
+        [shlex.join(command) for command in commands],
+        label_header="Command",
+        max_workers=max_workers,
+    )
+
+
+def _exec_commands(
+    run_dto: RunDtoCommand,
+    commands: Sequence[tuple[str, ...]],
+    labels: Sequence[str],
+    *,
+    label_header: str,
+    max_workers: int | None,
+) -> NoReturn:
+    """Run the commands concurrently with the pre-run contexts of `run_dto` shared, print a summary, and exit.
+
+    The shareable pre-run contexts are encapsulated once with the command of `run_dto`, and each command gets its own
+    run directory. The rows of the summary table are in the order of `commands`, labeled with `labels`.
+    """
+    start = time.perf_counter()
+    shared = Run(run_dto).shared_pre_run()
+    err_console.print(f"Shared pre-run directory: {shared.run_dir}")
+
+    def exec_command(command: tuple[str, ...]) -> tuple[int, Path, float]:
+        command_start = time.perf_counter()
+        command_run: Run[Any, Any] = Run(replace(run_dto, command=command))
+        result, params = command_run.exec_command(shared=shared)
+        return result.returncode, params.run_dir, time.perf_counter() - command_start
+
+    table = Table(label_header, "Exit code", "Duration", "Run directory")
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(exec_command, command) for command in commands]
+        for label, future in zip(labels, futures, strict=True):
+            try:
+                returncode, run_dir, duration = future.result()
+            except Exception as e:  # noqa: BLE001
+                n_failed += 1
+                table.add_row(label, f"error: {e}", "", "")
+                continue
+            n_failed += returncode != 0
+            table.add_row(label, str(returncode), f"{duration:.2f}s", str(run_dir))
+    elapsed = time.perf_counter() - start
+
+    err_console.print(table)
+    err_console.print(
+        f"{len(commands) - n_failed} of {len(commands)} commands succeeded, {n_failed} failed "
+        f"in {elapsed:.2f}s ({len(commands) / elapsed:.2f} commands/s)",
+    )
+    raise typer.Exit(1 if n_failed else 0)
+
+
+def _spawn_finalizer(
+    command: list[str],
+    *,
+    run_name: str,
+    run_dir: Path,
+    vault_dir: Path,
+    ignore_config: bool,
+    config_path: Path | None,
+) -> int:
+    args = [
+        sys.executable,
+        "-m",
+        "capsula",
+        "finalize",
+        "--run-name",
+        run_name,
+        "--run-dir",
+        str(run_dir.resolve()),
+        "--vault-dir",
+        str(vault_dir.resolve()),
+    ]
+    if ignore_config:
+        args.append("--ignore-config")
+    if config_path is not None:
+        args.extend(["--config-path", str(config_path)])
+    args.extend(["--", *command])
+
+    # Detach the process from the terminal so that it survives the shell pipeline and is not interrupted by Ctrl-C
+    if sys.platform == "win32":
+        creationflags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        creationflags = 0
+    with (run_dir / FINALIZE_LOG_NAME).open("wb") as log_file:
+        process = subprocess.Popen(  # noqa: S603
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            close_fds=True,
+            creationflags=creationflags,
+            start_new_session=sys.platform != "win32",
+        )
+    return process.pid
+
+
+@app.command(hidden=True)
+def finalize(
+    command: Annotated[list[str], typer.Argument(help="Command that was run", show_default=False)],
+    *,
+    run_name: Annotated[str, typer.Option(..., help="Run name.")],
+    run_dir: Annotated[Path, typer.Option(..., help="Run directory.")],
+    vault_dir: Annotated[Path, typer.Option(..., help="Vault directory.")],
+    ignore_config: Annotated[bool, typer.Option(..., help="Ignore the configuration file.")] = False,
+    config_path: Annotated[Path | None, typer.Option(..., help="Path to the Capsula configuration file.")] = None,
+) -> None:
+    """Run the post-run phase of a run of `capsula run --detach-post-run`."""
+    # The run is left without the completion marker, so that it is not mistaken for a complete one
+    if not run_dir.is_dir():
+        err_console.print(f"Run directory {run_dir} does not exist. The post-run phase is not run.")
+        raise typer.Exit(1)
+    try:
+        run_dto = _build_command_run_dto(
+            tuple(command),
+            run_name=run_name,
+            vault_dir=vault_dir,
+            vault_layout=None,
+            record_channel=None,
+            ignore_config=ignore_config,
+            config_path=config_path,
+        )
+    except Exception as e:
+        err_console.print(f"Failed to load the configuration of the run: {e}. The post-run phase is not run.")
+        raise typer.Exit(1) from e
+    exec_info = CommandInfo(command=tuple(command))
+    params = CapsuleParams(
+        exec_info=exec_info,
+        run_name=run_name,
+        run_dir=run_dir,
+        phase="post",
+        project_root=get_project_root(exec_info),
+        vault_dir=vault_dir,
+    )
+    Run(run_dto).post_run(params)
+
+
+@app.command()
+def daemon(
+    *,
+    socket_path: Annotated[
+        Path | None,
+        typer.Option(
+            "--socket",
+            help=f"Path of the Unix domain socket to listen on. If not provided, ${DAEMON_SOCKET_ENV_VAR} or "
+            "capsula-daemon-<uid>.sock in $XDG_RUNTIME_DIR or the temporary directory is used.",
+        ),
+    ] = None,
+    vault_dir: Annotated[
+        Path | None,
+        typer.Option(
+            ...,
+            help="Vault directory. If not provided, it will be set to the default value for each working directory.",
+        ),
+    ] = None,
+    ignore_config: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Ignore the configuration file.",
+        ),
+    ] = False,
+    config_path: Annotated[
+        Path | None,
+        typer.Option(
+            ...,
+            help="Path to the Capsula configuration file. If not provided, the configuration file of the project "
+            "of each working directory is used.",
+        ),
+    ] = None,
+    print_client_path: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Print the path of the thin client script and exit. "
+            "Run it with `python <path> -- <command>` to run a command through the daemon.",
+        ),
+    ] = False,
+) -> None:
+    """Keep the configuration and the host contexts warm to run commands sent by the thin client with low latency."""
+    if print_client_path:
+        console.print(_client.__file__, soft_wrap=True)
+        raise typer.Exit
+
+    capsula_daemon = CapsulaDaemon(
+        partial(
+            _build_command_run_dto,
+            (),
+            run_name=None,
+            vault_dir=vault_dir,
+            vault_layout=None,
+            record_channel=None,
+            ignore_config=ignore_config,
+            config_path=config_path,
+        ),
+        socket_path=socket_path,
+    )
+    err_console.print(f"Capsula daemon listening on {capsula_daemon.socket_path}")
+    try:
+        capsula_daemon.serve_forever()
+    except KeyboardInterrupt:
+        err_console.print("Capsula daemon stopped")
+
+
+def _substitute_sweep_params(command: list[str], point: dict[str, Any]) -> tuple[str, ...]:
+    """Replace `{name}` with the value of each parameter `name`, leaving the other braces as they are."""
+    # Arguments such as `{}` of `find -exec` and the programs of `awk` and `jq` are not format strings
+    if not point:
+        return tuple(command)
+    pattern = re.compile(r"\{(" + "|".join(map(re.escape, point)) + r")\}")
+    return tuple(pattern.sub(lambda match: str(point[match.group(1)]), arg) for arg in command)
+
+
+def _parse_sweep_param(param: str) -> tuple[str, list[str]]:
+    name, sep, values = param.partition("=")
+    if not sep or not name:
+        msg = f"Invalid parameter specification: {param!r}. Use the form 'name=value1,value2,...'."
+        raise typer.BadParameter(msg)
+    return name, values.split(",")
+
+
+@app.command()
+def sweep(
+    command: Annotated[
+        list[str],
+        typer.Argument(
+            help="Command template to run. '{name}' in the command is replaced with the value of the parameter 'name'.",
+            show_default=False,
+        ),
+    ],
+    *,
+    param: Annotated[
+        list[str],
+        typer.Option(
+            ...,
+            "--param",
+            "-p",
+            help="Parameter values in the form 'name=value1,value2,...'. Can be specified multiple times.",
+        ),
+    ],
+    n_random: Annotated[
+        int | None,
+        typer.Option(
+            ...,
+            "--random",
+            help="Sample this number of points randomly from the parameter values instead of using the full grid.",
+        ),
+    ] = None,
+    seed: Annotated[int | None, typer.Option(..., help="Seed for the random sampling.")] = None,
+    max_workers: Annotated[
+        int | None,
+        typer.Option(..., help="Maximum number of commands to run concurrently. Defaults to the number of processors."),
+    ] = None,
+    vault_dir: Annotated[
+        Path | None,
+        typer.Option(
+            ...,
+            help="Vault directory. If not provided, it will be set to the default value.",
+        ),
+    ] = None,
+    vault_layout: Annotated[
+        _VaultLayout | None,
+        typer.Option(
+            ...,
+            help="Layout of the run directories in the vault directory. If not provided, the value in the "
+            "configuration file or 'flat' will be used.",
+        ),
+    ] = None,
+    record_channel: Annotated[
+        bool | None,
+        typer.Option(
+            "--record-channel/--no-record-channel",
+            help="Expose a socket through the CAPSULA_RECORD_SOCKET environment variable so that the command can "
+            "record values to the in-run capsule. If not provided, the value in the configuration file is used.",
+        ),
+    ] = None,
+    ignore_config: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            help="Ignore the configuration file and run the commands directly.",
+        ),
+    ] = False,
+    config_path: Annotated[
+        Path | None,
+        typer.Option(
+            ...,
+            help="Path to the Capsula configuration file.",
+        ),
+    ] = None,
+) -> NoReturn:
+    axes = dict(map(_parse_sweep_param, param))
+    points = grid_points(**axes) if n_random is None else random_points(n_random, seed=seed, **axes)
+    err_console.print(f"Sweeping {len(points)} points of command '{shlex.join(command)}'...")
+
+    run_dto = _build_command_run_dto(
+        tuple(command),
+        run_name=None,
+        vault_dir=vault_dir,
+        vault_layout=vault_layout,
+        record_channel=record_channel,
+        ignore_config=ignore_config,
+        config_path=config_path,
+    )
+    point_commands = [_substitute_sweep_params(command, point) for point in points]
+    _exec_commands(
+        run_dto,
+        point_commands,
+        [", ".join(f"{name}={value}" for name, value in point.items()) for point in points],
+        label_header="Parameters",
+        max_workers=max_workers,
+    )
+
+
+@app.command()
+def record(
+    key: Annotated[
+        str,
+        typer.Argument(
+            help="Key of the record. Use dots to specify a nested key, e.g., 'metrics.loss'.",
+            show_default=False,
+        ),
+    ],
+    value: Annotated[
+        str,
+        typer.Argument(
+            help="Value of the record. Parsed as JSON if possible, otherwise recorded as a string.",
+            show_default=False,
+        ),
+    ],
+) -> NoReturn:
+    record_socket = os.environ.get(RECORD_SOCKET_ENV_VAR)
+    if record_socket is None:
+        err_console.print(
+            f"{RECORD_SOCKET_ENV_VAR} is not set. Run this command inside a run with the record channel enabled.",
+        )
+        raise typer.Exit(1)
+
+    try:
+        parsed_value = orjson.loads(value)
+    except orjson.JSONDecodeError:
+        parsed_value = value
+    keys = tuple(key.split("."))
+    send_record(record_socket, keys[0] if len(keys) == 1 else keys, parsed_value)
+    raise typer.Exit
+
+
+class _ExportFormat(str, Enum):
+    parquet = "parquet"
+    arrow = "arrow"
+
+
+class _Phase(str, Enum):
+    pre = "pre"
+    in_ = "in"
+    post = "post"
+
+
+@app.command()
+def export(
+    output_dir: Annotated[
+        Path,
+        typer.Argument(help="Directory of the dataset to create. Must not exist or be empty.", show_default=False),
+    ],
+    *,
+    vault_dir: Annotated[
+        Path | None,
+        typer.Option(
+            ...,
+            help="Vault directory. If not provided, the value in the configuration file or the default value is used.",
+        ),
+    ] = None,
+    export_format: Annotated[
+        _ExportFormat,
+        typer.Option(..., "--format", help="Format of the dataset."),
+    ] = _ExportFormat.parquet,
+    phase: Annotated[
+        list[_Phase] | None,
+        typer.Option(..., "--phase", "-p", help="Phase of the reports to export. Can be specified multiple times."),
+    ] = None,
+    batch_size: Annotated[int, typer.Option(..., help="Number of runs per part file of the dataset.")] = 1024,
+    max_workers: Annotated[
+        int | None,
+        typer.Option(
+            ...,
+            help="Maximum number of processes to parse the reports. Defaults to the number of processors.",
+        ),
+    ] = None,
+) -> NoReturn:
+    if vault_dir is None:
+        try:
+            vault_dir = load_config(get_default_config_path())["vault-dir"]
+        except FileNotFoundError:
+            vault_dir = None
+        if vault_dir is None:
+            vault_dir = search_for_project_root(Path.cwd()) / "vault"
+
+    phases = ("pre", "in", "post") if not phase else tuple(p.value for p in phase)
+    err_console.print(f"Exporting the runs in {vault_dir} to {output_dir}...")
+    n_runs = export_runs(
+        vault_dir,
+        output_dir,
+        format=export_format.value,
+        phases=phases,  # type: ignore[arg-type]
+        batch_size=batch_size,
+        max_workers=max_workers,
+    )
+    err_console.print(f"Exported {n_runs} runs")
+    raise typer.Exit
+
+
 class _PhaseForEncapsulate(str, Enum):
     pre = "pre"
     post = "post"
@@ -130,13 +712,16 @@ def enc(
 
     vault_dir = get_default_vault_dir(exec_info)
 
-    run_name = default_run_name_factory(
+    timestamp = datetime.now(timezone.utc)
+    run_name = RUN_NAME_FACTORIES[config["run-name-factory"] or "default"](
         exec_info,
         "".join(choices(ascii_letters + digits, k=4)),
-        datetime.now(timezone.utc),
+        timestamp,
     )
 
-    run_dir = vault_dir / run_name
+    vault_layout = config["vault-layout"] or "flat"
+    record_vault_layout(vault_dir, vault_layout)
+    run_dir = get_run_dir(vault_dir, run_name, layout=vault_layout, timestamp=timestamp)
     run_dir.mkdir(exist_ok=True, parents=True)
     params = CapsuleParams(
         exec_info=exec_info,
@@ -144,6 +729,7 @@ def enc(
         run_dir=run_dir,
         phase=phase.value,
         project_root=get_project_root(exec_info),
+        vault_dir=vault_dir,
     )
 
     for context in contexts:
@@ -0,0 +1,84 @@
+"""Thin client of the Capsula daemon.
+
+Only the standard library is imported, so that running this file directly as a script, e.g.,
+`python path/to/_client.py -- echo hello`, does not pay for importing the `capsula` package.
+Use `capsula daemon --print-client-path` to get the path of this file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+
+DAEMON_SOCKET_ENV_VAR = "CAPSULA_DAEMON_SOCKET"
+
+_RECV_SIZE = 65536
+
+
+def default_socket_path() -> Path:
+    """Path of the socket of the daemon, from the `CAPSULA_DAEMON_SOCKET` environment variable if set."""
+    path = os.environ.get(DAEMON_SOCKET_ENV_VAR)
+    if path is not None:
+        return Path(path)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(runtime_dir) / f"capsula-daemon-{os.getuid()}.sock"
+
+
+def request(
+    socket_path: Path | str,
+    command: Sequence[str],
+    *,
+    cwd: Path | str,
+    env: Mapping[str, str],
+) -> dict[str, Any]:
+    """Send a run request to the daemon and wait for the response.
+
+    The request and the response are single lines of JSON. The response has the `returncode`, `stdout`, `stderr`,
+    and `run_dir` of the run, or the `error` if the daemon failed to run the command.
+    """
+    message = {"command": list(command), "cwd": str(cwd), "env": dict(env)}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        chunks = []
+        while chunk := sock.recv(_RECV_SIZE):
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))  # type: ignore[no-any-return]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    socket_path = default_socket_path()
+    if len(args) >= 2 and args[0] == "--socket":
+        socket_path = Path(args[1])
+        args = args[2:]
+    if args and args[0] == "--":
+        args = args[1:]
+    if not args:
+        sys.stderr.write("Usage: _client.py [--socket PATH] [--] COMMAND [ARGS...]\n")
+        return 2
+
+    try:
+        response = request(socket_path, args, cwd=Path.cwd(), env=os.environ)
+    except OSError as e:
+        sys.stderr.write(f"Failed to connect to the Capsula daemon at {socket_path}: {e}\n")
+        return 1
+    if "error" in response:
+        sys.stderr.write(f"Capsula daemon failed to run the command: {response['error']}\n")
+        return 1
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    sys.stderr.write(f"Run directory: {response['run_dir']}\n")
+    return response["returncode"]  # type: ignore[no-any-return]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import gzip
+import sys
+from typing import TYPE_CHECKING, Literal, TypeAlias, get_args
+
+from ._exceptions import CapsulaConfigurationError
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+Compression: TypeAlias = Literal["gzip", "zstd"]
+
+COMPRESSION_SUFFIXES: dict[Compression, str] = {"gzip": ".gz", "zstd": ".zst"}
+
+_DEFAULT_LEVELS: dict[Compression, int] = {"gzip": 6, "zstd": 3}
+
+
+def validate_compression(compression: str) -> Compression:
+    if compression not in get_args(Compression):
+        msg = f"compression must be one of {', '.join(get_args(Compression))}, not {compression!r}."
+        raise CapsulaConfigurationError(msg)
+    if compression == "zstd":
+        # Fail early rather than after the run has finished
+        _import_zstd()
+    return compression  # type: ignore[return-value]
+
+
+def _import_zstd() -> None:
+    # YORE: EOL 3.13: Replace block with line 2.
+    if sys.version_info >= (3, 14):
+        return
+    try:
+        import zstandard  # noqa: F401, PLC0415
+    except ImportError as e:
+        msg = "zstd compression requires the `zstandard` package on Python < 3.14. Install `capsula[zstd]`."
+        raise CapsulaConfigurationError(msg) from e
+
+
+def compress(data: bytes, compression: Compression, level: int | None = None) -> bytes:
+    level = _DEFAULT_LEVELS[compression] if level is None else level
+    if compression == "gzip":
+        # Fix the modification time so that the same capsule is compressed to the same bytes
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    elif compression == "zstd":
+        # YORE: EOL 3.13: Replace block with lines 2-4.
+        if sys.version_info >= (3, 14):
+            from compression import zstd  # noqa: PLC0415
+
+            return zstd.compress(data, level=level)
+        import zstandard  # noqa: PLC0415
+
+        return zstandard.ZstdCompressor(level=level).compress(data)  # type: ignore[no-any-return,unused-ignore]
+    else:
+        msg = f"compression must be one of {', '.join(get_args(Compression))}, not {compression}."
+        raise ValueError(msg)
+
+
+def decompress(data: bytes, compression: Compression) -> bytes:
+    if compression == "gzip":
+        return gzip.decompress(data)
+    elif compression == "zstd":
+        # YORE: EOL 3.13: Replace block with lines 2-4.
+        if sys.version_info >= (3, 14):
+            from compression import zstd  # noqa: PLC0415
+
+            return zstd.decompress(data)
+        import zstandard  # noqa: PLC0415
+
+        return zstandard.ZstdDecompressor().decompress(data)  # type: ignore[no-any-return,unused-ignore]
+    else:
+        msg = f"compression must be one of {', '.join(get_args(Compression))}, not {compression}."
+        raise ValueError(msg)
+
+
+def compression_from_path(path: Path) -> Compression | None:
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.suffix == suffix:
+            return compression
+    return None
@@ -6,7 +6,10 @@ from typing import TYPE_CHECKING, Any, TypedDict
 
 from ._backport import tomllib
 from ._context import ContextBase
+from ._exceptions import CapsulaConfigurationError
 from ._reporter import ReporterBase
+from ._run import RUN_NAME_FACTORIES
+from ._vault import VaultLayout, validate_vault_layout
 from ._watcher import WatcherBase
 
 if TYPE_CHECKING:
@@ -52,6 +55,9 @@ _CapsulaConfig = TypedDict(
     "_CapsulaConfig",
     {
         "vault-dir": Path | None,
+        "vault-layout": VaultLayout | None,
+        "run-name-factory": str | None,
+        "record-channel": bool | None,
         "pre-run": _PreRunConfig,
         "in-run": _InRunConfig,
         "post-run": _PostRunConfig,
@@ -72,8 +78,18 @@ def load_config(path: Path) -> _CapsulaConfig:
     else:
         vault_dir = None
 
+    vault_layout = validate_vault_layout(raw_config["vault-layout"]) if "vault-layout" in raw_config else None
+
+    run_name_factory = raw_config.get("run-name-factory")
+    if run_name_factory is not None and run_name_factory not in RUN_NAME_FACTORIES:
+        msg = f"run-name-factory must be one of {', '.join(RUN_NAME_FACTORIES)}, not {run_name_factory!r}."
+        raise CapsulaConfigurationError(msg)
+
     config: _CapsulaConfig = {
         "vault-dir": vault_dir,
+        "vault-layout": vault_layout,
+        "run-name-factory": run_name_factory,
+        "record-channel": raw_config.get("record-channel"),
         "pre-run": {"contexts": [], "reporters": []},
         "in-run": {"watchers": [], "reporters": []},
         "post-run": {"contexts": [], "reporters": []},
@@ -7,6 +7,7 @@ __all__ = [
     "FileContext",
     "FunctionContext",
     "GitRepositoryContext",
+    "PackagesContext",
     "PlatformContext",
 ]
 from ._base import ContextBase
@@ -17,4 +18,5 @@ from ._envvar import EnvVarContext
 from ._file import FileContext
 from ._function import FunctionContext
 from ._git import GitRepositoryContext
+from ._packages import PackagesContext
 from ._platform import PlatformContext
@@ -12,6 +12,23 @@ class ContextBase(CapsuleItem):
     def abort_on_error(self) -> bool:
         return False
 
+    @property
+    def shareable(self) -> bool:
+        """Whether the encapsulated value can be shared among runs started from the same environment.
+
+        Shareable pre-run contexts are encapsulated only once for a sweep, and the value is reused for each run in it.
+        """
+        return False
+
+    @property
+    def side_effect_free(self) -> bool:
+        """Whether encapsulating the context neither has side effects nor depends on what the run does.
+
+        With `overlap_pre_run=True`, side-effect-free pre-run contexts are encapsulated in background threads while
+        the function is running.
+        """
+        return False
+
     def __init_subclass__(cls, **kwargs: Any) -> None:
         if cls.__name__ in cls._subclass_registry:
             msg = f"Duplicate context name: {cls.__name__}"
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import contextlib
+import glob
+import hashlib
+import io
 import logging
+import os
+import signal
 import subprocess
+import threading
 from collections.abc import Callable
 from pathlib import Path
-from typing import TYPE_CHECKING, Annotated, TypedDict
+from typing import IO, TYPE_CHECKING, Annotated, TypedDict
 
-from typing_extensions import Doc
+import orjson
+from typing_extensions import Doc, NotRequired
+
+from capsula._backport import file_digest
+from capsula._exceptions import CapsulaConfigurationError
+from capsula._utils import append_digest, atomic_write_bytes
 
 from ._base import ContextBase
 
@@ -19,12 +31,69 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+_READ_SIZE = 65536
+
+
+class _OutputFileData(TypedDict):
+    path: Path
+    size: int
+    hash: dict[str, str]
+
+
 class _CommandContextData(TypedDict):
     command: str
     cwd: Path | None
     returncode: int
-    stdout: str
-    stderr: str
+    stdout: str | None
+    stderr: str | None
+    stdout_file: NotRequired[_OutputFileData]
+    stderr_file: NotRequired[_OutputFileData]
+    cached: NotRequired[bool]
+
+
+class _BoundedCapture:
+    """Read a stream in a thread, keeping at most `max_size` bytes from its head and tail."""
+
+    def __init__(self, stream: IO[bytes], max_size: int | None) -> None:
+        self._stream = stream
+        self._max_size = max_size
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._n_truncated = 0
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self) -> None:
+        with self._stream:
+            while chunk := self._stream.read1(_READ_SIZE):  # type: ignore[attr-defined]
+                if self._max_size is None:
+                    self._head += chunk
+                    continue
+                head_size = self._max_size - self._max_size // 2
+                n_to_head = max(0, min(len(chunk), head_size - len(self._head)))
+                self._head += chunk[:n_to_head]
+                self._tail += chunk[n_to_head:]
+                if len(self._tail) > self._max_size // 2:
+                    excess = len(self._tail) - self._max_size // 2
+                    self._n_truncated += excess
+                    del self._tail[:excess]
+
+    def result(self) -> str:
+        self._thread.join()
+        data = bytes(self._head)
+        if self._n_truncated:
+            data += f"\n[... {self._n_truncated} bytes truncated ...]\n".encode()
+        data += self._tail
+        # Decode in the same way as `subprocess.run(..., text=True)`, but without failing on a truncated character
+        return io.TextIOWrapper(io.BytesIO(data), errors="replace").read()
+
+
+def _kill_process_group(process: subprocess.Popen[bytes]) -> None:
+    if os.name == "nt":
+        process.kill()
+        return
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(process.pid, signal.SIGKILL)
 
 
 class CommandContext(ContextBase):
@@ -67,6 +136,35 @@ class CommandContext(ContextBase):
                 "For more information, see the `shell` argument of `subprocess.run`. ",
             ),
         ] = True,
+        timeout: Annotated[
+            float | None,
+            Doc(
+                "Timeout in seconds. If the command does not finish in time, the command and its child processes "
+                "are killed and `subprocess.TimeoutExpired` is raised.",
+            ),
+        ] = None,
+        max_output_size: Annotated[
+            int | None,
+            Doc(
+                "Maximum number of bytes of stdout and stderr, respectively, to capture. If exceeded, the first and "
+                "last halves are kept and the middle is truncated. If not provided, the whole output is captured.",
+            ),
+        ] = None,
+        output_to_file: Annotated[
+            bool,
+            Doc(
+                "Whether to write stdout and stderr to files in the run directory instead of capturing them. "
+                "Only the paths, sizes, and digests of the files are recorded.",
+            ),
+        ] = False,
+        cache_inputs: Annotated[
+            list[str] | None,
+            Doc(
+                "Files or glob patterns that the result of the command depends on, relative to the working "
+                "directory of the command. If provided, the stdout, stderr, and return code are cached in the "
+                "vault directory and reused while the contents of the matched files are unchanged.",
+            ),
+        ] = None,
     ) -> Callable[[CapsuleParams], CommandContext]:
         def build(params: CapsuleParams) -> CommandContext:
             if cwd_relative_to_project_root and cwd is not None and not Path(cwd).is_absolute():
@@ -76,12 +174,20 @@ class CommandContext(ContextBase):
             else:
                 cwd_path = Path(cwd) if cwd is not None else None
 
+            if cache_inputs is not None and params.vault_dir is None:
+                logger.warning(f"Vault directory is unknown. The result of {command!r} will not be cached.")
+
             return cls(
                 command,
                 cwd=cwd_path,
                 check=check,
                 abort_on_error=abort_on_error,
                 shell=shell,
+                timeout=timeout,
+                max_output_size=max_output_size,
+                output_dir=params.run_dir if output_to_file else None,
+                cache_inputs=cache_inputs if params.vault_dir is not None else None,
+                cache_dir=None if params.vault_dir is None else params.vault_dir / ".cache" / "command",
             )
 
         return build
@@ -94,36 +200,162 @@ class CommandContext(ContextBase):
         check: bool = True,
         abort_on_error: bool = True,
         shell: bool = True,
+        timeout: float | None = None,
+        max_output_size: int | None = None,
+        output_dir: Path | str | None = None,
+        cache_inputs: list[str] | None = None,
+        cache_dir: Path | str | None = None,
     ) -> None:
         """Initialize the command context."""
+        if cache_inputs is not None and cache_dir is None:
+            msg = "cache_dir must be provided to cache the result of the command."
+            raise CapsulaConfigurationError(msg)
+        if cache_inputs is not None and output_dir is not None:
+            msg = "The result of the command cannot be cached when the output is written to files."
+            raise CapsulaConfigurationError(msg)
         self._command = command
         self._cwd = cwd
         self._check = check
         self._abort_on_error = abort_on_error
         self._shell = shell
+        self._timeout = timeout
+        self._max_output_size = max_output_size
+        self._output_dir = None if output_dir is None else Path(output_dir)
+        self._cache_inputs = cache_inputs
+        self._cache_dir = None if cache_dir is None else Path(cache_dir)
 
     @property
     def abort_on_error(self) -> bool:
         return self._abort_on_error
 
+    @property
+    def shareable(self) -> bool:
+        return True
+
+    def _output_path(self, stream_name: str) -> Path:
+        assert self._output_dir is not None
+        command_hash = hashlib.sha256(self._command.encode()).hexdigest()[:8]
+        return self._output_dir / f"command-{command_hash}.{stream_name}"
+
+    def _open_output(self, stream_name: str) -> IO[bytes] | int:
+        if self._output_dir is None:
+            return subprocess.PIPE
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        return self._output_path(stream_name).open("wb")
+
+    def _output_file_data(self, stream_name: str) -> _OutputFileData:
+        path = self._output_path(stream_name)
+        with path.open("rb") as f:
+            digest = file_digest(f, "sha256").hexdigest()
+        append_digest(path, digest, fsync=False)
+        return {"path": path, "size": path.stat().st_size, "hash": {"algorithm": "sha256", "digest": digest}}
+
+    def _cache_path(self) -> Path:
+        """Get the path of the cache entry, keyed by the command and the digests of the input files."""
+        assert self._cache_inputs is not None
+        assert self._cache_dir is not None
+        root_dir = Path.cwd() if self._cwd is None else self._cwd
+        inputs = []
+        for pattern in self._cache_inputs:
+            matched = []
+            for name in sorted(glob.glob(pattern, root_dir=root_dir, recursive=True)):  # noqa: PTH207
+                path = root_dir / name
+                if path.is_file():
+                    with path.open("rb") as f:
+                        matched.append((name, file_digest(f, "sha256").hexdigest()))
+            # Patterns without matches are kept in the key so that creating a matching file invalidates the cache
+            inputs.append((pattern, matched))
+        key = orjson.dumps(
+            {"command": self._command, "cwd": str(root_dir.resolve()), "shell": self._shell, "inputs": inputs},
+        )
+        return self._cache_dir / f"{hashlib.sha256(key).hexdigest()}.json"
+
     def encapsulate(self) -> _CommandContextData:
-        logger.debug(f"Running command: {self._command}")
-        output = subprocess.run(  # noqa: S603
-            self._command,
-            shell=self._shell,
-            text=True,
-            capture_output=True,
-            cwd=self._cwd,
-            check=self._check,
+        if self._cache_inputs is None:
+            return self._run()
+
+        cache_path = self._cache_path()
+        try:
+            cached = orjson.loads(cache_path.read_bytes())
+        except FileNotFoundError:
+            pass
+        except orjson.JSONDecodeError:
+            logger.warning(f"Ignoring the corrupted cache entry {cache_path}.")
+        else:
+            logger.debug(f"Reusing the cached result of command: {self._command}")
+            if self._check and cached["returncode"] != 0:
+                raise subprocess.CalledProcessError(
+                    cached["returncode"],
+                    self._command,
+                    cached["stdout"],
+                    cached["stderr"],
+                )
+            return {
+                "command": self._command,
+                "cwd": self._cwd,
+                "returncode": cached["returncode"],
+                "stdout": cached["stdout"],
+                "stderr": cached["stderr"],
+                "cached": True,
+            }
+
+        data = self._run()
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(
+            cache_path,
+            orjson.dumps({"returncode": data["returncode"], "stdout": data["stdout"], "stderr": data["stderr"]}),
+            record_digest=False,
         )
-        logger.debug(f"Ran command: {self._command}. Result: {output}")
-        return {
+        data["cached"] = False
+        return data
+
+    def _run(self) -> _CommandContextData:
+        logger.debug(f"Running command: {self._command}")
+        stdout_target = self._open_output("stdout")
+        stderr_target = self._open_output("stderr")
+        try:
+            # Run the command in a new process group so that its child processes can be killed on timeout
+            process = subprocess.Popen(  # noqa: S603
+                self._command,
+                shell=self._shell,
+                cwd=self._cwd,
+                stdout=stdout_target,
+                stderr=stderr_target,
+                start_new_session=os.name != "nt",
+            )
+        finally:
+            for target in (stdout_target, stderr_target):
+                if not isinstance(target, int):
+                    target.close()
+
+        stdout_capture = None if process.stdout is None else _BoundedCapture(process.stdout, self._max_output_size)
+        stderr_capture = None if process.stderr is None else _BoundedCapture(process.stderr, self._max_output_size)
+        try:
+            returncode = process.wait(timeout=self._timeout)
+        except BaseException:
+            # Including the timeout and KeyboardInterrupt
+            _kill_process_group(process)
+            process.wait()
+            raise
+        finally:
+            stdout = None if stdout_capture is None else stdout_capture.result()
+            stderr = None if stderr_capture is None else stderr_capture.result()
+
+        logger.debug(f"Ran command: {self._command}. Return code: {returncode}")
+        if self._check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self._command, stdout, stderr)
+
+        data: _CommandContextData = {
             "command": self._command,
             "cwd": self._cwd,
-            "returncode": output.returncode,
-            "stdout": output.stdout,
-            "stderr": output.stderr,
+            "returncode": returncode,
+            "stdout": stdout,
+            "stderr": stderr,
         }
+        if self._output_dir is not None:
+            data["stdout_file"] = self._output_file_data("stdout")
+            data["stderr_file"] = self._output_file_data("stderr")
+        return data
 
     def default_key(self) -> tuple[str, str]:
         return ("command", self._command)
@@ -10,6 +10,14 @@ from ._base import ContextBase
 class CpuContext(ContextBase):
     """Context to capture CPU information."""
 
+    @property
+    def shareable(self) -> bool:
+        return True
+
+    @property
+    def side_effect_free(self) -> bool:
+        return True
+
     def encapsulate(self) -> dict[str, Any]:
         return get_cpu_info()  # type: ignore[no-any-return]
 
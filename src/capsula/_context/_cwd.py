@@ -6,6 +6,10 @@ from ._base import ContextBase
 class CwdContext(ContextBase):
     """Context to capture the current working directory."""
 
+    @property
+    def shareable(self) -> bool:
+        return True
+
     def encapsulate(self) -> Path:
         return Path.cwd()
 
@@ -14,6 +14,10 @@ class EnvVarContext(ContextBase):
     def __init__(self, name: Annotated[str, Doc("Name of the environment variable")]) -> None:
         self.name = name
 
+    @property
+    def shareable(self) -> bool:
+        return True
+
     def encapsulate(self) -> str | None:
         return os.getenv(self.name)
 
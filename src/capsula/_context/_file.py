@@ -3,13 +3,15 @@ from __future__ import annotations
 import logging
 import warnings
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from shutil import copyfile, move
+from shutil import move
 from typing import TYPE_CHECKING, Annotated, TypedDict
 
 from typing_extensions import Doc
 
-from capsula._backport import file_digest
+from capsula._hash import HashData, compute_file_digests, compute_file_hash, validate_hash_algorithm
+from capsula._utils import atomic_copy_file
 
 from ._base import ContextBase
 
@@ -24,11 +26,16 @@ logger = logging.getLogger(__name__)
 class _FileContextData(TypedDict):
     copied_to: tuple[Path, ...]
     moved_to: Path | None
-    hash: dict[str, str] | None
+    hash: HashData | None
 
 
 class FileContext(ContextBase):
-    """Context to capture a file."""
+    """Context to capture a file.
+
+    Copies of the file are written atomically, and their SHA-256 digests are recorded in the `SHA256SUMS` file
+    in the destination directories. The copies are made in parallel, by cloning the file or copying it in the
+    kernel where supported, and the file is read only once to compute both its hash and the SHA-256 digest.
+    """
 
     _default_hash_algorithm = "sha256"
 
@@ -41,8 +48,17 @@ class FileContext(ContextBase):
         hash_algorithm: Annotated[
             str | None,
             Doc(
-                "Hash algorithm to use. This will be fed to `hashlib.file_digest` as the `digest` argument. "
-                "If not provided, `sha256` will be used.",
+                "Hash algorithm to use. One of the algorithms supported by `hashlib.new`, the xxHash algorithms "
+                "(`xxh3_64`, `xxh3_128`, etc., requires the `xxhash` package), or `blake3` (multi-threaded, "
+                "requires the `blake3` package). If not provided, `sha256` will be used.",
+            ),
+        ] = None,
+        hash_chunk_size: Annotated[
+            int | None,
+            Doc(
+                "If provided, the file is split into chunks of this number of bytes, which are hashed in parallel "
+                "threads. The digest is the hash of the concatenated digests of the chunks, so it differs from the "
+                "digest of the whole file. The chunk size is recorded in the `hash` field. Ignored for `blake3`.",
             ),
         ] = None,
         copy: Annotated[bool, Doc("Whether to copy the file to the run directory")] = False,
@@ -57,11 +73,14 @@ class FileContext(ContextBase):
                 "It is recommended to set this to True in the configuration file.",
             ),
         ] = False,
+        fsync: Annotated[bool, Doc("Whether to sync the copied files and their directories to the disk")] = False,
     ) -> Callable[[CapsuleParams], FileContext]:
         if copy and move:
             warnings.warn("Both copy and move are True. Only move will be performed.", UserWarning, stacklevel=2)
             move = True
             copy = False
+        if compute_hash and hash_algorithm is not None:
+            validate_hash_algorithm(hash_algorithm)
 
         def build(params: CapsuleParams) -> FileContext:
             if path_relative_to_project_root and path is not None and not Path(path).is_absolute():
@@ -73,9 +92,11 @@ class FileContext(ContextBase):
                 path=file_path,
                 compute_hash=compute_hash,
                 hash_algorithm=hash_algorithm,
+                hash_chunk_size=hash_chunk_size,
                 copy_to=params.run_dir if copy else None,
                 move_to=params.run_dir if move else None,
                 ignore_missing=ignore_missing,
+                fsync=fsync,
             )
 
         return build
@@ -86,15 +107,19 @@ class FileContext(ContextBase):
         *,
         compute_hash: bool = True,
         hash_algorithm: str | None = None,
+        hash_chunk_size: int | None = None,
         copy_to: Iterable[Path | str] | Path | str | None = None,
         move_to: Path | str | None = None,
         ignore_missing: bool = False,
+        fsync: bool = False,
     ) -> None:
         self._path = Path(path)
         self._hash_algorithm = self._default_hash_algorithm if hash_algorithm is None else hash_algorithm
+        self._hash_chunk_size = hash_chunk_size
         self._compute_hash = compute_hash
         self._move_to = None if move_to is None else Path(move_to)
         self._ignore_missing = ignore_missing
+        self._fsync = fsync
 
         if copy_to is None:
             self._copy_to: tuple[Path, ...] = ()
@@ -103,12 +128,38 @@ class FileContext(ContextBase):
         else:
             self._copy_to = tuple(Path(p) for p in copy_to)
 
+    @property
+    def shareable(self) -> bool:
+        # Copies and moves target the directory of a specific run, typically its run directory
+        return not self._copy_to and self._move_to is None
+
     def _normalize_copy_dst_path(self, p: Path) -> Path:
         if p.is_dir():
             return p / self._path.name
         else:
             return p
 
+    def _hash(self) -> tuple[HashData | None, str | None]:
+        """Compute the hash of the file, and the SHA-256 digest to record for the copies if any.
+
+        Both are computed in a single read of the file, unless the hash is chunked or BLAKE3.
+        """
+        algorithms = []
+        if self._compute_hash and self._hash_chunk_size is None and self._hash_algorithm != "blake3":
+            algorithms.append(self._hash_algorithm)
+        if self._copy_to and "sha256" not in algorithms:
+            algorithms.append("sha256")
+        digests = dict(zip(algorithms, compute_file_digests(self._path, algorithms), strict=True)) if algorithms else {}
+
+        hash_data: HashData | None
+        if not self._compute_hash:
+            hash_data = None
+        elif self._hash_algorithm in digests:
+            hash_data = {"algorithm": self._hash_algorithm, "digest": digests[self._hash_algorithm]}
+        else:
+            hash_data = compute_file_hash(self._path, self._hash_algorithm, chunk_size=self._hash_chunk_size)
+        return hash_data, digests.get("sha256")
+
     def encapsulate(self) -> _FileContextData:
         if not self._path.exists():
             if self._ignore_missing:
@@ -119,15 +170,7 @@ class FileContext(ContextBase):
                 raise FileNotFoundError(msg)
         self._copy_to = tuple(self._normalize_copy_dst_path(p) for p in self._copy_to)
 
-        if self._compute_hash:
-            with self._path.open("rb") as f:
-                digest = file_digest(f, self._hash_algorithm).hexdigest()
-            hash_data = {
-                "algorithm": self._hash_algorithm,
-                "digest": digest,
-            }
-        else:
-            hash_data = None
+        hash_data, sha256_digest = self._hash()
 
         info: _FileContextData = {
             "copied_to": self._copy_to,
@@ -135,8 +178,15 @@ class FileContext(ContextBase):
             "hash": hash_data,
         }
 
-        for path in self._copy_to:
-            copyfile(self._path, path)
+        if self._copy_to:
+            # The copies are made in the kernel, so they run in parallel threads without holding the GIL
+            with ThreadPoolExecutor(max_workers=len(self._copy_to)) as executor:
+                futures = [
+                    executor.submit(atomic_copy_file, self._path, path, fsync=self._fsync, digest=sha256_digest)
+                    for path in self._copy_to
+                ]
+            for future in futures:
+                future.result()
         if self._move_to is not None:
             move(str(self._path), self._move_to)
 
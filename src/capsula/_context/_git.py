@@ -11,6 +11,7 @@ from typing_extensions import Doc
 
 from capsula._exceptions import CapsulaError
 from capsula._run import CommandInfo, FuncInfo
+from capsula._utils import atomic_write_bytes
 
 from ._base import ContextBase
 
@@ -66,6 +67,10 @@ class GitRepositoryContext(ContextBase):
             ),
         ] = False,
         allow_dirty: Annotated[bool, Doc("Whether to allow the repository to be dirty")] = True,
+        fsync: Annotated[
+            bool,
+            Doc("Whether to sync the diff file and its directory to the disk after writing"),
+        ] = False,
     ) -> Callable[[CapsuleParams], GitRepositoryContext]:
         def build(params: CapsuleParams) -> GitRepositoryContext:
             if path_relative_to_project_root and path is not None and not Path(path).is_absolute():
@@ -93,6 +98,7 @@ class GitRepositoryContext(ContextBase):
                 diff_file=params.run_dir / f"{repo_name}.diff",
                 search_parent_directories=False,
                 allow_dirty=allow_dirty,
+                fsync=fsync,
             )
 
         return build
@@ -105,12 +111,23 @@ class GitRepositoryContext(ContextBase):
         diff_file: Path | str | None = None,
         search_parent_directories: bool = False,
         allow_dirty: bool = True,
+        fsync: bool = False,
     ) -> None:
         self._name = name
         self._path = Path(path)
         self._search_parent_directories = search_parent_directories
         self._allow_dirty = allow_dirty
         self._diff_file = None if diff_file is None else Path(diff_file)
+        self._fsync = fsync
+
+    @property
+    def shareable(self) -> bool:
+        return True
+
+    @property
+    def side_effect_free(self) -> bool:
+        # Without a diff file, nothing is written
+        return self._diff_file is None
 
     def encapsulate(self) -> _GitRepositoryContextData:
         repo = Repo(self._path, search_parent_directories=self._search_parent_directories)
@@ -135,8 +152,7 @@ class GitRepositoryContext(ContextBase):
         diff_txt = repo.git.diff()
         if diff_txt:
             assert self._diff_file is not None, "diff_file is None"
-            with self._diff_file.open("w") as f:
-                f.write(diff_txt)
+            atomic_write_bytes(self._diff_file, diff_txt.encode(), fsync=self._fsync)
             logger.debug(f"Wrote diff to {self._diff_file}")
             info["diff_file"] = self._diff_file
         return info
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import platform as pf
+import re
+import sys
+from functools import cache
+from importlib import metadata
+from typing import Annotated, TypedDict
+
+import orjson
+from typing_extensions import Doc, NotRequired
+
+from ._base import ContextBase
+
+logger = logging.getLogger(__name__)
+
+
+class _PackageData(TypedDict):
+    name: str
+    version: str
+    direct_url: str | None
+    editable: bool
+
+
+class _PackagesContextData(TypedDict):
+    packages: list[_PackageData]
+    fingerprint: NotRequired[str]
+
+
+def _normalize_name(name: str) -> str:
+    # PEP 503 normalization
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _package_data(dist: metadata.Distribution, name: str) -> _PackageData:
+    direct_url: str | None = None
+    editable = False
+    # PEP 610: packages installed from a URL or a local directory have `direct_url.json`
+    direct_url_json = dist.read_text("direct_url.json")
+    if direct_url_json is not None:
+        try:
+            direct_url_data = orjson.loads(direct_url_json)
+        except orjson.JSONDecodeError:
+            logger.warning(f"Ignoring the invalid direct_url.json of {name}.")
+        else:
+            direct_url = direct_url_data.get("url")
+            editable = bool(direct_url_data.get("dir_info", {}).get("editable", False))
+    return {"name": name, "version": dist.version, "direct_url": direct_url, "editable": editable}
+
+
+@cache
+def _list_packages(path: tuple[str, ...]) -> tuple[_PackageData, ...]:
+    packages: dict[str, _PackageData] = {}
+    for dist in metadata.distributions(path=list(path)):
+        name = dist.metadata["Name"]
+        if name is None:
+            continue
+        key = _normalize_name(name)
+        # If a package is installed in multiple directories, the first one on the path is the one imported
+        if key not in packages:
+            packages[key] = _package_data(dist, name)
+    return tuple(packages[key] for key in sorted(packages))
+
+
+@cache
+def _fingerprint(path: tuple[str, ...]) -> str:
+    data = {"python": [pf.python_implementation(), pf.python_version()], "packages": _list_packages(path)}
+    return hashlib.sha256(orjson.dumps(data)).hexdigest()
+
+
+class PackagesContext(ContextBase):
+    """Context to capture the distribution packages installed in the running interpreter.
+
+    The packages are listed with `importlib.metadata` without spawning a subprocess. The list is memoized
+    per `sys.path`, so packages installed or removed after the first encapsulation are not reflected.
+    """
+
+    def __init__(
+        self,
+        *,
+        fingerprint: Annotated[
+            bool,
+            Doc(
+                "Whether to add a SHA-256 fingerprint of the Python implementation, its version, and the packages. "
+                "Identical environments have the same fingerprint.",
+            ),
+        ] = False,
+    ) -> None:
+        self._fingerprint = fingerprint
+
+    @property
+    def shareable(self) -> bool:
+        return True
+
+    @property
+    def side_effect_free(self) -> bool:
+        return True
+
+    def encapsulate(self) -> _PackagesContextData:
+        path = tuple(sys.path)
+        # Copy the memoized entries so that the capsule can be modified safely
+        data: _PackagesContextData = {"packages": [package.copy() for package in _list_packages(path)]}
+        if self._fingerprint:
+            data["fingerprint"] = _fingerprint(path)
+        return data
+
+    def default_key(self) -> str:
+        return "packages"
@@ -20,6 +20,14 @@ class _PlatformContextData(TypedDict):
 class PlatformContext(ContextBase):
     """Context to capture platform information, including Python version."""
 
+    @property
+    def shareable(self) -> bool:
+        return True
+
+    @property
+    def side_effect_free(self) -> bool:
+        return True
+
     def encapsulate(self) -> _PlatformContextData:
         return {
             "machine": pf.machine(),
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import errno
+import logging
+import os
+import shutil
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# From linux/fs.h
+_FICLONE = 0x40049409
+
+# Errors meaning that the method is not supported for the pair of files, so another method should be tried
+_UNSUPPORTED_ERRNOS = frozenset(
+    {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM},
+)
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    import fcntl  # noqa: PLC0415
+
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    offset = 0
+    while offset < size:
+        try:
+            n_copied = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+        except OSError as e:
+            # Nothing has been written yet, so another method can take over
+            if offset == 0 and e.errno in _UNSUPPORTED_ERRNOS:
+                return False
+            raise
+        if n_copied == 0:
+            break
+        offset += n_copied
+    return True
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> bool:
+    offset = 0
+    while offset < size:
+        try:
+            n_sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        except OSError as e:
+            if offset == 0 and e.errno in _UNSUPPORTED_ERRNOS:
+                return False
+            raise
+        if n_sent == 0:
+            break
+        offset += n_sent
+    return True
+
+
+def copy_file(src: Path, dst: Path) -> None:
+    """Copy the content of `src` to `dst` without passing the data through the user space if possible.
+
+    On Linux, the file is cloned with `FICLONE` on file systems supporting reflinks (Btrfs, XFS, etc.), which
+    shares the data blocks without copying them. Otherwise, `os.copy_file_range` and then `os.sendfile` are tried,
+    which copy the data in the kernel. On the other platforms, `shutil.copyfile` is used, which uses the
+    platform-specific fast-copy functions.
+    """
+    if sys.platform != "linux":
+        shutil.copyfile(src, dst)
+        return
+
+    with src.open("rb") as fsrc, dst.open("wb") as fdst:
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        if _reflink(src_fd, dst_fd):
+            logger.debug(f"Cloned {src} to {dst}")
+            return
+        size = os.fstat(src_fd).st_size
+        if _copy_file_range(src_fd, dst_fd, size) or _sendfile(src_fd, dst_fd, size):
+            return
+        shutil.copyfileobj(fsrc, fdst)
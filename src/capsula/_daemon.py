@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import logging
+import os
+import socketserver
+import subprocess
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import orjson
+
+from ._client import default_socket_path
+from ._run import CommandInfo, Run
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Mapping
+
+    from ._run import RunDtoCommand, SharedPreRun
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _WarmState:
+    run_dto: RunDtoCommand
+    shared: SharedPreRun
+
+
+class CapsulaDaemon:
+    """Server that runs commands with Capsula on behalf of the thin client in `capsula._client`.
+
+    The configuration is loaded and the side-effect-free shareable pre-run contexts (such as `CpuContext`,
+    `PlatformContext`, and `PackagesContext`) are encapsulated once for each working directory, so each request only
+    pays for the other contexts, the command itself, and the reporters.
+
+    The contexts capture the state of the daemon process, so the working directory and the environment variables
+    of the daemon are switched to those of the request in the pre-run and post-run phases. This is serialized
+    across the requests, while the in-run phases, i.e., the commands and the in-run watchers and reporters, run
+    concurrently. Consequently, the in-run watchers and reporters see the working directory and the environment
+    variables of the daemon rather than those of the request.
+    """
+
+    def __init__(
+        self,
+        build_run_dto: Callable[[], RunDtoCommand],
+        *,
+        socket_path: Path | None = None,
+    ) -> None:
+        self._build_run_dto = build_run_dto
+        self._socket_path = default_socket_path() if socket_path is None else socket_path
+        self._warm: dict[Path, _WarmState] = {}
+        self._state_lock = threading.Lock()
+        self._server: socketserver.ThreadingUnixStreamServer | None = None
+
+    @property
+    def socket_path(self) -> Path:
+        return self._socket_path
+
+    @contextmanager
+    def _process_state(self, cwd: Path, env: Mapping[str, str]) -> Iterator[None]:
+        with self._state_lock:
+            previous_cwd = Path.cwd()
+            previous_env = dict(os.environ)
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(env)
+            try:
+                yield
+            finally:
+                os.environ.clear()
+                os.environ.update(previous_env)
+                os.chdir(previous_cwd)
+
+    def _get_warm_state(self, cwd: Path) -> _WarmState:
+        # Called with the process state of the request
+        state = self._warm.get(cwd)
+        if state is None:
+            run_dto = self._build_run_dto()
+            # Relative paths would be resolved against the working directory of another request
+            if run_dto.vault_dir is not None:
+                run_dto.vault_dir = run_dto.vault_dir.resolve()
+            # The record channel sets an environment variable of the daemon process, which is shared by the requests
+            run_dto.record_channel = False
+            template: Run[Any, Any] = Run(replace(run_dto, command=("daemon",)))
+            shared = template.shared_pre_run(include=lambda context: context.side_effect_free)
+            logger.info(f"Warmed up for {cwd}. Shared pre-run directory: {shared.run_dir}")
+            state = self._warm[cwd] = _WarmState(run_dto=run_dto, shared=shared)
+        return state
+
+    def handle(self, message: Mapping[str, Any]) -> dict[str, Any]:
+        command = tuple(message["command"])
+        cwd = Path(message["cwd"])
+        env: dict[str, str] = message["env"]
+
+        with self._process_state(cwd, env):
+            state = self._get_warm_state(cwd)
+            run: Run[Any, Any] = Run(replace(state.run_dto, command=command))
+            params, _ = run.pre_run(CommandInfo(command=command), shared=state.shared)
+
+        def func() -> subprocess.CompletedProcess[str]:
+            return subprocess.run(command, check=False, capture_output=True, text=True, cwd=cwd, env=env)  # noqa: S603
+
+        try:
+            result = run.in_run(params, func)
+        finally:
+            with self._process_state(cwd, env):
+                run.post_run(params)
+
+        return {
+            "returncode": result.returncode,
+            "stdout": result.stdout,
+            "stderr": result.stderr,
+            "run_dir": str(params.run_dir),
+        }
+
+    def serve_forever(self) -> None:
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                try:
+                    response = daemon.handle(orjson.loads(self.rfile.readline()))
+                except Exception as e:
+                    logger.exception("Failed to handle a request.")
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                self.wfile.write(orjson.dumps(response) + b"\n")
+
+        # A socket left by a daemon that was killed would prevent binding
+        if self._socket_path.is_socket():
+            self._socket_path.unlink()
+        self._socket_path.parent.mkdir(parents=True, exist_ok=True)
+        with socketserver.ThreadingUnixStreamServer(str(self._socket_path), Handler) as server:
+            server.daemon_threads = True
+            self._server = server
+            os.chmod(self._socket_path, 0o600)  # noqa: PTH101
+            logger.info(f"Capsula daemon listening on {self._socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                self._socket_path.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
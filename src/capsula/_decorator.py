@@ -9,6 +9,7 @@ from typing_extensions import Doc
 
 from ._config import load_config
 from ._run import (
+    RUN_NAME_FACTORIES,
     CapsuleParams,
     ExecInfo,
     FuncInfo,
@@ -18,6 +19,7 @@ from ._run import (
     default_run_name_factory,
 )
 from ._utils import get_default_config_path, search_for_project_root
+from ._vault import validate_vault_layout
 
 if TYPE_CHECKING:
     from collections.abc import Callable
@@ -25,7 +27,9 @@ if TYPE_CHECKING:
 
     from ._capsule import Capsule
     from ._context import ContextBase
+    from ._memo import ResultSerializer
     from ._reporter import ReporterBase
+    from ._vault import VaultLayout
     from ._watcher import WatcherBase
 
 P = ParamSpec("P")
@@ -165,7 +169,10 @@ def run(  # noqa: C901
     *,
     run_name_factory: Annotated[
         Callable[[FuncInfo, str, datetime], str] | None,
-        Doc("Function to generate the run name. If not specified, the default run name factory will be used."),
+        Doc(
+            "Function to generate the run name. If not specified, the run name factory specified in the config file "
+            "or the default run name factory will be used.",
+        ),
     ] = None,
     ignore_config: Annotated[bool, Doc("Whether to ignore the configuration file.")] = False,
     config_path: Annotated[
@@ -176,6 +183,47 @@ def run(  # noqa: C901
         Path | str | None,
         Doc("Path to the vault directory."),
     ] = None,
+    vault_layout: Annotated[
+        VaultLayout | None,
+        Doc(
+            "Layout of the run directories in the vault directory. "
+            "`flat` places run directories directly under the vault directory, "
+            "`date` under `<YYYY>/<MM>/<DD>` subdirectories, "
+            "and `hash` under subdirectories named after the first two hex digits of the hash of the run name. "
+            "If not specified, the `vault-layout` field in the config file or `flat` will be used.",
+        ),
+    ] = None,
+    record_channel: Annotated[
+        bool | None,
+        Doc(
+            "Whether to let child processes, such as workers of a `multiprocessing.Pool`, record values to the in-run "
+            "capsule with `capsula.record`. If not specified, the `record-channel` field in the config file or "
+            "`False` will be used.",
+        ),
+    ] = None,
+    memoize: Annotated[
+        bool,
+        Doc(
+            "Whether to reuse the result of a previous run with the same arguments, Git commits and diffs, and file "
+            "digests in the pre-run capsule, instead of calling the function again.",
+        ),
+    ] = False,
+    memoize_serializer: Annotated[
+        ResultSerializer | None,
+        Doc(
+            "Serializer of the results to memoize, with the `suffix` attribute and the `dump(result, path)` and "
+            "`load(path)` methods. If not specified, the results are pickled.",
+        ),
+    ] = None,
+    overlap_pre_run: Annotated[
+        bool,
+        Doc(
+            "Whether to encapsulate the side-effect-free pre-run contexts, such as `CpuContext` and "
+            "`PlatformContext`, in background threads while the function is running. The pre-run capsule is "
+            "reported once they are encapsulated, and the capsule passed by `pass_pre_run_capsule` waits for them "
+            "on the first access. Ignored if `memoize` is True.",
+        ),
+    ] = False,
 ) -> Annotated[
     Callable[[Callable[P, T] | RunDtoNoPassPreRunCapsule[P, T] | RunDtoPassPreRunCapsule[P, T]], Run[P, T]],
     Doc("Decorator to create a `Run` object."),
@@ -200,11 +248,21 @@ def run(  # noqa: C901
        it will be used as the vault directory.
     3. The default vault directory is used.
 
+    The vault layout is determined in the same way, with `flat` as the default.
+
     The run name factory is determined by the following priority:
     1. If `run_name_factory` argument is set, it will be used as the run name.
-    2. The default run name factory is used.
+    2. If `ignore_config` argument is False and `run-name-factory` field is present in the config file,
+       the corresponding built-in run name factory (`default` or `ulid`) will be used.
+    3. The default run name factory is used.
+
+    If the run directory already exists, a new run name is generated and the creation is retried.
 
     """
+    if vault_layout is not None:
+        # Fail when the function is decorated rather than when it is called
+        validate_vault_layout(vault_layout)
+
     if run_name_factory is not None:
         # Adjust the function signature of the run name factory
         def _run_name_factory_adjusted(info: ExecInfo | None, random_str: str, timestamp: datetime, /) -> str:
@@ -214,7 +272,7 @@ def run(  # noqa: C901
     else:
         _run_name_factory_adjusted = default_run_name_factory
 
-    def decorator(
+    def decorator(  # noqa: C901
         func_or_run: Callable[P, T] | RunDtoNoPassPreRunCapsule[P, T] | RunDtoPassPreRunCapsule[P, T],
     ) -> Run[P, T]:
         run_dto = (
@@ -224,6 +282,13 @@ def run(  # noqa: C901
         )
         run_dto.run_name_factory = _run_name_factory_adjusted
         run_dto.vault_dir = Path(vault_dir) if vault_dir is not None else None
+        if vault_layout is not None:
+            run_dto.vault_layout = vault_layout
+        if record_channel is not None:
+            run_dto.record_channel = record_channel
+        run_dto.memoize = memoize
+        run_dto.memoize_serializer = memoize_serializer
+        run_dto.overlap_pre_run = overlap_pre_run
 
         if not ignore_config:
             config = load_config(get_default_config_path() if config_path is None else Path(config_path))
@@ -243,6 +308,12 @@ def run(  # noqa: C901
                     run_dto.add_reporter(reporter, mode=phase, append_left=True)
 
             run_dto.vault_dir = config["vault-dir"] if run_dto.vault_dir is None else run_dto.vault_dir
+            if run_name_factory is None and config["run-name-factory"] is not None:
+                run_dto.run_name_factory = RUN_NAME_FACTORIES[config["run-name-factory"]]
+            if vault_layout is None and config["vault-layout"] is not None:
+                run_dto.vault_layout = config["vault-layout"]
+            if record_channel is None and config["record-channel"] is not None:
+                run_dto.record_channel = config["record-channel"]
 
         # Set the vault directory if it is not set by the config file
         if run_dto.vault_dir is None:
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+import orjson
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+PRE_RUN_BLOB_KEY = "__pre_run_blob"
+
+# Part of a volatile key that matches any key at its level
+WILDCARD = "*"
+
+# Keys that differ between runs started from the same environment, including the paths in the run directory
+DEFAULT_VOLATILE_KEYS: tuple[tuple[str, ...], ...] = (
+    ("function",),
+    ("shared_pre_run",),
+    ("file", WILDCARD, "copied_to"),
+    ("file", WILDCARD, "moved_to"),
+    ("git", WILDCARD, "diff_file"),
+    ("command", WILDCARD, "stdout_file", "path"),
+    ("command", WILDCARD, "stderr_file", "path"),
+)
+
+
+def normalize_volatile_keys(keys: Sequence[str | Sequence[str]] | None) -> tuple[tuple[str, ...], ...]:
+    if keys is None:
+        return DEFAULT_VOLATILE_KEYS
+    return tuple((key,) if isinstance(key, str) else tuple(key) for key in keys)
+
+
+def _expand_key(nested: Mapping[str, Any], key: tuple[str, ...]) -> list[tuple[str, ...]]:
+    """Expand the wildcards in `key` to the keys present in `nested`."""
+    frontier: list[tuple[tuple[str, ...], Mapping[str, Any]]] = [((), nested)]
+    for part in key[:-1]:
+        expanded = []
+        for prefix, node in frontier:
+            for name in node if part == WILDCARD else (part,):
+                child = node.get(name)
+                if isinstance(child, Mapping):
+                    expanded.append(((*prefix, name), child))
+        frontier = expanded
+    return [
+        (*prefix, name)
+        for prefix, node in frontier
+        for name in (node if key[-1] == WILDCARD else (key[-1],))
+        if name in node
+    ]
+
+
+def split_volatile(
+    nested: Mapping[str, Any],
+    volatile_keys: Sequence[tuple[str, ...]],
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Split a nested capsule into the stable part and the volatile part.
+
+    Each volatile key is a path in the nested capsule, e.g., `("function",)` or `("env", "SLURM_JOB_ID")`.
+    A `"*"` in the path matches any key at its level, e.g., `("file", "*", "copied_to")`.
+    The input is not modified; the dictionaries on the paths are copied before removing the values.
+    Dictionaries emptied by the removal are removed as well.
+    """
+    stable = dict(nested)
+    volatile: dict[str, Any] = {}
+    for key in (expanded for volatile_key in volatile_keys for expanded in _expand_key(nested, volatile_key)):
+        parents = [stable]
+        for part in key[:-1]:
+            child = parents[-1].get(part)
+            if not isinstance(child, Mapping):
+                break
+            parents[-1][part] = child = dict(child)
+            parents.append(child)
+        else:
+            if key[-1] not in parents[-1]:
+                continue
+            value = parents[-1].pop(key[-1])
+            for depth in range(len(parents) - 1, 0, -1):
+                if parents[depth]:
+                    break
+                del parents[depth - 1][key[depth - 1]]
+            target = volatile
+            for part in key[:-1]:
+                target = target.setdefault(part, {})
+            target[key[-1]] = value
+    return stable, volatile
+
+
+def merge_nested(base: Mapping[str, Any], other: Mapping[str, Any]) -> dict[str, Any]:
+    """Merge two nested capsules. Values in `other` take precedence, except that dictionaries are merged."""
+    merged = dict(base)
+    stack = [(merged, other)]
+    while stack:
+        target, source = stack.pop()
+        for key, value in source.items():
+            current = target.get(key)
+            if isinstance(current, Mapping) and isinstance(value, Mapping):
+                target[key] = current = dict(current)
+                stack.append((current, value))
+            else:
+                target[key] = value
+    return merged
+
+
+def fingerprint(
+    stable: Mapping[str, Any],
+    *,
+    default: Callable[[Any], Any] | None = None,
+) -> str:
+    """Compute the SHA-256 digest of the canonical JSON representation of the stable part of a capsule."""
+    return hashlib.sha256(orjson.dumps(stable, default=default, option=orjson.OPT_SORT_KEYS)).hexdigest()
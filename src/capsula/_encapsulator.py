@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 import queue
 import threading
 import warnings
@@ -15,6 +16,7 @@ from ._exceptions import CapsulaError
 from ._watcher import WatcherBase, WatcherGroup
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from types import TracebackType
 
     from typing_extensions import Self
@@ -38,6 +40,12 @@ class ObjectContext(ContextBase):
 class Encapsulator:
     _thread_local = threading.local()
 
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        # A forked child process inherits the context stack of the forking thread, but records added to the inherited
+        # encapsulators would never reach the parent process. Start with an empty stack instead.
+        cls._thread_local = threading.local()
+
     @classmethod
     def _get_context_stack(cls) -> queue.LifoQueue[Self]:
         if not hasattr(cls._thread_local, "context_stack"):
@@ -54,6 +62,9 @@ class Encapsulator:
     def __init__(self) -> None:
         self.contexts: OrderedDict[_CapsuleItemKey, ContextBase] = OrderedDict()
         self.watchers: OrderedDict[_CapsuleItemKey, WatcherBase] = OrderedDict()
+        self._record_listeners: list[Callable[[_CapsuleItemKey, Any], None]] = []
+        # Records can be added from the thread of the record server as well
+        self._lock = threading.Lock()
 
     def __enter__(self) -> Self:
         self._get_context_stack().put(self)
@@ -70,12 +81,19 @@ class Encapsulator:
     def add_context(self, context: ContextBase, key: _CapsuleItemKey | None = None) -> None:
         if key is None:
             key = context.default_key()
-        if key in self.contexts or key in self.watchers:
-            raise KeyConflictError(key)
-        self.contexts[key] = context
+        with self._lock:
+            if key in self.contexts or key in self.watchers:
+                raise KeyConflictError(key)
+            self.contexts[key] = context
 
     def record(self, key: _CapsuleItemKey, record: Any) -> None:
         self.add_context(ObjectContext(record), key)
+        for listener in self._record_listeners:
+            listener(key, record)
+
+    def add_record_listener(self, listener: Callable[[_CapsuleItemKey, Any], None]) -> None:
+        """Add a function to be called with the key and the value of each record as soon as it is recorded."""
+        self._record_listeners.append(listener)
 
     def add_watcher(self, watcher: WatcherBase, key: _CapsuleItemKey | None = None) -> None:
         if key is None:
@@ -99,3 +117,7 @@ class Encapsulator:
 
     def watch(self) -> WatcherGroup[_CapsuleItemKey, WatcherBase]:
         return WatcherGroup(self.watchers)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Encapsulator._reset_after_fork)  # noqa: SLF001
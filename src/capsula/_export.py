@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Any, Literal, TypeAlias, get_args
+
+import orjson
+from typing_extensions import Doc
+
+from ._exceptions import CapsulaConfigurationError
+from ._reporter import load_report
+from ._reporter._json import default_preset
+from ._utils import to_flat_dict
+from ._vault import is_shared_pre_run_dir, iter_run_dirs
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+ExportFormat: TypeAlias = Literal["parquet", "arrow"]
+_Phase: TypeAlias = Literal["pre", "in", "post"]
+_Kind: TypeAlias = Literal["bool", "int", "float", "str"]
+
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow as pa  # noqa: PLC0415
+    except ImportError as e:
+        msg = "Exporting runs requires the `pyarrow` package. Install `capsula[export]`."
+        raise CapsulaConfigurationError(msg) from e
+    return pa
+
+
+def _normalize_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # Lists, durations, paths, etc. are stored as JSON strings so that the column types stay simple
+    return orjson.dumps(value, default=default_preset).decode()
+
+
+def _flatten_run(run_dir: Path, *, phases: Sequence[_Phase], sep: str) -> dict[str, Any]:
+    row: dict[str, Any] = {"run_name": run_dir.name, "run_dir": str(run_dir)}
+    for phase in phases:
+        try:
+            report = load_report(run_dir, phase=phase)
+        except FileNotFoundError:
+            continue
+        except Exception:
+            logger.exception(f"Failed to load the {phase}-run report of {run_dir}. Skipping.")
+            continue
+        for key, value in to_flat_dict(report).items():  # type: ignore[arg-type]
+            row[sep.join((phase, *map(str, key)))] = _normalize_value(value)
+    return row
+
+
+def _kind_of(value: Any) -> _Kind:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if _INT64_MIN <= value <= _INT64_MAX else "str"
+    if isinstance(value, float):
+        return "float"
+    return "str"
+
+
+class _SchemaBuilder:
+    """Infer the column types incrementally, batch by batch.
+
+    The type of a column is fixed by the first non-null value, except that integer columns are promoted to
+    floating-point columns when a float is found. Values that do not fit the type of the column are stored as null.
+    """
+
+    def __init__(self) -> None:
+        self.kinds: dict[str, _Kind] = {}
+        self._warned_columns: set[str] = set()
+
+    def _coerce(self, column: str, value: Any) -> Any:
+        if value is None:
+            return None
+        kind = _kind_of(value)
+        current_kind = self.kinds.setdefault(column, kind)
+        if kind == current_kind:
+            return str(value) if kind == "str" else value
+        if current_kind == "int" and kind == "float":
+            self.kinds[column] = "float"
+            return value
+        if current_kind == "float" and kind == "int":
+            return float(value)
+        if column not in self._warned_columns:
+            logger.warning(f"Column {column} has values of both {current_kind} and {kind}. Storing the latter as null.")
+            self._warned_columns.add(column)
+        return None
+
+    def to_table(self, rows: list[dict[str, Any]]) -> Any:
+        pa = _import_pyarrow()
+        columns: dict[str, list[Any]] = {}
+        for i, row in enumerate(rows):
+            for column, value in row.items():
+                columns.setdefault(column, [None] * i)
+                columns[column].append(self._coerce(column, value))
+            for values in columns.values():
+                if len(values) <= i:
+                    values.append(None)
+
+        arrow_types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+        arrays = {
+            column: pa.array(values, type=arrow_types[self.kinds.get(column, "str")])
+            for column, values in columns.items()
+        }
+        return pa.table(arrays)
+
+
+def _batched(iterable: Iterable[Path], n: int) -> Iterator[list[Path]]:
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, n)):
+        yield batch
+
+
+def export_runs(
+    vault_dir: Annotated[Path | str, Doc("Vault directory.")],
+    output_dir: Annotated[
+        Path | str,
+        Doc("Directory of the dataset to create. Must not exist or be empty."),
+    ],
+    *,
+    format: Annotated[ExportFormat, Doc("Format of the dataset, `parquet` or `arrow` (Arrow IPC).")] = "parquet",  # noqa: A002
+    phases: Annotated[
+        Sequence[_Phase],
+        Doc("Phases of the reports to export."),
+    ] = ("pre", "in", "post"),
+    batch_size: Annotated[int, Doc("Number of runs per part file of the dataset.")] = 1024,
+    max_workers: Annotated[
+        int | None,
+        Doc("Maximum number of processes to parse the reports. If 1, the reports are parsed in this process."),
+    ] = None,
+    sep: Annotated[str, Doc("Separator to join the keys of the nested reports into column names.")] = ".",
+) -> Annotated[int, Doc("Number of exported runs.")]:
+    """Export the reports of the runs in a vault to a columnar dataset, one row per run.
+
+    The columns are `run_name`, `run_dir`, and the flattened keys of the reports prefixed by the phase,
+    e.g., `pre.git.capsula.sha` or `in.pi_estimate`. Lists and other non-scalar values are stored as JSON strings.
+    The directories of the pre-run capsules shared by sweeps, batches, sessions, and the daemon are skipped,
+    because their values are also in the pre-run reports of the runs that share them.
+
+    The runs are processed in batches of `batch_size`, each written as a part file of the dataset
+    (`part-00000.parquet`, `part-00001.parquet`, ...), so that the memory usage is bounded regardless of the number
+    of runs. The column types are inferred incrementally, and for Parquet, the unified schema is written to
+    `_common_metadata`. Read the dataset with, e.g., `pandas.read_parquet(output_dir)` or
+    `pyarrow.dataset.dataset(output_dir, format="arrow")`.
+
+    Unless `max_workers` is 1, the reports are parsed in spawned processes, so call this function under
+    `if __name__ == "__main__":` in a script.
+    """
+    pa = _import_pyarrow()
+    if format not in get_args(ExportFormat):
+        msg = f"format must be one of {', '.join(get_args(ExportFormat))}, not {format!r}."
+        raise ValueError(msg)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if any(output_dir.iterdir()):
+        msg = f"Output directory {output_dir} is not empty."
+        raise FileExistsError(msg)
+
+    flatten = partial(_flatten_run, phases=tuple(phases), sep=sep)
+    schema_builder = _SchemaBuilder()
+    schemas = []
+    n_runs = 0
+    # pyarrow starts threads, so the worker processes are spawned instead of forked
+    executor = (
+        None
+        if max_workers == 1
+        else ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    )
+    try:
+        # The shared pre-run capsules are already in the rows of the runs that share them
+        run_dir_iter = (run_dir for run_dir in iter_run_dirs(Path(vault_dir)) if not is_shared_pre_run_dir(run_dir))
+        for i, run_dirs in enumerate(_batched(run_dir_iter, batch_size)):
+            rows = list(map(flatten, run_dirs) if executor is None else executor.map(flatten, run_dirs, chunksize=16))
+            table = schema_builder.to_table(rows)
+            schemas.append(table.schema)
+            _write_part(table, output_dir / f"part-{i:05d}.{format}", format)
+            n_runs += len(rows)
+            logger.debug(f"Exported {n_runs} runs")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if format == "parquet" and schemas:
+        import pyarrow.parquet as pq  # noqa: PLC0415
+
+        pq.write_metadata(pa.unify_schemas(schemas, promote_options="permissive"), output_dir / "_common_metadata")
+    return n_runs
+
+
+def _write_part(table: Any, path: Path, format: ExportFormat) -> None:  # noqa: A002
+    pa = _import_pyarrow()
+    if format == "parquet":
+        import pyarrow.parquet as pq  # noqa: PLC0415
+
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Protocol, TypedDict
+
+from typing_extensions import NotRequired
+
+from ._backport import file_digest
+from ._exceptions import CapsulaConfigurationError
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from pathlib import Path
+
+    from typing_extensions import Buffer
+
+_XXHASH_ALGORITHMS = ("xxh32", "xxh64", "xxh3_64", "xxh3_128", "xxh128")
+
+_READ_SIZE = 2**20
+
+
+class Hasher(Protocol):
+    def update(self, data: Buffer, /) -> object: ...
+
+    def digest(self) -> bytes: ...
+
+    def hexdigest(self) -> str: ...
+
+
+class HashData(TypedDict):
+    algorithm: str
+    digest: str
+    chunk_size: NotRequired[int]
+
+
+def _import_xxhash() -> Any:
+    try:
+        import xxhash  # noqa: PLC0415
+    except ImportError as e:
+        msg = "xxHash algorithms require the `xxhash` package. Install `capsula[xxhash]`."
+        raise CapsulaConfigurationError(msg) from e
+    return xxhash
+
+
+def _import_blake3() -> Any:
+    try:
+        import blake3  # noqa: PLC0415
+    except ImportError as e:
+        msg = "BLAKE3 requires the `blake3` package. Install `capsula[blake3]`."
+        raise CapsulaConfigurationError(msg) from e
+    return blake3
+
+
+def new_hasher(algorithm: str) -> Hasher:
+    """Create a hash object of `algorithm`.
+
+    `algorithm` is a name accepted by `hashlib.new`, an xxHash algorithm, or `blake3`.
+    """
+    if algorithm in _XXHASH_ALGORITHMS:
+        return getattr(_import_xxhash(), algorithm)()  # type: ignore[no-any-return]
+    if algorithm == "blake3":
+        return _import_blake3().blake3()  # type: ignore[no-any-return]
+    try:
+        return hashlib.new(algorithm)
+    except ValueError as e:
+        msg = f"Unsupported hash algorithm: {algorithm}"
+        raise CapsulaConfigurationError(msg) from e
+
+
+def validate_hash_algorithm(algorithm: str) -> str:
+    # Fail early rather than after the run has finished
+    new_hasher(algorithm)
+    return algorithm
+
+
+def _hash_range(path: Path, algorithm: str, offset: int, length: int) -> bytes:
+    hasher = new_hasher(algorithm)
+    buf = bytearray(min(_READ_SIZE, length))
+    view = memoryview(buf)
+    # Each thread opens the file by itself so that the ranges are read concurrently without sharing the position
+    with path.open("rb", buffering=0) as f:
+        f.seek(offset)
+        while length > 0:
+            size = f.readinto(view[: min(len(buf), length)])
+            if not size:
+                break
+            hasher.update(view[:size])
+            length -= size
+    return hasher.digest()
+
+
+def compute_file_digests(path: Path, algorithms: Sequence[str]) -> list[str]:
+    """Compute the hex digests of a file with multiple algorithms, reading the file only once."""
+    hashers = [new_hasher(algorithm) for algorithm in algorithms]
+    buf = bytearray(_READ_SIZE)
+    view = memoryview(buf)
+    with path.open("rb", buffering=0) as f:
+        while size := f.readinto(buf):
+            for hasher in hashers:
+                hasher.update(view[:size])
+    return [hasher.hexdigest() for hasher in hashers]
+
+
+def compute_file_hash(
+    path: Path,
+    algorithm: str,
+    *,
+    chunk_size: int | None = None,
+    max_workers: int | None = None,
+) -> HashData:
+    """Compute the digest of a file.
+
+    If `chunk_size` is provided, the file is split into ranges of `chunk_size` bytes, which are hashed in
+    `max_workers` threads, and the digest is that of the concatenated digests of the ranges, in order, computed with
+    the same algorithm. The chunk size is recorded in the result, as the digest depends on it.
+    BLAKE3 is a tree hash by design, so it is always computed with multiple threads, and `chunk_size` is ignored.
+    """
+    if algorithm == "blake3":
+        blake3 = _import_blake3()
+        hasher = blake3.blake3(max_threads=blake3.blake3.AUTO if max_workers is None else max_workers)
+        hasher.update_mmap(path)
+        return {"algorithm": algorithm, "digest": hasher.hexdigest()}
+
+    if chunk_size is None:
+        with path.open("rb") as f:
+            digest = file_digest(f, lambda: new_hasher(algorithm)).hexdigest()  # type: ignore[arg-type,return-value]
+        return {"algorithm": algorithm, "digest": digest}
+
+    if chunk_size <= 0:
+        msg = f"chunk_size must be positive, not {chunk_size}."
+        raise ValueError(msg)
+    size = path.stat().st_size
+    offsets = range(0, max(size, 1), chunk_size)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        chunk_digests = executor.map(lambda offset: _hash_range(path, algorithm, offset, chunk_size), offsets)
+        root = new_hasher(algorithm)
+        for chunk_digest in chunk_digests:
+            root.update(chunk_digest)
+    return {"algorithm": algorithm, "digest": root.hexdigest(), "chunk_size": chunk_size}
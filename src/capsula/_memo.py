@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+from datetime import timedelta
+from pathlib import Path, PurePath
+from typing import TYPE_CHECKING, Any, Protocol, TypedDict
+
+import orjson
+
+from ._backport import file_digest
+from ._utils import atomic_write_bytes
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping, Sequence
+
+    from ._capsule import Capsule
+
+logger = logging.getLogger(__name__)
+
+MEMO_RESULT_NAME = "memoized-result"
+# Kinds of the contexts whose values are part of the cache key, so they are encapsulated for each call
+MEMO_KEY_CONTEXT_KINDS = frozenset({"git", "file"})
+
+
+class ResultSerializer(Protocol):
+    """Protocol of the serializers of the results of memoized functions."""
+
+    suffix: str
+
+    def dump(self, result: Any, path: Path) -> None: ...
+
+    def load(self, path: Path) -> Any: ...
+
+
+class PickleSerializer:
+    """Serializer to store the results with `pickle`."""
+
+    suffix = ".pkl"
+
+    def dump(self, result: Any, path: Path) -> None:
+        atomic_write_bytes(path, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load(self, path: Path) -> Any:
+        return pickle.loads(path.read_bytes())  # noqa: S301
+
+
+class MemoEntry(TypedDict):
+    run_dir: Path
+    result_path: Path
+
+
+def key_default(obj: Any) -> Any:
+    """Serialize the objects that `orjson` does not support natively for a cache key.
+
+    Only the types whose serialization identifies their values are supported. `TypeError` is raised for the other
+    objects, because their representation, e.g., `repr`, may be the same for different values and would make
+    different calls share a key.
+    """
+    if isinstance(obj, (PurePath, timedelta)):
+        return str(obj)
+    msg = f"Type {type(obj).__qualname__} has no stable serialization for a cache key."
+    raise TypeError(msg)
+
+
+def key_digest(key_data: Mapping[str, Any]) -> str:
+    """SHA-256 digest of `key_data` serialized with `key_default`, raising `TypeError` if it cannot be serialized."""
+    return hashlib.sha256(
+        orjson.dumps(key_data, default=key_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS),
+    ).hexdigest()
+
+
+def bind_arguments(
+    func: Callable[..., Any],
+    args: Sequence[Any],
+    kwargs: Mapping[str, Any],
+    *,
+    pass_pre_run_capsule: bool,
+) -> dict[str, Any]:
+    sig = inspect.signature(func)
+    if pass_pre_run_capsule:
+        sig = sig.replace(parameters=tuple(sig.parameters.values())[1:])
+    ba = sig.bind(*args, **kwargs)
+    ba.apply_defaults()
+    return dict(ba.arguments)
+
+
+def memo_key(func: Any, bound_args: Mapping[str, Any], pre_run_capsule: Capsule) -> str:
+    """Compute the cache key of a call from the bound arguments and the Git and file digests in the pre-run capsule.
+
+    The bound arguments recorded by a `FunctionContext`, which excludes the ignored arguments, take precedence
+    over `bound_args`. `TypeError` is raised if any of the arguments cannot be serialized stably.
+    """
+    git: dict[str, Any] = {}
+    files: dict[str, Any] = {}
+    for key, value in pre_run_capsule.data.items():
+        if not (isinstance(key, tuple) and len(key) == 2 and isinstance(value, dict)):
+            continue
+        kind, name = key
+        if kind == "function" and name == func.__name__:
+            bound_args = value["bound_args"]
+        elif kind == "git":
+            diff_file = value.get("diff_file")
+            diff_digest = None
+            if diff_file is not None:
+                with Path(diff_file).open("rb") as f:
+                    diff_digest = file_digest(f, "sha256").hexdigest()
+            git[name] = {"sha": value["sha"], "diff": diff_digest}
+        elif kind == "file":
+            files[name] = value.get("hash")
+
+    key_data = {
+        "function": f"{func.__module__}.{func.__qualname__}",
+        "bound_args": bound_args,
+        "git": git,
+        "files": files,
+    }
+    return key_digest(key_data)
+
+
+class MemoIndex:
+    """Index of the memoized results in a vault, stored in `<vault>/.cache/memo/<key>.json`."""
+
+    def __init__(self, vault_dir: Path) -> None:
+        self._vault_dir = vault_dir
+        self._index_dir = vault_dir / ".cache" / "memo"
+
+    def lookup(self, key: str) -> MemoEntry | None:
+        try:
+            entry = orjson.loads((self._index_dir / f"{key}.json").read_bytes())
+        except FileNotFoundError:
+            return None
+        except orjson.JSONDecodeError:
+            logger.warning(f"Ignoring the corrupted memo index entry {key}.")
+            return None
+        run_dir = self._vault_dir / entry["run_dir"]
+        result_path = run_dir / entry["result"]
+        if not result_path.exists():
+            logger.warning(f"Memoized result {result_path} has been removed. Running the function again.")
+            return None
+        return {"run_dir": run_dir, "result_path": result_path}
+
+    def store(self, key: str, result_path: Path) -> None:
+        self._index_dir.mkdir(parents=True, exist_ok=True)
+        # Paths relative to the vault keep the index valid when the vault is moved
+        entry = {
+            "run_dir": Path(os.path.relpath(result_path.parent, self._vault_dir)).as_posix(),
+            "result": result_path.name,
+        }
+        atomic_write_bytes(self._index_dir / f"{key}.json", orjson.dumps(entry), record_digest=False)
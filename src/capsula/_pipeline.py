@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Any
+
+import orjson
+from typing_extensions import Doc
+
+from ._backport import file_digest
+from ._exceptions import CapsulaConfigurationError, CapsulaError
+from ._memo import key_digest
+from ._reporter._json import default_preset
+from ._utils import atomic_write_bytes
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+    from ._run import Run
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_FILE_NAME = "pipeline.json"
+
+
+@dataclass
+class Stage:
+    """Stage of a pipeline, i.e., a call of a run that reads `inputs` and writes `outputs`.
+
+    The paths are relative to the root of the pipeline. A stage depends on the stages whose outputs are its
+    inputs, or contain or are contained in its inputs.
+    """
+
+    run: Run[..., Any]
+    inputs: Sequence[Path | str] = ()
+    outputs: Sequence[Path | str] = ()
+    kwargs: Mapping[str, Any] = field(default_factory=dict)
+    name: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.run.func is None:
+            msg = "Pipeline stages only support runs of functions."
+            raise TypeError(msg)
+        if self.name is None:
+            self.name = self.run.func.__name__
+
+
+@dataclass
+class StageResult:
+    """Result of a stage in a pipeline."""
+
+    name: str
+    run_dir: Path | None
+    skipped: bool = False
+    exception: BaseException | None = None
+
+
+def _path_digest(path: Path) -> str | None:
+    """Compute the SHA-256 digest of a file, or of the relative paths and digests of the files in a directory."""
+    if path.is_file():
+        with path.open("rb") as f:
+            return file_digest(f, "sha256").hexdigest()
+    if not path.is_dir():
+        return None
+    hasher = hashlib.sha256()
+    for file_path in sorted(p for p in path.rglob("*") if p.is_file()):
+        with file_path.open("rb") as f:
+            digest = file_digest(f, "sha256").hexdigest()
+        hasher.update(f"{file_path.relative_to(path).as_posix()}\0{digest}\n".encode())
+    return hasher.hexdigest()
+
+
+def _code_fingerprint(run: Run[..., Any]) -> str:
+    func = run.func
+    assert func is not None
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        logger.warning(f"Source of {func.__qualname__} is not available. Changes to the code will not be detected.")
+        source = f"{func.__module__}.{func.__qualname__}"
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _overlaps(a: Path, b: Path) -> bool:
+    return a == b or a in b.parents or b in a.parents
+
+
+def _execute_stage(run: Run[..., Any], kwargs: Mapping[str, Any]) -> Path:
+    run(**kwargs)
+    return run.run_dir
+
+
+class _StageIndex:
+    """Index of the last successful run of each stage, stored in `<vault>/.cache/pipeline/<stage>.json`."""
+
+    def __init__(self, vault_dir: Path, name: str) -> None:
+        self._vault_dir = vault_dir
+        self._path = vault_dir / ".cache" / "pipeline" / f"{name}.json"
+
+    def lookup(self, key: str, outputs: Mapping[str, Path]) -> Path | None:
+        try:
+            entry = orjson.loads(self._path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except orjson.JSONDecodeError:
+            logger.warning(f"Ignoring the corrupted pipeline index {self._path}.")
+            return None
+        if entry["key"] != key or set(entry["outputs"]) != set(outputs):
+            return None
+        # The outputs may have been modified or removed since the last run
+        if any(_path_digest(path) != entry["outputs"][name] for name, path in outputs.items()):
+            return None
+        run_dir = self._vault_dir / entry["run_dir"]
+        return run_dir if run_dir.is_dir() else None
+
+    def store(self, key: str, run_dir: Path, output_digests: Mapping[str, str | None]) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "key": key,
+            "run_dir": Path(os.path.relpath(run_dir, self._vault_dir)).as_posix(),
+            "outputs": output_digests,
+        }
+        atomic_write_bytes(self._path, orjson.dumps(entry), record_digest=False)
+
+
+class _PlannedStage:
+    def __init__(self, stage: Stage, root: Path) -> None:
+        assert stage.name is not None
+        self.name = stage.name
+        self.stage = stage
+        self.inputs = {Path(p).as_posix(): (root / p).resolve() for p in stage.inputs}
+        self.outputs = {Path(p).as_posix(): (root / p).resolve() for p in stage.outputs}
+        self.upstream: set[str] = set()
+        self.key: str | None = None
+        self.input_digests: dict[str, str | None] = {}
+
+    def compute_key(self) -> str:
+        self.input_digests = {name: _path_digest(path) for name, path in self.inputs.items()}
+        for name, digest in self.input_digests.items():
+            if digest is None:
+                msg = f"Input {name} of stage {self.name} does not exist."
+                raise CapsulaError(msg)
+        key_data = {
+            "code": _code_fingerprint(self.stage.run),
+            "kwargs": self.stage.kwargs,
+            "inputs": self.input_digests,
+            "outputs": sorted(self.outputs),
+        }
+        self.key = key_digest(key_data)
+        return self.key
+
+
+def _plan(stages: Iterable[Stage], root: Path) -> dict[str, _PlannedStage]:
+    planned: dict[str, _PlannedStage] = {}
+    for stage in stages:
+        ps = _PlannedStage(stage, root)
+        if ps.name in planned:
+            msg = f"Duplicate stage name: {ps.name}"
+            raise CapsulaConfigurationError(msg)
+        try:
+            key_digest(dict(stage.kwargs))
+        except TypeError as e:
+            # Keying the stage by an unstable representation could skip it when its arguments have changed
+            msg = f"Keyword arguments of stage {ps.name} cannot be used in the key of the stage: {e}"
+            raise CapsulaConfigurationError(msg) from e
+        planned[ps.name] = ps
+
+    producers: dict[Path, str] = {}
+    for ps in planned.values():
+        for path in ps.outputs.values():
+            for other_path, other_name in producers.items():
+                if _overlaps(path, other_path):
+                    msg = f"Outputs of stages {other_name} and {ps.name} overlap: {other_path} and {path}"
+                    raise CapsulaConfigurationError(msg)
+            producers[path] = ps.name
+
+    for ps in planned.values():
+        for path in ps.inputs.values():
+            ps.upstream.update(name for out, name in producers.items() if name != ps.name and _overlaps(path, out))
+
+    _check_acyclic(planned)
+    return planned
+
+
+def _check_acyclic(planned: Mapping[str, _PlannedStage]) -> None:
+    # Kahn's algorithm, only to detect cycles before running anything
+    n_upstream = {name: len(ps.upstream) for name, ps in planned.items()}
+    ready = [name for name, n in n_upstream.items() if n == 0]
+    n_visited = 0
+    while ready:
+        name = ready.pop()
+        n_visited += 1
+        for other in planned.values():
+            if name in other.upstream:
+                n_upstream[other.name] -= 1
+                if n_upstream[other.name] == 0:
+                    ready.append(other.name)
+    if n_visited != len(planned):
+        cyclic = sorted(name for name, n in n_upstream.items() if n > 0)
+        msg = f"Stages have cyclic dependencies: {', '.join(cyclic)}"
+        raise CapsulaConfigurationError(msg)
+
+
+def _write_link(ps: _PlannedStage, run_dir: Path, results: Mapping[str, StageResult]) -> None:
+    link = {
+        "stage": ps.name,
+        "key": ps.key,
+        "inputs": ps.input_digests,
+        "upstream": {name: results[name].run_dir for name in sorted(ps.upstream)},
+    }
+    atomic_write_bytes(
+        run_dir / PIPELINE_FILE_NAME,
+        orjson.dumps(link, default=default_preset, option=orjson.OPT_INDENT_2),
+    )
+
+
+def run_pipeline(
+    stages: Annotated[Iterable[Stage], Doc("Stages of the pipeline, in any order.")],
+    *,
+    root: Annotated[
+        Path | str | None,
+        Doc("Directory the input and output paths are relative to. If not provided, the current working directory."),
+    ] = None,
+    max_workers: Annotated[
+        int | None,
+        Doc(
+            "Maximum number of worker processes. If not provided, the number of processors is used. "
+            "If 1, the stages are run in the current process.",
+        ),
+    ] = None,
+    force: Annotated[bool, Doc("Whether to run all the stages even if they are up to date.")] = False,
+) -> Annotated[dict[str, StageResult], Doc("Results of the stages, keyed by the stage names.")]:
+    """Run the stages of a pipeline in the order of their dependencies, skipping the stages that are up to date.
+
+    A stage is up to date if its code, keyword arguments, and the digests of its inputs are the same as in the
+    last successful run of the stage and its outputs have not changed since then. The last successful runs are
+    indexed in `<vault>/.cache/pipeline/`.
+    Stages whose upstream stages have finished are run in parallel in a process pool.
+    Each run directory of a stage has a `pipeline.json` file with the digests of the inputs and the run directories
+    of the upstream stages.
+
+    The stages communicate through their inputs and outputs; the return values of the functions are discarded.
+    Unless `max_workers` is 1, the functions must be defined at the top level of a module so that the worker
+    processes can import them.
+
+    Example:
+    ```python
+    import capsula
+
+    @capsula.run()
+    def preprocess() -> None: ...
+
+    @capsula.run()
+    def train(lr: float) -> None: ...
+
+    if __name__ == "__main__":
+        capsula.run_pipeline([
+            capsula.Stage(preprocess, inputs=["data/raw"], outputs=["data/processed"]),
+            capsula.Stage(train, inputs=["data/processed"], outputs=["model.pt"], kwargs={"lr": 0.1}),
+        ])
+    ```
+
+    """
+    root_path = Path.cwd() if root is None else Path(root)
+    planned = _plan(stages, root_path)
+    results: dict[str, StageResult] = {}
+    pending = dict(planned)
+    running: dict[Future[Path], _PlannedStage] = {}
+
+    executor = None if max_workers == 1 else ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            # Starting a stage may complete it immediately, e.g., if it is skipped, making other stages ready
+            while ready := [ps for ps in pending.values() if ps.upstream.issubset(results)]:
+                for ps in ready:
+                    del pending[ps.name]
+                    future = _start_stage(ps, results, executor, force=force)
+                    if future is not None:
+                        running[future] = ps
+                    if executor is None:
+                        # Stages run in the current process are already finished
+                        while running:
+                            _finish_stage(*running.popitem(), results)
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _finish_stage(future, running.pop(future), results)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return {name: results[name] for name in planned}
+
+
+def _start_stage(
+    ps: _PlannedStage,
+    results: dict[str, StageResult],
+    executor: ProcessPoolExecutor | None,
+    *,
+    force: bool,
+) -> Future[Path] | None:
+    failed_upstream = sorted(name for name in ps.upstream if results[name].exception is not None)
+    if failed_upstream:
+        msg = f"Upstream stages of {ps.name} failed: {', '.join(failed_upstream)}"
+        results[ps.name] = StageResult(name=ps.name, run_dir=None, exception=CapsulaError(msg))
+        return None
+    try:
+        key = ps.compute_key()
+    except CapsulaError as e:
+        results[ps.name] = StageResult(name=ps.name, run_dir=None, exception=e)
+        return None
+
+    cached_run_dir = None if force else _StageIndex(ps.stage.run.vault_dir, ps.name).lookup(key, ps.outputs)
+    if cached_run_dir is not None:
+        logger.info(f"Stage {ps.name} is up to date with {cached_run_dir}")
+        results[ps.name] = StageResult(name=ps.name, run_dir=cached_run_dir, skipped=True)
+        return None
+
+    logger.info(f"Running stage {ps.name}")
+    if executor is not None:
+        return executor.submit(_execute_stage, ps.stage.run, ps.stage.kwargs)
+    future: Future[Path] = Future()
+    try:
+        future.set_result(_execute_stage(ps.stage.run, ps.stage.kwargs))
+    except Exception as e:  # noqa: BLE001
+        future.set_exception(e)
+    return future
+
+
+def _finish_stage(future: Future[Path], ps: _PlannedStage, results: dict[str, StageResult]) -> None:
+    exception = future.exception()
+    if exception is not None:
+        logger.warning(f"Stage {ps.name} failed: {exception}")
+        results[ps.name] = StageResult(name=ps.name, run_dir=None, exception=exception)
+        return
+    run_dir = future.result()
+    results[ps.name] = StageResult(name=ps.name, run_dir=run_dir)
+    _write_link(ps, run_dir, results)
+
+    output_digests = {name: _path_digest(path) for name, path in ps.outputs.items()}
+    missing = sorted(name for name, digest in output_digests.items() if digest is None)
+    if missing:
+        logger.warning(f"Stage {ps.name} did not write its outputs: {', '.join(missing)}")
+        return
+    assert ps.key is not None
+    _StageIndex(ps.stage.run.vault_dir, ps.name).store(ps.key, run_dir, output_digests)
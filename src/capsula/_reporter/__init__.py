@@ -1,4 +1,7 @@
-__all__ = ["JsonDumpReporter", "ReporterBase", "SlackReporter"]
+__all__ = ["JsonDumpReporter", "JsonLinesReporter", "MsgpackReporter", "ReporterBase", "SlackReporter", "load_report"]
 from ._base import ReporterBase
 from ._json import JsonDumpReporter
+from ._jsonl import JsonLinesReporter
+from ._load import load_report
+from ._msgpack import MsgpackReporter
 from ._slack import SlackReporter
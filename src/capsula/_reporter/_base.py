@@ -31,6 +31,13 @@ class ReporterBase(ABC):
     def report(self, capsule: Capsule) -> None:
         raise NotImplementedError
 
+    def report_item(self, key: str | tuple[str, ...], value: Any) -> None:  # noqa: B027
+        """Report an item of the in-run capsule as soon as it is recorded, before the run finishes.
+
+        `report` is still called with the complete capsule at the end of the phase.
+        Override this method to report the items incrementally. Does nothing by default.
+        """
+
     @classmethod
     def builder(cls, *args: Any, **kwargs: Any) -> Callable[[CapsuleParams], Self]:
         def build(params: CapsuleParams) -> Self:  # type: ignore[type-var,misc] # noqa: ARG001
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import os
 import traceback
 from collections.abc import Callable
 from datetime import timedelta
@@ -11,10 +12,18 @@ from typing import TYPE_CHECKING, Annotated, Any
 import orjson
 from typing_extensions import Doc
 
-from capsula._utils import to_nested_dict
+from capsula._codec import (
+    COMPRESSION_SUFFIXES,
+    Compression,
+    compress,
+    compression_from_path,
+    validate_compression,
+)
+from capsula._dedup import PRE_RUN_BLOB_KEY, fingerprint, normalize_volatile_keys, split_volatile
+from capsula._utils import atomic_write_bytes, to_nested_dict
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Sequence
 
     from capsula._capsule import Capsule
     from capsula._run import CapsuleParams
@@ -38,8 +47,21 @@ def default_preset(obj: Any) -> Any:
     raise TypeError
 
 
+def str_to_tuple(s: str | tuple[str, ...]) -> tuple[str, ...]:
+    if isinstance(s, str):
+        return (s,)
+    return s
+
+
 class JsonDumpReporter(ReporterBase):
-    """Reporter to dump the capsule to a JSON file."""
+    """Reporter to dump the capsule to a JSON file.
+
+    The file is written atomically, and its SHA-256 digest is recorded in the `SHA256SUMS` file next to it.
+    The report can optionally be compressed with gzip or zstd; use `capsula.load_report` to read it back.
+
+    The pre-run report can optionally be deduplicated: the part of the capsule other than the volatile keys is
+    stored once per distinct content in a blob shared by the runs, and the report refers to it by its fingerprint.
+    """
 
     @classmethod
     def builder(
@@ -49,11 +71,57 @@ class JsonDumpReporter(ReporterBase):
             int | None,
             Doc("Option to pass to `orjson.dumps`. If not provided, `orjson.OPT_INDENT_2` will be used."),
         ] = None,
+        fsync: Annotated[bool, Doc("Whether to sync the report and its directory to the disk after writing.")] = False,
+        compression: Annotated[
+            Compression | None,
+            Doc(
+                "Compression codec, `gzip` or `zstd`. The suffix `.gz` or `.zst` is appended to the file name. "
+                "`zstd` requires Python 3.14 or the `zstandard` package. "
+                "If not provided, the report is not compressed.",
+            ),
+        ] = None,
+        compression_level: Annotated[
+            int | None,
+            Doc("Compression level. If not provided, 6 for `gzip` and 3 for `zstd` will be used."),
+        ] = None,
+        deduplicate: Annotated[
+            bool,
+            Doc(
+                "Whether to store the pre-run capsule, except the volatile keys, in a blob in "
+                "`<vault>/.blobs/pre-run` shared by the runs with the same content. "
+                "Ignored for the in-run and post-run reports.",
+            ),
+        ] = False,
+        volatile_keys: Annotated[
+            list[str | list[str]] | None,
+            Doc(
+                "Keys of the pre-run capsule that differ between runs started from the same environment and are "
+                'kept in the report of each run, e.g., `["function", ["env", "SLURM_JOB_ID"]]`. '
+                "A `*` in a key matches any key at its level. If not provided, `function`, `shared_pre_run`, "
+                "and the paths in the run directory recorded by `FileContext`, `GitRepositoryContext`, and "
+                "`CommandContext` will be used.",
+            ),
+        ] = None,
     ) -> Callable[[CapsuleParams], JsonDumpReporter]:
+        if compression is not None:
+            compression = validate_compression(compression)
+
         def build(params: CapsuleParams) -> JsonDumpReporter:
+            suffix = "" if compression is None else COMPRESSION_SUFFIXES[compression]
+            if deduplicate and params.phase == "pre" and params.vault_dir is None:
+                logger.warning("Vault directory is unknown. The pre-run report will not be deduplicated.")
             return cls(
-                params.run_dir / f"{params.phase}-run-report.json",
+                params.run_dir / f"{params.phase}-run-report.json{suffix}",
                 option=orjson.OPT_INDENT_2 if option is None else option,
+                fsync=fsync,
+                compression=compression,
+                compression_level=compression_level,
+                blob_dir=(
+                    params.vault_dir / ".blobs" / "pre-run"
+                    if deduplicate and params.phase == "pre" and params.vault_dir is not None
+                    else None
+                ),
+                volatile_keys=volatile_keys,
             )
 
         return build
@@ -65,6 +133,11 @@ class JsonDumpReporter(ReporterBase):
         default: Callable[[Any], Any] | None = None,
         option: int | None = None,
         mkdir: bool = True,
+        fsync: bool = False,
+        compression: Compression | None = None,
+        compression_level: int | None = None,
+        blob_dir: Path | str | None = None,
+        volatile_keys: Sequence[str | Sequence[str]] | None = None,
     ) -> None:
         self._path = Path(path)
         if mkdir:
@@ -83,18 +156,41 @@ class JsonDumpReporter(ReporterBase):
             self._default_for_encoder = _default
 
         self._option = option
+        self._fsync = fsync
+        # Infer the compression from the file name, e.g., `report.json.gz`, if not provided
+        self._compression = (
+            compression_from_path(self._path) if compression is None else validate_compression(compression)
+        )
+        self._compression_level = compression_level
+        self._blob_dir = None if blob_dir is None else Path(blob_dir)
+        self._volatile_keys = normalize_volatile_keys(volatile_keys)
+
+    def _dumps(self, data: Any) -> bytes:
+        json_bytes = orjson.dumps(data, default=self._default_for_encoder, option=self._option)
+        if self._compression is not None:
+            json_bytes = compress(json_bytes, self._compression, self._compression_level)
+        return json_bytes
+
+    def _write_blob(self, nested_data: dict[str, Any]) -> dict[str, Any]:
+        """Write the stable part of the capsule to a blob, and return the volatile part with a reference to it."""
+        assert self._blob_dir is not None
+        stable, volatile = split_volatile(nested_data, self._volatile_keys)
+        digest = fingerprint(stable, default=self._default_for_encoder)
+        suffix = "" if self._compression is None else COMPRESSION_SUFFIXES[self._compression]
+        blob_path = self._blob_dir / f"{digest}.json{suffix}"
+        if not blob_path.exists():
+            logger.debug(f"Writing pre-run blob to {blob_path}")
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_bytes(blob_path, self._dumps(stable), fsync=self._fsync, record_digest=False)
+        # The relative path keeps the reference valid when the vault is moved
+        reference = {"fingerprint": digest, "path": os.path.relpath(blob_path, self._path.parent)}
+        return {PRE_RUN_BLOB_KEY: reference, **volatile}
 
     def report(self, capsule: Capsule) -> None:
         logger.debug(f"Dumping capsule to {self._path}")
-
-        def _str_to_tuple(s: str | tuple[str, ...]) -> tuple[str, ...]:
-            if isinstance(s, str):
-                return (s,)
-            return s
-
-        nested_data = to_nested_dict({_str_to_tuple(k): v for k, v in capsule.data.items()})
+        nested_data = to_nested_dict({str_to_tuple(k): v for k, v in capsule.data.items()})
         if capsule.fails:
-            nested_data["__fails"] = to_nested_dict({_str_to_tuple(k): v for k, v in capsule.fails.items()})
+            nested_data["__fails"] = to_nested_dict({str_to_tuple(k): v for k, v in capsule.fails.items()})
 
-        json_bytes = orjson.dumps(nested_data, default=self._default_for_encoder, option=self._option)
-        self._path.write_bytes(json_bytes)
+        report_data = nested_data if self._blob_dir is None else self._write_blob(nested_data)  # type: ignore[arg-type]
+        atomic_write_bytes(self._path, self._dumps(report_data), fsync=self._fsync)
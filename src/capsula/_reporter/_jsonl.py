@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Any
+
+import orjson
+from typing_extensions import Doc
+
+from capsula._utils import ExceptionInfo, to_nested_dict
+
+from ._base import ReporterBase
+from ._json import default_preset, str_to_tuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Sequence
+    from typing import BinaryIO
+
+    from capsula._capsule import Capsule
+    from capsula._run import CapsuleParams
+
+logger = logging.getLogger(__name__)
+
+
+class JsonLinesReporter(ReporterBase):
+    """Reporter to write the capsule to a JSON Lines file incrementally.
+
+    In the in-run phase, each record is appended to the file as soon as it is recorded,
+    so that the records survive even if the run is killed before it finishes.
+    The remaining items, such as the values of the watchers, are appended when the phase finishes.
+
+    Each line is a JSON object of the form `{"key": ["a", "b"], "value": ...}`, or `{"key": [...], "fail": ...}`
+    for an item that failed to be encapsulated or serialized. Use `JsonLinesReporter.load` to reconstruct the nested
+    capsule.
+    """
+
+    @classmethod
+    def builder(
+        cls,
+        *,
+        fsync_interval: Annotated[
+            float,
+            Doc("Minimum interval in seconds between `fsync` calls. The file is always flushed after each line."),
+        ] = 10.0,
+    ) -> Callable[[CapsuleParams], JsonLinesReporter]:
+        def build(params: CapsuleParams) -> JsonLinesReporter:
+            return cls(params.run_dir / f"{params.phase}-run-report.jsonl", fsync_interval=fsync_interval)
+
+        return build
+
+    def __init__(
+        self,
+        path: Path | str,
+        *,
+        default: Callable[[Any], Any] | None = None,
+        fsync_interval: float = 10.0,
+        mkdir: bool = True,
+    ) -> None:
+        self._path = Path(path)
+        if mkdir:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        if default is None:
+            self._default_for_encoder = default_preset
+        else:
+
+            def _default(obj: Any) -> Any:
+                try:
+                    return default_preset(obj)
+                except TypeError:
+                    return default(obj)
+
+            self._default_for_encoder = _default
+
+        self._fsync_interval = fsync_interval
+        self._file: BinaryIO | None = None
+        self._last_fsync = 0.0
+        self._reported_keys: set[tuple[str, ...]] = set()
+        # Records can be reported from the thread of the record server as well
+        self._lock = threading.Lock()
+
+    def _write_line(self, obj: dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = self._path.open("ab")
+            self._last_fsync = time.monotonic()
+        self._file.write(orjson.dumps(obj, default=self._default_for_encoder, option=orjson.OPT_APPEND_NEWLINE))
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._last_fsync >= self._fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _write_item(self, key: tuple[str, ...], value: Any, *, field: str = "value") -> None:
+        try:
+            self._write_line({"key": key, field: value})
+        except TypeError as e:
+            # orjson serializes the whole line before writing it, so nothing has been written
+            logger.warning(f"Failed to serialize the value of {key} for {self._path}: {e}")
+            self._write_line({"key": key, "fail": ExceptionInfo.from_exception(e)})
+
+    def report_item(self, key: str | tuple[str, ...], value: Any) -> None:
+        key_tuple = str_to_tuple(key)
+        with self._lock:
+            self._write_item(key_tuple, value)
+            self._reported_keys.add(key_tuple)
+
+    def report(self, capsule: Capsule) -> None:
+        logger.debug(f"Writing capsule to {self._path}")
+        with self._lock:
+            # Write an empty file even if the capsule is empty
+            if self._file is None:
+                self._file = self._path.open("ab")
+            try:
+                for key, value in capsule.data.items():
+                    key_tuple = str_to_tuple(key)
+                    if key_tuple not in self._reported_keys:
+                        self._write_item(key_tuple, value)
+                for key, fail in capsule.fails.items():
+                    self._write_item(str_to_tuple(key), fail, field="fail")
+            finally:
+                try:
+                    os.fsync(self._file.fileno())
+                finally:
+                    self._file.close()
+                    self._file = None
+                    self._reported_keys.clear()
+
+    @staticmethod
+    def load(
+        path: Annotated[Path | str, Doc("Path to the JSON Lines file written by the reporter.")],
+    ) -> Annotated[dict[str, Any], Doc("Nested capsule, in the same form as the output of `JsonDumpReporter`.")]:
+        """Reconstruct the nested capsule from a JSON Lines file written by the reporter.
+
+        A trailing line that was only partially written, e.g., because the run was killed, is ignored.
+        """
+        data: dict[Sequence[Hashable], Any] = {}
+        fails: dict[Sequence[Hashable], Any] = {}
+        with Path(path).open("rb") as f:
+            for line in f:
+                try:
+                    obj = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    logger.warning(f"Skipping a broken line in {path}: {line!r}")
+                    continue
+                if "fail" in obj:
+                    fails[tuple(obj["key"])] = obj["fail"]
+                else:
+                    data[tuple(obj["key"])] = obj["value"]
+
+        nested_data: dict[str, Any] = to_nested_dict(data)  # type: ignore[assignment]
+        if fails:
+            nested_data["__fails"] = to_nested_dict(fails)
+        return nested_data
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Annotated, Any, Literal
+
+import orjson
+from typing_extensions import Doc
+
+from capsula._codec import COMPRESSION_SUFFIXES, compression_from_path, decompress
+from capsula._dedup import PRE_RUN_BLOB_KEY, merge_nested
+
+from ._jsonl import JsonLinesReporter
+from ._msgpack import MsgpackReporter
+
+_REPORT_SUFFIXES = (".msgpack", ".json", *(f".json{suffix}" for suffix in COMPRESSION_SUFFIXES.values()), ".jsonl")
+
+
+def load_report(
+    path: Annotated[
+        Path | str,
+        Doc("Path to the report file, or the run directory to search for the report of `phase`."),
+    ],
+    *,
+    phase: Annotated[
+        Literal["pre", "in", "post"],
+        Doc("Phase of the report to load when `path` is a run directory."),
+    ] = "pre",
+    resolve_pre_run_blob: Annotated[
+        bool,
+        Doc("Whether to merge the shared pre-run blob referred to by a deduplicated report into the result."),
+    ] = True,
+) -> Annotated[dict[str, Any], Doc("Nested capsule.")]:
+    """Load a report written by `JsonDumpReporter`, `JsonLinesReporter`, or `MsgpackReporter`.
+
+    Compressed reports (`.json.gz` and `.json.zst`) are decompressed transparently.
+    If `path` is a run directory, `<phase>-run-report.msgpack`, `.json`, `.json.gz`, `.json.zst`, and `.jsonl`
+    are searched in this order.
+    The pre-run blob of a report deduplicated by `JsonDumpReporter` is resolved relative to the report.
+    """
+    path = Path(path)
+    if path.is_dir():
+        for suffix in _REPORT_SUFFIXES:
+            candidate = path / f"{phase}-run-report{suffix}"
+            if candidate.exists():
+                path = candidate
+                break
+        else:
+            msg = f"Report of the {phase}-run phase not found in {path}."
+            raise FileNotFoundError(msg)
+
+    if path.suffix == ".jsonl":
+        return JsonLinesReporter.load(path)
+    if path.suffix == ".msgpack":
+        return MsgpackReporter.load(path)
+
+    data = path.read_bytes()
+    compression = compression_from_path(path)
+    if compression is not None:
+        data = decompress(data, compression)
+    report: dict[str, Any] = orjson.loads(data)
+    if resolve_pre_run_blob and PRE_RUN_BLOB_KEY in report:
+        blob = load_report(path.parent / report[PRE_RUN_BLOB_KEY]["path"], resolve_pre_run_blob=False)
+        report = merge_nested(blob, report)
+    return report
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path, PurePath
+from typing import TYPE_CHECKING, Annotated, Any
+
+from typing_extensions import Doc
+
+from capsula._exceptions import CapsulaConfigurationError
+from capsula._utils import atomic_write_bytes, to_nested_dict
+
+from ._base import ReporterBase
+from ._json import default_preset, str_to_tuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from capsula._capsule import Capsule
+    from capsula._run import CapsuleParams
+
+logger = logging.getLogger(__name__)
+
+# Extension type codes of the tagged values
+_EXT_TIMEDELTA = 1
+_EXT_PATH = 2
+_EXT_DATETIME = 3
+
+_TIMEDELTA_FORMAT = ">qiq"  # days, seconds, microseconds
+
+
+def _import_msgpack() -> Any:
+    try:
+        import msgpack  # noqa: PLC0415
+    except ImportError as e:
+        msg = "MsgpackReporter requires the `msgpack` package. Install `capsula[msgpack]`."
+        raise CapsulaConfigurationError(msg) from e
+    return msgpack
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    msgpack = _import_msgpack()
+    if code == _EXT_TIMEDELTA:
+        days, seconds, microseconds = struct.unpack(_TIMEDELTA_FORMAT, data)
+        return timedelta(days=days, seconds=seconds, microseconds=microseconds)
+    if code == _EXT_PATH:
+        return Path(data.decode())
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+class MsgpackReporter(ReporterBase):
+    """Reporter to dump the capsule to a binary MessagePack file.
+
+    Unlike `JsonDumpReporter`, durations, paths, and datetimes are stored as tagged values and
+    restored as `timedelta`, `Path`, and `datetime` by `MsgpackReporter.load`, and bytes are stored as is.
+    Other values are stored as in `JsonDumpReporter`: tuples are restored as lists, dataclasses as dictionaries,
+    and exceptions and tracebacks as strings.
+    Requires the `msgpack` package.
+    """
+
+    @classmethod
+    def builder(
+        cls,
+        *,
+        fsync: Annotated[bool, Doc("Whether to sync the report and its directory to the disk after writing.")] = False,
+    ) -> Callable[[CapsuleParams], MsgpackReporter]:
+        _import_msgpack()
+
+        def build(params: CapsuleParams) -> MsgpackReporter:
+            return cls(params.run_dir / f"{params.phase}-run-report.msgpack", fsync=fsync)
+
+        return build
+
+    def __init__(
+        self,
+        path: Path | str,
+        *,
+        default: Callable[[Any], Any] | None = None,
+        mkdir: bool = True,
+        fsync: bool = False,
+    ) -> None:
+        self._msgpack = _import_msgpack()
+        self._path = Path(path)
+        if mkdir:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._user_default = default
+        self._fsync = fsync
+
+    def _default(self, obj: Any) -> Any:
+        if isinstance(obj, timedelta):
+            return self._msgpack.ExtType(
+                _EXT_TIMEDELTA,
+                struct.pack(_TIMEDELTA_FORMAT, obj.days, obj.seconds, obj.microseconds),
+            )
+        if isinstance(obj, PurePath):
+            return self._msgpack.ExtType(_EXT_PATH, str(obj).encode())
+        if isinstance(obj, datetime):
+            return self._msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+        if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            # Shallow conversion, as the fields may contain objects that cannot be copied, e.g., tracebacks
+            return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+        if self._user_default is not None:
+            try:
+                return self._user_default(obj)
+            except TypeError:
+                pass
+        # Exceptions and tracebacks are stringified in the same way as `JsonDumpReporter`
+        return default_preset(obj)
+
+    def report(self, capsule: Capsule) -> None:
+        logger.debug(f"Dumping capsule to {self._path}")
+        nested_data = to_nested_dict({str_to_tuple(k): v for k, v in capsule.data.items()})
+        if capsule.fails:
+            nested_data["__fails"] = to_nested_dict({str_to_tuple(k): v for k, v in capsule.fails.items()})
+
+        packed: bytes = self._msgpack.packb(nested_data, default=self._default, datetime=False)
+        atomic_write_bytes(self._path, packed, fsync=self._fsync)
+
+    @staticmethod
+    def load(
+        path: Annotated[Path | str, Doc("Path to the MessagePack file written by the reporter.")],
+    ) -> Annotated[dict[str, Any], Doc("Nested capsule.")]:
+        """Load the nested capsule from a MessagePack file written by the reporter, restoring the tagged values."""
+        msgpack = _import_msgpack()
+        return msgpack.unpackb(  # type: ignore[no-any-return]
+            Path(path).read_bytes(),
+            ext_hook=_ext_hook,
+            strict_map_key=False,
+        )
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import os
 from typing import Annotated, Any
 
 from typing_extensions import Doc
 
+from ._channel import RECORD_SOCKET_ENV_VAR, send_record
 from ._encapsulator import Encapsulator, _CapsuleItemKey
 from ._run import Run
 
@@ -42,21 +44,35 @@ def record(
     "pi_estimate": 3.128
     }
     ```
+
+    If the run is created with `record_channel=True`, this function can also be called from child processes,
+    e.g., workers of a `multiprocessing.Pool` created inside the function.
+    The value is then serialized to JSON and sent to the in-run capsule of the run in the parent process.
     """
     enc = Encapsulator.get_current()
-    if enc is None:
-        msg = "No active encapsulator found."
-        raise RuntimeError(msg)
-    enc.record(key, value)
+    if enc is not None:
+        enc.record(key, value)
+        return
+
+    # In a child process of a run with the record channel enabled, send the record to the parent process
+    record_socket = os.environ.get(RECORD_SOCKET_ENV_VAR)
+    if record_socket is not None:
+        send_record(record_socket, key, value)
+        return
+
+    msg = "No active encapsulator found."
+    raise RuntimeError(msg)
 
 
 def current_run_name() -> str:
     """Get the name of the current run, which is also the name of the run directory in the `vault` directory.
 
+    The run name is the same regardless of the vault layout (see `vault-layout` in the configuration).
+
     `RuntimeError` will be raised if no active run is found.
     """
     run: Run[Any, Any] | None = Run.get_current()
     if run is None:
         msg = "No active run found."
         raise RuntimeError(msg)
-    return run.run_dir.name
+    return run.run_name
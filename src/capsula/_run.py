@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import hashlib
+import importlib
 import inspect
 import logging
+import os
 import queue
+import socket
 import subprocess
 import threading
 from collections import OrderedDict, deque
 from collections.abc import Callable
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
 from random import choices
 from string import ascii_letters, digits
@@ -18,18 +25,37 @@ from typing_extensions import Self
 
 from capsula._exceptions import CapsulaUninitializedError
 
+from ._capsule import Capsule, LazyCapsule
+from ._channel import RecordServer
 from ._context import ContextBase
 from ._encapsulator import Encapsulator
 from ._exceptions import CapsulaError, CapsulaNoRunError
+from ._memo import (
+    MEMO_KEY_CONTEXT_KINDS,
+    MEMO_RESULT_NAME,
+    MemoIndex,
+    PickleSerializer,
+    ResultSerializer,
+    bind_arguments,
+    memo_key,
+)
 from ._reporter import ReporterBase
-from ._utils import search_for_project_root
+from ._session import Session
+from ._utils import atomic_write_bytes, search_for_project_root
+from ._vault import (
+    COMPLETION_MARKER_NAME,
+    SHARED_PRE_RUN_MARKER_NAME,
+    VaultLayout,
+    get_run_dir,
+    record_vault_layout,
+)
 from ._watcher import WatcherBase
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Collection, MutableMapping
     from types import TracebackType
 
-    from ._capsule import Capsule
+    from ._encapsulator import _CapsuleItemKey
 
 P = ParamSpec("P")
 T = TypeVar("T")
@@ -37,6 +63,8 @@ _T = TypeVar("_T")
 
 logger = logging.getLogger(__name__)
 
+_MAX_RUN_DIR_ATTEMPTS = 10
+
 
 @dataclass
 class FuncInfo:
@@ -65,32 +93,86 @@ class CapsuleParams:
     run_dir: Path
     phase: Literal["pre", "in", "post"]
     project_root: Path
+    vault_dir: Path | None = None
 
 
 ExecInfo: TypeAlias = FuncInfo | CommandInfo
 
 
+@dataclass
+class SharedPreRun:
+    """Pre-run capsule data of the shareable contexts, shared by multiple runs."""
+
+    run_name: str
+    run_dir: Path
+    data: dict[str | tuple[str, ...], Any]
+    # Indices of the pre-run context generators whose contexts are shared, with the keys of the contexts
+    context_keys: dict[int, _CapsuleItemKey] = field(default_factory=dict)
+    project_root: Path | None = None
+
+    def excluding(self, kinds: Collection[str]) -> SharedPreRun:
+        """Copy without the contexts of `kinds`, so that they are encapsulated for each run instead."""
+
+        def is_excluded(key: str | tuple[str, ...]) -> bool:
+            return isinstance(key, tuple) and len(key) > 0 and key[0] in kinds
+
+        return replace(
+            self,
+            data={key: value for key, value in self.data.items() if not is_excluded(key)},
+            context_keys={i: key for i, key in self.context_keys.items() if not is_excluded(key)},
+        )
+
+
 def get_default_vault_dir(exec_info: ExecInfo | None) -> Path:
     project_root = get_project_root(exec_info)
     return project_root / "vault"
 
 
-def default_run_name_factory(exec_info: ExecInfo | None, random_str: str, timestamp: datetime, /) -> str:
-    exec_name: str | None
+def _get_exec_name(exec_info: ExecInfo | None) -> str | None:
     if exec_info is None:
-        exec_name = None
-    elif isinstance(exec_info, CommandInfo):
-        exec_name = exec_info.command[0]
-    elif isinstance(exec_info, FuncInfo):
-        exec_name = exec_info.func.__name__
-    else:
-        msg = f"exec_info must be an instance of FuncInfo or CommandInfo, not {type(exec_info)}."
-        raise TypeError(msg)
+        return None
+    if isinstance(exec_info, CommandInfo):
+        return exec_info.command[0]
+    if isinstance(exec_info, FuncInfo):
+        return exec_info.func.__name__
+    msg = f"exec_info must be an instance of FuncInfo or CommandInfo, not {type(exec_info)}."
+    raise TypeError(msg)
 
+
+def default_run_name_factory(exec_info: ExecInfo | None, random_str: str, timestamp: datetime, /) -> str:
+    exec_name = _get_exec_name(exec_info)
     datetime_str = timestamp.astimezone().strftime(r"%Y%m%d_%H%M%S")
     return ("" if exec_name is None else f"{exec_name}_") + f"{datetime_str}_{random_str}"
 
 
+_CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def generate_run_id(timestamp: datetime) -> str:
+    """Generate a 26-character, lexicographically sortable and collision-resistant run ID.
+
+    The ID is a ULID-style Crockford base32 encoding of 128 bits: a 48-bit millisecond timestamp,
+    a 24-bit hash of the host name, the lower 16 bits of the process ID, and 40 random bits.
+    """
+    milliseconds = int(timestamp.timestamp() * 1000) & 0xFFFF_FFFF_FFFF
+    host = int.from_bytes(hashlib.blake2b(socket.gethostname().encode(), digest_size=3).digest(), "big")
+    pid = os.getpid() & 0xFFFF
+    randomness = int.from_bytes(os.urandom(5), "big")
+    value = (milliseconds << 80) | (host << 56) | (pid << 40) | randomness
+    return "".join(_CROCKFORD_BASE32[(value >> (5 * i)) & 0x1F] for i in reversed(range(26)))
+
+
+def ulid_run_name_factory(exec_info: ExecInfo | None, _random_str: str, timestamp: datetime, /) -> str:
+    exec_name = _get_exec_name(exec_info)
+    return ("" if exec_name is None else f"{exec_name}_") + generate_run_id(timestamp)
+
+
+RUN_NAME_FACTORIES: dict[str, Callable[[ExecInfo | None, str, datetime], str]] = {
+    "default": default_run_name_factory,
+    "ulid": ulid_run_name_factory,
+}
+
+
 def get_project_root(exec_info: ExecInfo | None = None) -> Path:
     if exec_info is None or isinstance(exec_info, CommandInfo):
         return search_for_project_root(Path.cwd())
@@ -105,6 +187,11 @@ def get_project_root(exec_info: ExecInfo | None = None) -> Path:
 class _RunDtoBase:
     run_name_factory: Callable[[ExecInfo | None, str, datetime], str] | None = None
     vault_dir: Path | None = None
+    vault_layout: VaultLayout = "flat"
+    record_channel: bool = False
+    memoize: bool = False
+    memoize_serializer: ResultSerializer | None = None
+    overlap_pre_run: bool = False
     pre_run_context_generators: deque[Callable[[CapsuleParams], ContextBase]] = field(default_factory=deque)
     in_run_watcher_generators: deque[Callable[[CapsuleParams], WatcherBase]] = field(default_factory=deque)
     post_run_context_generators: deque[Callable[[CapsuleParams], ContextBase]] = field(default_factory=deque)
@@ -220,6 +307,89 @@ class RunDtoCommand(_RunDtoBase):
     command: tuple[str, ...] | None = None
 
 
+def _report_item(reporter: ReporterBase, key: _CapsuleItemKey, value: Any) -> None:
+    try:
+        reporter.report_item(key, value)
+    except Exception:
+        logger.exception(f"Failed to report item {key} with reporter {reporter}.")
+
+
+def _record_memo(value: dict[str, Any]) -> None:
+    enc = Encapsulator.get_current()
+    if enc is not None:
+        enc.record("memoized", value)
+
+
+def _mark_complete(run_dir: Path) -> None:
+    completed_at = datetime.now(timezone.utc).isoformat()
+    atomic_write_bytes(run_dir / COMPLETION_MARKER_NAME, f"{completed_at}\n".encode(), record_digest=False)
+
+
+def _load_run(module_name: str, qualname: str) -> Run[Any, Any]:
+    obj: Any = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    if not isinstance(obj, Run):
+        msg = f"{module_name}.{qualname} is not a Run object."
+        raise TypeError(msg)
+    return obj
+
+
+def _encapsulate_context(context: ContextBase) -> Capsule:
+    enc = Encapsulator()
+    enc.add_context(context)
+    return enc.encapsulate()
+
+
+class _DeferredPreRun:
+    """Pre-run capsule whose side-effect-free contexts are encapsulated in background threads.
+
+    The capsule is reported once all the contexts are encapsulated, and `capsule` waits until then.
+    """
+
+    def __init__(self, partial_capsule: Capsule, deferred: list[ContextBase], reporters: list[ReporterBase]) -> None:
+        self._capsule: Capsule | None = None
+        self._exception: BaseException | None = None
+        self._done = threading.Event()
+        threading.Thread(
+            target=self._finalize,
+            args=(partial_capsule, deferred, reporters),
+            name="capsula-pre-run",
+            daemon=True,
+        ).start()
+
+    def _finalize(self, partial_capsule: Capsule, deferred: list[ContextBase], reporters: list[ReporterBase]) -> None:
+        try:
+            with ThreadPoolExecutor(max_workers=len(deferred), thread_name_prefix="capsula-pre-run") as executor:
+                capsules = list(executor.map(_encapsulate_context, deferred))
+            data = partial_capsule.data
+            fails = partial_capsule.fails
+            for capsule in capsules:
+                data.update(capsule.data)
+                fails.update(capsule.fails)
+            for key in fails:
+                # Remove the placeholders of the failed contexts
+                data.pop(key, None)
+            self._capsule = Capsule(data, fails)
+            for reporter in reporters:
+                try:
+                    reporter.report(self._capsule)
+                except Exception:  # noqa: PERF203
+                    logger.exception(f"Failed to report pre-run capsule with reporter {reporter}.")
+        except BaseException as e:  # noqa: BLE001
+            # Re-raised in the thread of the run
+            self._exception = e
+        finally:
+            self._done.set()
+
+    def capsule(self) -> Capsule:
+        self._done.wait()
+        if self._exception is not None:
+            raise self._exception
+        assert self._capsule is not None
+        return self._capsule
+
+
 class Run(Generic[P, T]):
     _thread_local = threading.local()
 
@@ -258,7 +428,15 @@ class Run(Generic[P, T]):
         if run_dto.vault_dir is None:
             raise CapsulaUninitializedError("vault_dir")
         self._vault_dir: Path = run_dto.vault_dir
+        self._vault_layout: VaultLayout = run_dto.vault_layout
+        self._record_channel: bool = run_dto.record_channel
+        self._memoize: bool = run_dto.memoize
+        self._overlap_pre_run: bool = run_dto.overlap_pre_run
+        self._memoize_serializer: ResultSerializer = (
+            PickleSerializer() if run_dto.memoize_serializer is None else run_dto.memoize_serializer
+        )
 
+        self._run_name: str | None = None
         self._run_dir: Path | None = None
 
         if isinstance(run_dto, RunDtoCommand):
@@ -276,6 +454,33 @@ class Run(Generic[P, T]):
             " not {type(run_dto)}."
             raise TypeError(msg)
 
+    def __reduce__(self) -> tuple[Callable[[str, str], Run[Any, Any]], tuple[str, str]]:
+        # Pickle by reference so that the run can be submitted to a process pool.
+        # The worker process imports the module and calls the run, so all the phases are executed in the worker.
+        if self._func is None:
+            msg = "Run objects for commands cannot be pickled."
+            raise TypeError(msg)
+        module_name, qualname = self._func.__module__, self._func.__qualname__
+        if "<locals>" in qualname:
+            msg = f"Run object for {qualname} cannot be pickled because it is not defined at the top level of a module."
+            raise TypeError(msg)
+        return _load_run, (module_name, qualname)
+
+    @property
+    def func(self) -> Callable[P, T] | Callable[Concatenate[Capsule, P], T] | None:
+        return self._func
+
+    @property
+    def vault_dir(self) -> Path:
+        return self._vault_dir
+
+    @property
+    def run_name(self) -> str:
+        if self._run_name is None:
+            msg = "run_name must be set before accessing it."
+            raise ValueError(msg)
+        return self._run_name
+
     @property
     def run_dir(self) -> Path:
         if self._run_dir is None:
@@ -295,37 +500,127 @@ class Run(Generic[P, T]):
     ) -> None:
         self._get_run_stack().get(block=False)
 
-    def pre_run(self, exec_info: ExecInfo) -> tuple[CapsuleParams, Capsule]:
+    def _create_run_dir(self, exec_info: ExecInfo) -> tuple[str, Path]:
+        # Retry with a fresh random string and timestamp when the run directory already exists,
+        # e.g., when many runs are launched at the same time.
+        previous_run_names: set[str] = set()
+        record_vault_layout(self._vault_dir, self._vault_layout)
+        for _ in range(_MAX_RUN_DIR_ATTEMPTS):
+            timestamp = datetime.now(timezone.utc)
+            run_name = self._run_name_factory(
+                exec_info,
+                "".join(choices(ascii_letters + digits, k=4)),
+                timestamp,
+            )
+            run_dir = get_run_dir(self._vault_dir, run_name, layout=self._vault_layout, timestamp=timestamp)
+            try:
+                run_dir.mkdir(parents=True, exist_ok=False)
+            except FileExistsError:
+                if run_name in previous_run_names:
+                    # The run name factory does not produce fresh names, so retrying is pointless
+                    break
+                previous_run_names.add(run_name)
+                logger.warning(f"Run directory {run_dir} already exists. Retrying with a new run name.")
+            else:
+                return run_name, run_dir
+
+        logger.error(
+            f"Run directory {run_dir} already exists. Aborting to prevent overwriting existing data. "
+            "Make sure that run_name_factory produces unique names.",
+        )
+        msg = f"Run directory {run_dir} already exists."
+        raise FileExistsError(msg)
+
+    def _prepare_vault_dir(self) -> None:
         if self._vault_dir.exists():
             if not self._vault_dir.is_dir():
                 msg = f"Vault directory {self._vault_dir} exists but is not a directory."
                 raise CapsulaError(msg)
         else:
-            self._vault_dir.mkdir(parents=True, exist_ok=False)
-            # If this is a new vault directory, create a .gitignore file in it
-            # and write "*" to it
-            gitignore_path = self._vault_dir / ".gitignore"
-            with gitignore_path.open("w") as gitignore_file:
-                gitignore_file.write("*\n")
+            try:
+                self._vault_dir.mkdir(parents=True, exist_ok=False)
+            except FileExistsError:
+                # Another process created the vault directory concurrently
+                pass
+            else:
+                # If this is a new vault directory, create a .gitignore file in it
+                # and write "*" to it
+                gitignore_path = self._vault_dir / ".gitignore"
+                with gitignore_path.open("w") as gitignore_file:
+                    gitignore_file.write("*\n")
         logger.info(f"Vault directory: {self._vault_dir}")
 
-        # Generate the run name
-        run_name = self._run_name_factory(
-            exec_info,
-            "".join(choices(ascii_letters + digits, k=4)),
-            datetime.now(timezone.utc),
+    def _default_exec_info(self) -> ExecInfo:
+        if self._func is not None:
+            return FuncInfo(func=self._func, args=(), kwargs={}, pass_pre_run_capsule=self._pass_pre_run_capsule)
+        assert self._command is not None
+        return CommandInfo(command=self._command)
+
+    def shared_pre_run(self, *, include: Callable[[ContextBase], bool] | None = None) -> SharedPreRun:
+        """Encapsulate the shareable pre-run contexts once, to be reused by multiple runs.
+
+        A run directory is created for the shared pre-run capsule, and the pre-run reporters report to it.
+        Contexts that are not shareable, such as `FunctionContext`, are skipped here and encapsulated for each run,
+        as well as the shareable contexts for which `include` returns False.
+        """
+        self._prepare_vault_dir()
+        exec_info = self._default_exec_info()
+        run_name, run_dir = self._create_run_dir(exec_info)
+        logger.info(f"Shared pre-run directory: {run_dir}")
+        # Tools such as `export_runs` skip the directory, which is not a run of its own
+        (run_dir / SHARED_PRE_RUN_MARKER_NAME).touch()
+
+        project_root = get_project_root(exec_info)
+        params = CapsuleParams(
+            exec_info=exec_info,
+            run_name=run_name,
+            run_dir=run_dir,
+            phase="pre",
+            project_root=project_root,
+            vault_dir=self._vault_dir,
         )
-        logger.info(f"Run name: {run_name}")
 
-        self._run_dir = self._vault_dir / run_name
-        try:
-            self._run_dir.mkdir(parents=True, exist_ok=False)
-        except FileExistsError:
-            logger.exception(
-                f"Run directory {self._run_dir} already exists. Aborting to prevent overwriting existing data. "
-                "Make sure that run_name_factory produces unique names.",
-            )
-            raise
+        shared_enc = Encapsulator()
+        context_keys: dict[int, _CapsuleItemKey] = {}
+        for i, context_generator in enumerate(self._pre_run_context_generators):
+            context = context_generator(params)
+            if context.shareable and (include is None or include(context)):
+                context_keys[i] = context.default_key()
+                shared_enc.add_context(context)
+        shared_capsule = shared_enc.encapsulate()
+        for reporter_generator in self._pre_run_reporter_generators:
+            reporter = reporter_generator(params)
+            reporter.report(shared_capsule)
+        # The shared pre-run directory has no post-run phase
+        _mark_complete(run_dir)
+
+        return SharedPreRun(
+            run_name=run_name,
+            run_dir=run_dir,
+            data=shared_capsule.data,
+            context_keys=context_keys,
+            project_root=project_root,
+        )
+
+    def pre_run(
+        self,
+        exec_info: ExecInfo,
+        *,
+        shared: SharedPreRun | None = None,
+        overlap: bool = False,
+    ) -> tuple[CapsuleParams, Capsule]:
+        """Encapsulate the pre-run contexts and report the pre-run capsule.
+
+        If `overlap` is True, the side-effect-free contexts are encapsulated in background threads, and the returned
+        capsule is a `LazyCapsule` resolved after they are encapsulated and the capsule is reported.
+        """
+        self._prepare_vault_dir()
+
+        self._run_name = None
+        self._run_dir = None
+        run_name, self._run_dir = self._create_run_dir(exec_info)
+        self._run_name = run_name
+        logger.info(f"Run name: {run_name}")
         logger.info(f"Run directory: {self._run_dir}")
 
         params = CapsuleParams(
@@ -333,13 +628,36 @@ class Run(Generic[P, T]):
             run_name=run_name,
             run_dir=self._run_dir,
             phase="pre",
-            project_root=get_project_root(exec_info),
+            project_root=get_project_root(exec_info)
+            if shared is None or shared.project_root is None
+            else shared.project_root,
+            vault_dir=self._vault_dir,
         )
 
         pre_run_enc = Encapsulator()
-        for context_generator in self._pre_run_context_generators:
+        deferred: list[ContextBase] = []
+        if shared is not None:
+            pre_run_enc.record("shared_pre_run", {"run_name": shared.run_name, "run_dir": shared.run_dir})
+        for i, context_generator in enumerate(self._pre_run_context_generators):
+            # The shared contexts are not even built
+            if shared is not None and (key := shared.context_keys.get(i)) is not None and key in shared.data:
+                pre_run_enc.record(key, shared.data[key])
+                continue
             context = context_generator(params)
-            pre_run_enc.add_context(context)
+            if shared is not None and context.shareable and (key := context.default_key()) in shared.data:
+                pre_run_enc.record(key, shared.data[key])
+            elif overlap and context.side_effect_free and not context.abort_on_error:
+                # Reserve the position of the context in the capsule
+                pre_run_enc.record(context.default_key(), None)
+                deferred.append(context)
+            else:
+                pre_run_enc.add_context(context)
+
+        if deferred:
+            reporters = [reporter_generator(params) for reporter_generator in self._pre_run_reporter_generators]
+            logger.debug(f"Encapsulating {len(deferred)} pre-run contexts in the background.")
+            return params, LazyCapsule(_DeferredPreRun(pre_run_enc.encapsulate(), deferred, reporters).capsule)
+
         pre_run_capsule = pre_run_enc.encapsulate()
         for reporter_generator in self._pre_run_reporter_generators:
             reporter = reporter_generator(params)
@@ -361,32 +679,81 @@ class Run(Generic[P, T]):
             except Exception:
                 logger.exception(f"Failed to report post-run capsule with reporter {reporter}.")
 
+        _mark_complete(params.run_dir)
         return post_run_capsule
 
-    def in_run(self, params: CapsuleParams, func: Callable[[], _T]) -> _T:
+    def _open_record_channel(
+        self,
+        params: CapsuleParams,
+        enc: Encapsulator,
+        env: MutableMapping[str, str] | None,
+    ) -> AbstractContextManager[object]:
+        if not self._record_channel:
+            return nullcontext()
+        if not hasattr(socket, "AF_UNIX"):
+            logger.warning("Record channel is not available on this platform because it lacks Unix domain sockets.")
+            return nullcontext()
+        return RecordServer(params.run_dir / "record.sock", enc.record, env=env)
+
+    def in_run(
+        self,
+        params: CapsuleParams,
+        func: Callable[[], _T],
+        *,
+        record_env: MutableMapping[str, str] | None = None,
+    ) -> _T:
+        """Run `func` in the in-run phase.
+
+        If `record_env` is given, the path of the socket of the record channel is set in it instead of in the
+        environment variables of the process, so that runs in concurrent threads do not interfere with each other.
+        """
         params.phase = "in"
         in_run_enc = Encapsulator()
         for watcher_generator in self._in_run_watcher_generators:
             watcher = watcher_generator(params)
             in_run_enc.add_watcher(watcher)
 
-        with self, in_run_enc, in_run_enc.watch():
+        # Build the reporters before running the function so that they can report the records incrementally
+        reporters = [reporter_generator(params) for reporter_generator in self._in_run_reporter_generators]
+        for reporter in reporters:
+            in_run_enc.add_record_listener(partial(_report_item, reporter))
+
+        with self, in_run_enc, self._open_record_channel(params, in_run_enc, record_env), in_run_enc.watch():
             result = func()
 
         in_run_capsule = in_run_enc.encapsulate()
-        for reporter_generator in self._in_run_reporter_generators:
-            reporter = reporter_generator(params)
+        for reporter in reporters:
             try:
                 reporter.report(in_run_capsule)
-            except Exception:
+            except Exception:  # noqa: PERF203
                 logger.exception(f"Failed to report in-run capsule with reporter {reporter}.")
 
         return result
 
     def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T:
+        session = Session.get_current()
+        if session is None:
+            return self.call_with_shared_pre_run(None, *args, **kwargs)
+        try:
+            return self.call_with_shared_pre_run(session.shared_pre_run(self), *args, **kwargs)
+        finally:
+            if self._run_dir is not None:
+                session.add_run_dir(self._run_dir)
+
+    def call_with_shared_pre_run(self, shared: SharedPreRun | None, /, *args: P.args, **kwargs: P.kwargs) -> T:
+        """Call the function, reusing the shareable contexts in `shared` for the pre-run capsule."""
         assert self._func is not None
         func_info = FuncInfo(func=self._func, args=args, kwargs=kwargs, pass_pre_run_capsule=self._pass_pre_run_capsule)
-        params, pre_run_capsule = self.pre_run(func_info)
+        if self._memoize and shared is not None:
+            # The shared values may be stale, e.g., when an input file changes in a session,
+            # so the contexts in the memoization key are encapsulated for each call
+            shared = shared.excluding(MEMO_KEY_CONTEXT_KINDS)
+        # The memoization key depends on the pre-run capsule, so it cannot be deferred
+        params, pre_run_capsule = self.pre_run(
+            func_info,
+            shared=shared,
+            overlap=self._overlap_pre_run and not self._memoize,
+        )
 
         if self._pass_pre_run_capsule:
 
@@ -403,25 +770,93 @@ class Run(Generic[P, T]):
 
             func = _func_2
 
+        if self._memoize:
+            func = self._memoized(func, params, pre_run_capsule, args, kwargs)
+
         try:
             result = self.in_run(params, func)
         finally:
-            _post_run_capsule = self.post_run(params)
+            # An error of the contexts encapsulated in the background is raised after the post-run phase,
+            # chained to the exception of the function if any
+            try:
+                if isinstance(pre_run_capsule, LazyCapsule):
+                    pre_run_capsule.resolve()
+            finally:
+                _post_run_capsule = self.post_run(params)
 
         return result
 
-    def exec_command(self) -> tuple[subprocess.CompletedProcess[str], CapsuleParams]:
+    def _memoized(
+        self,
+        func: Callable[[], T],
+        params: CapsuleParams,
+        pre_run_capsule: Capsule,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Callable[[], T]:
+        """Wrap `func` to return the memoized result if any, or to store the result otherwise."""
+        assert self._func is not None
+        if pre_run_capsule.fails:
+            logger.warning("Some pre-run contexts failed. The result will not be memoized.")
+            return func
+
+        bound_args = bind_arguments(self._func, args, kwargs, pass_pre_run_capsule=self._pass_pre_run_capsule)
+        try:
+            key = memo_key(self._func, bound_args, pre_run_capsule)
+        except TypeError as e:
+            logger.warning(f"The arguments cannot be used as a memoization key: {e} The result will not be memoized.")
+            return func
+        index = MemoIndex(self._vault_dir)
+        serializer = self._memoize_serializer
+        entry = index.lookup(key)
+
+        def _load() -> T:
+            assert entry is not None
+            logger.info(f"Reusing the memoized result of {entry['run_dir']}")
+            _record_memo({"key": key, "hit": True, "run_dir": entry["run_dir"]})
+            return serializer.load(entry["result_path"])  # type: ignore[no-any-return]
+
+        def _run_and_store() -> T:
+            result = func()
+            _record_memo({"key": key, "hit": False, "run_dir": params.run_dir})
+            result_path = params.run_dir / f"{MEMO_RESULT_NAME}{serializer.suffix}"
+            try:
+                serializer.dump(result, result_path)
+            except Exception:
+                logger.exception("Failed to store the result. It will not be memoized.")
+            else:
+                index.store(key, result_path)
+            return result
+
+        return _run_and_store if entry is None else _load
+
+    def exec_command(
+        self,
+        *,
+        shared: SharedPreRun | None = None,
+        post_run: bool = True,
+    ) -> tuple[subprocess.CompletedProcess[str], CapsuleParams]:
+        """Run the command.
+
+        If `post_run` is False, the post-run phase is left to the caller, e.g., to another process.
+        """
         assert self._command is not None
         command_info = CommandInfo(command=self._command)
-        params, _pre_run_capsule = self.pre_run(command_info)
+        params, _pre_run_capsule = self.pre_run(command_info, shared=shared)
+        # Commands may run concurrently in threads, e.g., in `capsula sweep`, so the record channel is exposed
+        # through the environment variables of the subprocess only
+        env = dict(os.environ)
 
         def func() -> subprocess.CompletedProcess[str]:
             assert self._command is not None
-            return subprocess.run(self._command, check=False, capture_output=True, text=True)  # noqa: S603
+            return subprocess.run(self._command, check=False, capture_output=True, text=True, env=env)  # noqa: S603
 
         try:
-            result = self.in_run(params, func)
-        finally:
-            _post_run_capsule = self.post_run(params)
+            result = self.in_run(params, func, record_env=env)
+        except BaseException:
+            self.post_run(params)
+            raise
+        if post_run:
+            self.post_run(params)
 
         return result, params
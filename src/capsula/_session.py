@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Annotated, Any
+
+from typing_extensions import Doc, Self
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from types import TracebackType
+
+    from ._run import Run, SharedPreRun
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """Session in which the process-stable pre-run contexts of each run are encapsulated only once.
+
+    Use `capsula.session()` to create a session.
+    """
+
+    _thread_local = threading.local()
+
+    @classmethod
+    def _get_session_stack(cls) -> list[Session]:
+        if not hasattr(cls._thread_local, "session_stack"):
+            cls._thread_local.session_stack = []
+        return cls._thread_local.session_stack  # type: ignore[no-any-return]
+
+    @classmethod
+    def get_current(cls) -> Session | None:
+        stack = cls._get_session_stack()
+        return stack[-1] if stack else None
+
+    def __init__(self) -> None:
+        # Keyed by the identity of the runs, which are kept alive by the values
+        self._shared: dict[int, tuple[Run[..., Any], SharedPreRun]] = {}
+        self._lock = threading.Lock()
+        self._run_dirs: list[Path] = []
+
+    def shared_pre_run(self, run: Run[..., Any]) -> SharedPreRun:
+        """Get the shared pre-run capsule of `run` in this session, encapsulating it on the first call."""
+        with self._lock:
+            entry = self._shared.get(id(run))
+            if entry is None:
+                # Contexts such as `FileContext` and `EnvVarContext` may change between the calls,
+                # so only the side-effect-free ones, which describe the process and its environment, are shared
+                shared = run.shared_pre_run(include=lambda context: context.side_effect_free)
+                logger.info(f"Session directory of {run.func}: {shared.run_dir}")
+                entry = self._shared[id(run)] = (run, shared)
+        return entry[1]
+
+    def add_run_dir(self, run_dir: Path) -> None:
+        with self._lock:
+            self._run_dirs.append(run_dir)
+
+    @property
+    def run_dirs(self) -> list[Path]:
+        """Run directories of the calls in this session, in the order of the calls."""
+        with self._lock:
+            return list(self._run_dirs)
+
+    @property
+    def session_dirs(self) -> list[Path]:
+        """Run directories of the shared pre-run capsules, one for each run called in this session."""
+        with self._lock:
+            return [shared.run_dir for _, shared in self._shared.values()]
+
+    def __enter__(self) -> Self:
+        self._get_session_stack().append(self)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._get_session_stack().pop()
+
+
+def session() -> Annotated[Session, Doc("Session to be used as a context manager.")]:
+    """Create a session in which calling runs encapsulates their process-stable pre-run contexts only once.
+
+    The first call of each run in the session encapsulates the shareable pre-run contexts that are side-effect-free
+    (such as `CpuContext`, `PlatformContext`, `GitRepositoryContext` without a diff file, and `PackagesContext`)
+    in a session directory. Subsequent calls reuse them without building the contexts again, so each call only pays
+    for the other contexts, such as `FunctionContext`, `FileContext`, `EnvVarContext`, and `CwdContext`, whose values
+    may change between the calls, and the in-run and post-run phases.
+    Each call still gets its own run directory in the vault, whose pre-run capsule refers to the session directory
+    under the `shared_pre_run` key.
+
+    The session applies to the calls made in the thread that entered it.
+
+    Example:
+    ```python
+    import capsula
+
+    @capsula.run()
+    @capsula.context(capsula.FunctionContext.builder(), mode="pre")
+    def evaluate(seed: int) -> float: ...
+
+    with capsula.session() as s:
+        scores = [evaluate(seed) for seed in range(100)]
+    print(s.session_dirs, s.run_dirs)
+    ```
+
+    """
+    return Session()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Annotated, Any, Generic, TypeVar
+
+from typing_extensions import Doc
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping, Sequence
+    from pathlib import Path
+
+    from ._run import Run, SharedPreRun
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+def grid_points(
+    **axes: Annotated[Iterable[Any], Doc("Values of each parameter.")],
+) -> Annotated[list[dict[str, Any]], Doc("Points of the grid.")]:
+    """Generate the points of a parameter grid, i.e., the Cartesian product of the values of the parameters.
+
+    For example:
+    >>> grid_points(lr=[0.1, 0.01], seed=[0, 1])
+    [{'lr': 0.1, 'seed': 0}, {'lr': 0.1, 'seed': 1}, {'lr': 0.01, 'seed': 0}, {'lr': 0.01, 'seed': 1}]
+    """
+    names = list(axes)
+    return [dict(zip(names, values, strict=True)) for values in itertools.product(*axes.values())]
+
+
+def random_points(
+    n: Annotated[int, Doc("Number of points to sample.")],
+    *,
+    seed: Annotated[int | None, Doc("Seed of the random number generator.")] = None,
+    **space: Annotated[
+        Sequence[Any] | Callable[[random.Random], Any],
+        Doc(
+            "Values of each parameter to sample from uniformly, "
+            "or a function that samples a value from the given random number generator.",
+        ),
+    ],
+) -> Annotated[list[dict[str, Any]], Doc("Sampled points.")]:
+    """Sample points randomly from the parameter space.
+
+    For example:
+    ```python
+    points = capsula.random_points(10, seed=42, lr=lambda rng: 10 ** rng.uniform(-4, -1), batch_size=[32, 64])
+    ```
+    """
+    rng = random.Random(seed)
+    return [
+        {name: values(rng) if callable(values) else rng.choice(values) for name, values in space.items()}
+        for _ in range(n)
+    ]
+
+
+@dataclass
+class SweepResult(Generic[T]):
+    """Result of a point in a sweep."""
+
+    params: dict[str, Any]
+    run_dir: Path | None
+    result: T | None = None
+    exception: BaseException | None = None
+
+    @property
+    def run_name(self) -> str | None:
+        return None if self.run_dir is None else self.run_dir.name
+
+
+def _run_point(
+    run: Run[..., Any],
+    shared: SharedPreRun,
+    params: dict[str, Any],
+) -> tuple[Path | None, Any, BaseException | None]:
+    result: Any = None
+    exception: BaseException | None = None
+    try:
+        result = run.call_with_shared_pre_run(shared, **params)
+    except Exception as e:  # noqa: BLE001
+        exception = e
+    try:
+        run_dir: Path | None = run.run_dir
+    except ValueError:
+        run_dir = None
+    return run_dir, result, exception
+
+
+def sweep(
+    run: Annotated[Run[..., T], Doc("Run object created by the `@capsula.run()` decorator.")],
+    points: Annotated[
+        Iterable[Mapping[str, Any]],
+        Doc("Keyword arguments for each call, e.g., generated by `grid_points` or `random_points`."),
+    ],
+    *,
+    max_workers: Annotated[
+        int | None,
+        Doc("Maximum number of worker processes. If not provided, the number of processors is used."),
+    ] = None,
+) -> Annotated[list[SweepResult[T]], Doc("Results of the points, in the order of `points`.")]:
+    """Call the function of a run for each point of a parameter sweep in a process pool.
+
+    The shareable pre-run contexts (such as `CpuContext`, `PlatformContext`, `GitRepositoryContext`,
+    `CommandContext`, and `FileContext`) are encapsulated only once, in a run directory for the sweep itself.
+    Each point still gets its own run directory with the pre-run, in-run, and post-run capsules,
+    and its pre-run capsule refers to the shared run directory under the `shared_pre_run` key.
+
+    The function must be defined at the top level of a module so that the worker processes can import it.
+
+    Example:
+    ```python
+    import capsula
+
+    @capsula.run()
+    def train(lr: float, seed: int) -> float: ...
+
+    if __name__ == "__main__":
+        results = capsula.sweep(train, capsula.grid_points(lr=[0.1, 0.01], seed=[0, 1]), max_workers=4)
+    ```
+
+    """
+    if run.func is None:
+        msg = "sweep only supports runs of functions."
+        raise TypeError(msg)
+
+    point_dicts = [dict(point) for point in points]
+    shared = run.shared_pre_run()
+    logger.info(f"Sweeping {len(point_dicts)} points with the shared pre-run capsule in {shared.run_dir}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_point, run, shared, point) for point in point_dicts]
+        results: list[SweepResult[T]] = []
+        for point, future in zip(point_dicts, futures, strict=True):
+            run_dir, result, exception = future.result()
+            if exception is not None:
+                logger.warning(f"Point {point} failed: {exception}")
+            results.append(SweepResult(params=point, run_dir=run_dir, result=result, exception=exception))
+    return results
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import secrets
 from collections.abc import Hashable, Mapping, Sequence
 from dataclasses import dataclass
 from pathlib import Path
@@ -7,9 +10,15 @@ from typing import TYPE_CHECKING, Annotated, Any
 
 from typing_extensions import Doc
 
+from ._backport import file_digest
+from ._copy import copy_file
+
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
     from types import TracebackType
 
+DIGEST_MANIFEST_NAME = "SHA256SUMS"
+
 
 @dataclass
 class ExceptionInfo:
@@ -41,14 +50,25 @@ def to_flat_dict(
     {("a",): 1, ("b", "c"): 2, ("b", "d"): 3, ("e", "f", "g"): 4}
     """
     flat_dict: dict[Sequence[Hashable], Any] = {}
-    for key, value in nested_dict.items():
-        if isinstance(value, Mapping):
-            flat_dict.update(to_flat_dict(value, _preceding_keys=(*tuple(_preceding_keys), key)))
+    # Depth-first traversal with an explicit stack of iterators, so that the order of the keys is preserved
+    stack: list[tuple[tuple[Hashable, ...], Iterator[tuple[Hashable, Any]]]] = [
+        (tuple(_preceding_keys), iter(nested_dict.items())),
+    ]
+    while stack:
+        prefix, items = stack[-1]
+        for key, value in items:
+            if isinstance(value, Mapping):
+                stack.append(((*prefix, key), iter(value.items())))
+                break
+            flat_dict[(*prefix, key)] = value
         else:
-            flat_dict[(*tuple(_preceding_keys), key)] = value
+            stack.pop()
     return flat_dict
 
 
+_MISSING = object()
+
+
 def to_nested_dict(flat_dict: Mapping[Sequence[Hashable], Any]) -> dict[Hashable, Any]:
     """Convert a flat dictionary to a nested dictionary.
 
@@ -58,21 +78,34 @@ def to_nested_dict(flat_dict: Mapping[Sequence[Hashable], Any]) -> dict[Hashable
     {"a": 1, "b": {"c": 2, "d": 3}, "e": {"f": {"g": 4}}}
     """
     nested_dict: dict[Hashable, Any] = {}
+    # Dictionaries created here, as opposed to mapping values in `flat_dict`, which are copied before being merged into
+    created_dict_ids = {id(nested_dict)}
     for key, value in flat_dict.items():
-        if len(key) == 1:
-            if key[0] in nested_dict:
-                conflicting_value_as_fd = next(iter(to_flat_dict(nested_dict[key[0]])))
-                conflicting_key = (key[0], *conflicting_value_as_fd)
-                msg = f"Key conflicted: {key[0]} and {conflicting_key}"
-                raise ValueError(msg)
-            nested_dict[key[0]] = value
-        elif key[0] in nested_dict:
-            if not isinstance(nested_dict[key[0]], Mapping):
-                msg = f"Key conflicted: {key[0]}"
-                raise ValueError(msg)
-            nested_dict[key[0]].update(to_nested_dict({key[1:]: value}))
-        else:
-            nested_dict[key[0]] = to_nested_dict({key[1:]: value})
+        node = nested_dict
+        if len(key) > 1:
+            for part in key[:-1]:
+                child = node.get(part, _MISSING)
+                if id(child) in created_dict_ids:
+                    node = child
+                    continue
+                if child is _MISSING:
+                    child = node[part] = {}
+                elif isinstance(child, Mapping):
+                    child = node[part] = dict(child)
+                else:
+                    msg = f"Key conflicted: {part}"
+                    raise ValueError(msg)
+                created_dict_ids.add(id(child))
+                node = child
+
+        last = key[-1]
+        if last in node:
+            existing = node[last]
+            conflicting_value_as_fd = next(iter(to_flat_dict(existing)), ()) if isinstance(existing, Mapping) else ()
+            conflicting_key = (last, *conflicting_value_as_fd)
+            msg = f"Key conflicted: {last} and {conflicting_key}"
+            raise ValueError(msg)
+        node[last] = value
     return nested_dict
 
 
@@ -96,3 +129,107 @@ def get_default_config_path() -> Path:
         msg = f"Config file not found: {config_path}"
         raise FileNotFoundError(msg)
     return config_path
+
+
+def _fsync_dir(path: Path) -> None:
+    # Directories cannot be opened for fsync on Windows
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def append_digest(path: Path, digest: str, *, fsync: bool) -> None:
+    # Same format as the output of `sha256sum`, so that `sha256sum -c SHA256SUMS` can also verify the files
+    with (path.parent / DIGEST_MANIFEST_NAME).open("a", encoding="utf-8") as f:
+        f.write(f"{digest}  {path.name}\n")
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _atomic_replace(path: Path, write: Callable[[Path], object], *, fsync: bool) -> None:
+    # The temporary file is created in the same directory so that the rename does not cross file systems
+    tmp_path = path.with_name(f".{path.name}.{secrets.token_hex(4)}.tmp")
+    try:
+        write(tmp_path)
+        if fsync:
+            with tmp_path.open("rb+") as f:
+                os.fsync(f.fileno())
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def atomic_write_bytes(path: Path, data: bytes, *, fsync: bool = False, record_digest: bool = True) -> str:
+    """Write `data` to a temporary file and rename it to `path`, so that `path` is never left partially written.
+
+    If `fsync` is True, the file and its directory are synced to the disk.
+    If `record_digest` is True, the SHA-256 digest of `data` is appended to the digest manifest next to `path`.
+    Returns the SHA-256 digest of `data`.
+    """
+    _atomic_replace(path, lambda tmp_path: tmp_path.write_bytes(data), fsync=fsync)
+    digest = hashlib.sha256(data).hexdigest()
+    if record_digest:
+        append_digest(path, digest, fsync=fsync)
+    return digest
+
+
+def atomic_copy_file(
+    src: Path,
+    dst: Path,
+    *,
+    fsync: bool = False,
+    record_digest: bool = True,
+    digest: str | None = None,
+) -> str:
+    """Copy `src` to a temporary file and rename it to `dst`, so that `dst` is never left partially written.
+
+    See `atomic_write_bytes` for `fsync` and `record_digest`. Returns the SHA-256 digest of the copy.
+    If `digest`, the SHA-256 digest of `src`, is provided, it is recorded without reading the copy again.
+    """
+    _atomic_replace(dst, lambda tmp_path: copy_file(src, tmp_path), fsync=fsync)
+    if digest is None:
+        with dst.open("rb") as f:
+            digest = file_digest(f, "sha256").hexdigest()
+    if record_digest:
+        append_digest(dst, digest, fsync=fsync)
+    return digest
+
+
+def verify_digests(
+    directory: Annotated[Path | str, Doc("Directory containing the digest manifest, e.g., a run directory.")],
+) -> Annotated[list[Path], Doc("Files that are missing or whose content does not match the recorded digest.")]:
+    """Verify the files written by Capsula against the SHA-256 digests recorded in the directory.
+
+    Reports, diff files, and copied files are written atomically, and their digests are recorded
+    in the `SHA256SUMS` file in the same directory.
+    If a file is recorded more than once, the last digest is used.
+    """
+    directory = Path(directory)
+    manifest_path = directory / DIGEST_MANIFEST_NAME
+    if not manifest_path.exists():
+        return []
+
+    digests: dict[str, str] = {}
+    for line in manifest_path.read_text(encoding="utf-8").splitlines():
+        digest, sep, name = line.partition("  ")
+        if sep:
+            digests[name] = digest
+
+    invalid_files = []
+    for name, digest in digests.items():
+        path = directory / name
+        if not path.is_file():
+            invalid_files.append(path)
+            continue
+        with path.open("rb") as f:
+            if file_digest(f, "sha256").hexdigest() != digest:
+                invalid_files.append(path)
+    return invalid_files
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, Literal, TypeAlias, get_args
+
+from typing_extensions import Doc
+
+from ._dedup import PRE_RUN_BLOB_KEY, fingerprint, normalize_volatile_keys, split_volatile
+from ._exceptions import CapsulaConfigurationError
+from ._reporter import load_report
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+    from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+VaultLayout: TypeAlias = Literal["flat", "date", "hash"]
+
+# Written to the run directory after the post-run capsule is reported
+COMPLETION_MARKER_NAME = "COMPLETED"
+# Written to the run directories of the pre-run capsules shared by sweeps, batches, sessions, and the daemon
+SHARED_PRE_RUN_MARKER_NAME = "SHARED_PRE_RUN"
+# Lists the sharded layouts used in the vault, one per line
+_LAYOUTS_FILE_NAME = ".layouts"
+
+_YEAR_SHARD = re.compile(r"^\d{4}$")
+_MONTH_OR_DAY_SHARD = re.compile(r"^\d{2}$")
+_HASH_SHARD = re.compile(r"^[0-9a-f]{2}$")
+
+
+def validate_vault_layout(layout: str) -> VaultLayout:
+    if layout not in get_args(VaultLayout):
+        msg = f"vault-layout must be one of {', '.join(get_args(VaultLayout))}, not {layout!r}."
+        raise CapsulaConfigurationError(msg)
+    return layout  # type: ignore[return-value]
+
+
+def _get_vault_layouts(vault_dir: Path) -> set[str]:
+    try:
+        return set((vault_dir / _LAYOUTS_FILE_NAME).read_text().split())
+    except FileNotFoundError:
+        return set()
+
+
+def record_vault_layout(vault_dir: Path, layout: VaultLayout) -> None:
+    """Record that run directories are created in `vault_dir` with a sharded `layout`.
+
+    `iter_run_dirs` and `find_run_dir` descend only into the shards of the recorded layouts, so that a run of the
+    `flat` layout named like a shard, e.g., `2024`, is not mistaken for a shard.
+    """
+    if layout == "flat" or layout in _get_vault_layouts(vault_dir):
+        return
+    vault_dir.mkdir(parents=True, exist_ok=True)
+    # Appending keeps the layouts recorded concurrently by other processes; duplicated lines are harmless
+    with (vault_dir / _LAYOUTS_FILE_NAME).open("a") as f:
+        f.write(f"{layout}\n")
+
+
+def _hash_shard(run_name: str) -> str:
+    return hashlib.sha256(run_name.encode()).hexdigest()[:2]
+
+
+def get_run_dir(
+    vault_dir: Annotated[Path, Doc("Vault directory.")],
+    run_name: Annotated[str, Doc("Name of the run.")],
+    *,
+    layout: Annotated[VaultLayout, Doc("Layout of the vault directory.")] = "flat",
+    timestamp: Annotated[datetime | None, Doc("Start time of the run. Required for the `date` layout.")] = None,
+) -> Annotated[Path, Doc("Path where the run directory should be created.")]:
+    """Get the path of a new run directory in the vault.
+
+    - `flat`: `<vault>/<run_name>`
+    - `date`: `<vault>/<YYYY>/<MM>/<DD>/<run_name>`, using the local date of `timestamp`
+    - `hash`: `<vault>/<first two hex digits of sha256(run_name)>/<run_name>`
+    """
+    if layout == "flat":
+        return vault_dir / run_name
+    elif layout == "date":
+        if timestamp is None:
+            msg = "timestamp must be provided for the date layout."
+            raise ValueError(msg)
+        local_timestamp = timestamp.astimezone()
+        return vault_dir / f"{local_timestamp:%Y}" / f"{local_timestamp:%m}" / f"{local_timestamp:%d}" / run_name
+    elif layout == "hash":
+        return vault_dir / _hash_shard(run_name) / run_name
+    else:
+        msg = f"layout must be one of {', '.join(get_args(VaultLayout))}, not {layout}."
+        raise ValueError(msg)
+
+
+def _iter_subdirs(path: Path, pattern: re.Pattern[str] | None = None) -> Iterator[os.DirEntry[str]]:
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if pattern is not None and pattern.match(entry.name) is None:
+                    continue
+                if entry.is_dir():
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+def find_run_dir(
+    vault_dir: Annotated[Path, Doc("Vault directory.")],
+    run_name: Annotated[str, Doc("Name of the run.")],
+) -> Annotated[Path, Doc("Path of the run directory.")]:
+    """Find the directory of the run named `run_name` in the vault, regardless of the vault layout.
+
+    The shards are searched only for the layouts that have been used in the vault.
+    `FileNotFoundError` will be raised if the run is not found.
+    """
+    layouts = _get_vault_layouts(vault_dir)
+    candidate = vault_dir / run_name
+    if candidate.is_dir():
+        return candidate
+    if "hash" in layouts:
+        candidate = vault_dir / _hash_shard(run_name) / run_name
+        if candidate.is_dir():
+            return candidate
+
+    if "date" in layouts:
+        for year in _iter_subdirs(vault_dir, _YEAR_SHARD):
+            for month in _iter_subdirs(Path(year.path), _MONTH_OR_DAY_SHARD):
+                for day in _iter_subdirs(Path(month.path), _MONTH_OR_DAY_SHARD):
+                    candidate = Path(day.path) / run_name
+                    if candidate.is_dir():
+                        return candidate
+
+    msg = f"Run {run_name} not found in the vault {vault_dir}."
+    raise FileNotFoundError(msg)
+
+
+def iter_run_dirs(
+    vault_dir: Annotated[Path, Doc("Vault directory.")],
+) -> Annotated[Iterator[Path], Doc("Iterator over the run directories.")]:
+    """Iterate over the run directories in the vault, regardless of the vault layout.
+
+    If the `date` or `hash` layout has been used in the vault, directories whose names look like its shards
+    (four-digit years followed by two-digit months and days, or two hexadecimal digits) are descended into instead
+    of being treated as runs. Otherwise, they are runs of the `flat` layout. Hidden entries are skipped.
+    """
+    layouts = _get_vault_layouts(vault_dir)
+    for entry in _iter_subdirs(vault_dir):
+        if "date" in layouts and _YEAR_SHARD.match(entry.name):
+            for month in _iter_subdirs(Path(entry.path), _MONTH_OR_DAY_SHARD):
+                for day in _iter_subdirs(Path(month.path), _MONTH_OR_DAY_SHARD):
+                    for run in _iter_subdirs(Path(day.path)):
+                        yield Path(run.path)
+        elif "hash" in layouts and _HASH_SHARD.match(entry.name):
+            for run in _iter_subdirs(Path(entry.path)):
+                yield Path(run.path)
+        else:
+            yield Path(entry.path)
+
+
+def is_run_complete(
+    run_dir: Annotated[Path | str, Doc("Run directory.")],
+) -> Annotated[bool, Doc("Whether the capsules of the run are final.")]:
+    """Check whether the post-run phase of a run has finished, i.e., whether its capsules will not change anymore.
+
+    This is `False` while the post-run phase of `capsula run --detach-post-run` is running in the background,
+    and for runs that were interrupted.
+    """
+    return (Path(run_dir) / COMPLETION_MARKER_NAME).is_file()
+
+
+def is_shared_pre_run_dir(run_dir: Path) -> bool:
+    """Check whether `run_dir` holds a shared pre-run capsule rather than a run of its own."""
+    return (run_dir / SHARED_PRE_RUN_MARKER_NAME).is_file()
+
+
+def group_runs_by_environment(
+    vault_dir: Annotated[Path | str, Doc("Vault directory.")],
+    *,
+    volatile_keys: Annotated[
+        Sequence[str | Sequence[str]] | None,
+        Doc(
+            "Keys of the pre-run capsules to ignore for the reports that are not deduplicated. "
+            "A `*` in a key matches any key at its level. If not provided, `function`, `shared_pre_run`, "
+            "and the paths in the run directory recorded by `FileContext`, `GitRepositoryContext`, and "
+            "`CommandContext` will be used.",
+        ),
+    ] = None,
+) -> Annotated[dict[str, list[Path]], Doc("Run directories grouped by the fingerprints of their environments.")]:
+    """Group the runs in the vault by the fingerprints of their pre-run capsules.
+
+    For the pre-run reports deduplicated by `JsonDumpReporter`, the fingerprint in the report is used without
+    reading the shared blob. For the other reports, the fingerprint is computed in the same way from the report.
+    Runs without a pre-run report are skipped.
+    """
+    normalized_keys = normalize_volatile_keys(volatile_keys)
+    groups: dict[str, list[Path]] = {}
+    for run_dir in iter_run_dirs(Path(vault_dir)):
+        try:
+            report = load_report(run_dir, phase="pre", resolve_pre_run_blob=False)
+        except FileNotFoundError:
+            continue
+        except Exception:
+            logger.exception(f"Failed to load the pre-run report of {run_dir}. Skipping.")
+            continue
+        if PRE_RUN_BLOB_KEY in report:
+            digest = report[PRE_RUN_BLOB_KEY]["fingerprint"]
+        else:
+            digest = fingerprint(split_volatile(report, normalized_keys)[0])
+        groups.setdefault(digest, []).append(run_dir)
+    return groups
@@ -1,4 +1,5 @@
-__all__ = ["TimeWatcher", "UncaughtExceptionWatcher", "WatcherBase", "WatcherGroup"]
+__all__ = ["ArtifactWatcher", "TimeWatcher", "UncaughtExceptionWatcher", "WatcherBase", "WatcherGroup"]
+from ._artifact import ArtifactWatcher
 from ._base import WatcherBase, WatcherGroup
 from ._exception import UncaughtExceptionWatcher
 from ._time import TimeWatcher
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated, TypedDict
+
+from typing_extensions import Doc, NotRequired
+
+from capsula._hash import HashData, compute_file_hash, validate_hash_algorithm
+from capsula._utils import ExceptionInfo
+
+from ._base import WatcherBase
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from capsula._run import CapsuleParams
+
+logger = logging.getLogger(__name__)
+
+# Size and modification time in nanoseconds
+_FileState = tuple[int, int]
+
+
+class _ArtifactData(TypedDict):
+    size: int
+    hash: HashData
+
+
+class _ArtifactWatcherData(TypedDict):
+    path: Path
+    files: dict[str, _ArtifactData]
+    fails: NotRequired[dict[str, ExceptionInfo]]
+
+
+class ArtifactWatcher(WatcherBase):
+    """Watcher to hash the files written to a directory during the run.
+
+    The directory is polled in a background thread, and each file is hashed once its size and modification time
+    have stopped changing between two polls. When the run ends, only the files that are new or have changed since
+    they were hashed are hashed, so the catalog of the files is available with little delay.
+
+    Errors in scanning or hashing, e.g., `PermissionError`, do not stop the watcher; they are recorded under `fails`,
+    keyed by the path relative to the directory.
+    """
+
+    @classmethod
+    def builder(
+        cls,
+        path: Annotated[Path | str, Doc("Directory to watch")],
+        *,
+        hash_algorithm: Annotated[
+            str | None,
+            Doc("Hash algorithm to use, as in `FileContext`. If not provided, `sha256` will be used."),
+        ] = None,
+        hash_chunk_size: Annotated[
+            int | None,
+            Doc("Chunk size for the multi-threaded hashing, as in `FileContext`."),
+        ] = None,
+        interval: Annotated[float, Doc("Interval in seconds between the polls of the directory")] = 1.0,
+        path_relative_to_project_root: Annotated[
+            bool,
+            Doc(
+                "Whether `path` is relative to the project root. Will be ignored if `path` is absolute. "
+                "If True, it will be interpreted as relative to the project root. "
+                "If False, `path` will be interpreted as relative to the current working directory. "
+                "It is recommended to set this to True in the configuration file.",
+            ),
+        ] = False,
+    ) -> Callable[[CapsuleParams], ArtifactWatcher]:
+        if hash_algorithm is not None:
+            validate_hash_algorithm(hash_algorithm)
+
+        def build(params: CapsuleParams) -> ArtifactWatcher:
+            if path_relative_to_project_root and not Path(path).is_absolute():
+                dir_path = params.project_root / path
+            else:
+                dir_path = Path(path)
+
+            return cls(dir_path, hash_algorithm=hash_algorithm, hash_chunk_size=hash_chunk_size, interval=interval)
+
+        return build
+
+    def __init__(
+        self,
+        path: Path | str,
+        *,
+        hash_algorithm: str | None = None,
+        hash_chunk_size: int | None = None,
+        interval: float = 1.0,
+    ) -> None:
+        self._path = Path(path)
+        self._hash_algorithm = "sha256" if hash_algorithm is None else hash_algorithm
+        self._hash_chunk_size = hash_chunk_size
+        self._interval = interval
+        self._catalog: dict[str, tuple[_FileState, HashData]] = {}
+        self._fails: dict[str, ExceptionInfo] = {}
+        # Guards the catalog and the fails, which the polling thread updates while `encapsulate` may read them
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _record_fail(self, path: Path, exception: Exception) -> None:
+        name = path.relative_to(self._path).as_posix()
+        logger.warning(f"ArtifactWatcher: failed to process {name} in {self._path}: {exception!r}")
+        with self._lock:
+            self._fails[name] = ExceptionInfo.from_exception(exception)
+
+    def _scan(self) -> dict[str, _FileState]:
+        states: dict[str, _FileState] = {}
+        stack = [self._path]
+        while stack:
+            directory = stack.pop()
+            try:
+                it = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self._record_fail(directory, e)
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            name = Path(entry.path).relative_to(self._path).as_posix()
+                            states[name] = (stat.st_size, stat.st_mtime_ns)
+                    # Removed after being listed
+                    except FileNotFoundError:  # noqa: PERF203
+                        continue
+                    except OSError as e:
+                        self._record_fail(Path(entry.path), e)
+        return states
+
+    def _hash_if_changed(self, name: str, state: _FileState) -> None:
+        with self._lock:
+            cataloged = self._catalog.get(name)
+        if cataloged is not None and cataloged[0] == state:
+            return
+        try:
+            hash_data = compute_file_hash(self._path / name, self._hash_algorithm, chunk_size=self._hash_chunk_size)
+        except FileNotFoundError:
+            return
+        except Exception as e:  # noqa: BLE001
+            self._record_fail(self._path / name, e)
+            return
+        # The state before hashing is recorded, so a file modified while hashing is hashed again later
+        with self._lock:
+            self._catalog[name] = (state, hash_data)
+            self._fails.pop(name, None)
+
+    def _poll(self) -> None:
+        previous: dict[str, _FileState] = {}
+        while not self._stop.wait(self._interval):
+            # An error must not stop the thread, or the remaining files would all be hashed at the end of the run
+            try:
+                current = self._scan()
+                for name, state in current.items():
+                    # Files whose state did not change since the last poll are likely to have been closed
+                    if previous.get(name) == state:
+                        self._hash_if_changed(name, state)
+                previous = current
+            except Exception as e:  # noqa: BLE001, PERF203
+                self._record_fail(self._path, e)
+
+    @contextmanager
+    def watch(self) -> Iterator[None]:
+        self._stop.clear()
+        with self._lock:
+            self._fails = {}
+        thread = threading.Thread(target=self._poll, name=f"ArtifactWatcher-{self._path}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            self._stop.set()
+            thread.join()
+            # Raising here would hide the exception of the function, if any
+            try:
+                self._finish()
+            except Exception as e:  # noqa: BLE001
+                self._record_fail(self._path, e)
+
+    def _finish(self) -> None:
+        current = self._scan()
+        with self._lock:
+            n_hashed_in_background = sum(
+                1 for name, state in current.items() if name in self._catalog and self._catalog[name][0] == state
+            )
+        logger.debug(f"ArtifactWatcher: {n_hashed_in_background}/{len(current)} files were hashed in background.")
+        for name, state in current.items():
+            self._hash_if_changed(name, state)
+        with self._lock:
+            self._catalog = {name: self._catalog[name] for name in sorted(current) if name in self._catalog}
+
+    def encapsulate(self) -> _ArtifactWatcherData:
+        with self._lock:
+            catalog = dict(self._catalog)
+            fails = dict(sorted(self._fails.items()))
+        data: _ArtifactWatcherData = {
+            "path": self._path,
+            "files": {name: {"size": state[0], "hash": hash_data} for name, (state, hash_data) in catalog.items()},
+        }
+        if fails:
+            data["fails"] = fails
+        return data
+
+    def default_key(self) -> tuple[str, str]:
+        return ("artifacts", str(self._path))
@@ -1,8 +1,11 @@
 import subprocess
+import sys
+import time
 from pathlib import Path
 
 import pytest
 
+import capsula
 from capsula._context._command import CommandContext
 
 
@@ -43,3 +46,74 @@ def command_context_fail(tmp_path: Path) -> CommandContext:
 def test_command_context_encapsulate_fail(command_context_fail: CommandContext) -> None:
     with pytest.raises(subprocess.CalledProcessError):
         command_context_fail.encapsulate()
+
+
+def test_command_context_timeout_kills_process_group(tmp_path: Path) -> None:
+    marker = tmp_path / "marker"
+    # The grandchild process would create the marker file if it survived the timeout
+    context = CommandContext(f"(sleep 1 && touch {marker}) & sleep 10", cwd=tmp_path, timeout=0.2)
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        context.encapsulate()
+    assert time.monotonic() - start < 5
+    time.sleep(1.5)
+    assert not marker.exists()
+
+
+def test_command_context_max_output_size(tmp_path: Path) -> None:
+    context = CommandContext(
+        f"{sys.executable} -c \"print('a' * 1000 + 'b' * 1000, end='')\"",
+        cwd=tmp_path,
+        max_output_size=100,
+    )
+    data = context.encapsulate()
+    assert data["stdout"] == "a" * 50 + "\n[... 1900 bytes truncated ...]\n" + "b" * 50
+
+
+def test_command_context_output_to_file(tmp_path: Path) -> None:
+    context = CommandContext("echo hello && echo error >&2", cwd=tmp_path, output_dir=tmp_path / "run")
+    data = context.encapsulate()
+    assert data["stdout"] is None
+    assert data["stderr"] is None
+    assert data["stdout_file"]["path"].read_text() == "hello\n"
+    assert data["stdout_file"]["size"] == len("hello\n")
+    assert data["stderr_file"]["path"].read_text() == "error\n"
+    assert capsula.verify_digests(tmp_path / "run") == []
+
+
+def test_command_context_cache(tmp_path: Path) -> None:
+    (tmp_path / "input.txt").write_text("1")
+    # The command appends to a log file so that the number of actual executions can be counted
+    context = CommandContext(
+        "echo run >> log.txt && cat input.txt",
+        cwd=tmp_path,
+        cache_inputs=["input*.txt", "missing/**/*.lock"],
+        cache_dir=tmp_path / "cache",
+    )
+    first = context.encapsulate()
+    second = context.encapsulate()
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["stdout"] == first["stdout"] == "1"
+    assert second["returncode"] == 0
+
+    (tmp_path / "input.txt").write_text("2")
+    third = context.encapsulate()
+    assert third["cached"] is False
+    assert third["stdout"] == "2"
+    assert (tmp_path / "log.txt").read_text() == "run\n" * 2
+
+
+def test_command_context_cache_builder(tmp_path: Path) -> None:
+    params = capsula.CapsuleParams(
+        exec_info=None,
+        run_name="run",
+        run_dir=tmp_path / "vault" / "run",
+        phase="pre",
+        project_root=tmp_path,
+        vault_dir=tmp_path / "vault",
+    )
+    context = CommandContext.builder("echo hello", cwd=tmp_path, cache_inputs=["pyproject.toml"])(params)
+    context.encapsulate()
+    assert len(list((tmp_path / "vault" / ".cache" / "command").glob("*.json"))) == 1
+    assert context.encapsulate()["cached"] is True
@@ -65,3 +65,35 @@ def test_ignore_missing_true(tmp_path: Path) -> None:
     assert data["copied_to"] == ()
     assert data["moved_to"] is None
     assert data["hash"] is None
+
+
+def test_file_context_copy_to_multiple_destinations(source_file: Path, tmp_path: Path) -> None:
+    destinations = [tmp_path / "run1", tmp_path / "run2", tmp_path / "run3"]
+    for destination in destinations:
+        destination.mkdir()
+    fc = capsula.FileContext(path=source_file, hash_algorithm="md5", copy_to=destinations)
+    info = fc.encapsulate()
+    assert info["hash"] == {"algorithm": "md5", "digest": _SOURCE_FILE_HASH["md5"]}
+    for destination in destinations:
+        assert (destination / "source.txt").read_text() == "This is a test file"
+        assert (destination / "SHA256SUMS").read_text() == f"{_SOURCE_FILE_HASH['sha256']}  source.txt\n"
+        assert capsula.verify_digests(destination) == []
+
+
+def test_file_context_shareable(source_file: Path, tmp_path: Path) -> None:
+    assert capsula.FileContext(path=source_file).shareable
+    assert not capsula.FileContext(path=source_file, copy_to=tmp_path).shareable
+    assert not capsula.FileContext(path=source_file, move_to=tmp_path).shareable
+
+
+def test_file_context_copy_with_shared_pre_run(source_file: Path, tmp_path: Path) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault")
+    @capsula.context(capsula.FileContext.builder(source_file, copy=True), mode="pre")
+    def f() -> Path:
+        return capsula.Run.get_current().run_dir
+
+    # The file is copied to the run directory of each call, not only to the shared one
+    shared = f.shared_pre_run()
+    run_dirs = [f.call_with_shared_pre_run(shared) for _ in range(2)]
+    for run_dir in run_dirs:
+        assert (run_dir / source_file.name).read_text() == "This is a test file"
@@ -0,0 +1,21 @@
+from importlib import metadata
+
+import capsula
+
+
+def test_packages_context() -> None:
+    data = capsula.PackagesContext().encapsulate()
+    packages = {package["name"]: package for package in data["packages"]}
+    assert packages["orjson"]["version"] == metadata.version("orjson")
+    assert packages["orjson"]["editable"] is False
+    assert "fingerprint" not in data
+
+
+def test_packages_context_fingerprint() -> None:
+    first = capsula.PackagesContext(fingerprint=True).encapsulate()
+    second = capsula.PackagesContext(fingerprint=True).encapsulate()
+    assert len(first["fingerprint"]) == 64
+    assert first["fingerprint"] == second["fingerprint"]
+    # The memoized list is not shared with the capsules
+    first["packages"][0]["version"] = "0"
+    assert second["packages"][0]["version"] != "0"
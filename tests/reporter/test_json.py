@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import gzip
+import importlib.util
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+import capsula
+from capsula._dedup import merge_nested, split_volatile
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+_HAS_ZSTD = sys.version_info >= (3, 14) or importlib.util.find_spec("zstandard") is not None
+
+
+@pytest.mark.parametrize(
+    ("compression", "suffix"),
+    [
+        (None, ".json"),
+        ("gzip", ".json.gz"),
+        pytest.param("zstd", ".json.zst", marks=pytest.mark.skipif(not _HAS_ZSTD, reason="zstd is not available")),
+    ],
+)
+def test_compressed_report(compression: str | None, suffix: str) -> None:
+    @capsula.run(ignore_config=True)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(compression=compression), mode="in")  # type: ignore[arg-type]
+    def f() -> Path:
+        capsula.record(("metrics", "loss"), 0.25)
+        return capsula.Run.get_current().run_dir
+
+    run_dir = f()
+    assert (run_dir / f"in-run-report{suffix}").exists()
+    assert capsula.load_report(run_dir, phase="in") == {"metrics": {"loss": 0.25}}
+    assert capsula.load_report(run_dir / f"in-run-report{suffix}") == {"metrics": {"loss": 0.25}}
+    assert capsula.verify_digests(run_dir) == []
+
+
+def test_compression_inferred_from_path(tmp_path: Path) -> None:
+    path = tmp_path / "report.json.gz"
+    capsula.JsonDumpReporter(path).report(capsula.Capsule({"a": 1}, {}))
+    assert gzip.decompress(path.read_bytes()) == b'{"a":1}'
+
+
+def test_invalid_compression() -> None:
+    with pytest.raises(capsula.CapsulaConfigurationError, match="compression must be one of"):
+        capsula.JsonDumpReporter.builder(compression="lzma")  # type: ignore[arg-type]
+
+
+def test_load_report_not_found(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError, match="Report of the post-run phase not found"):
+        capsula.load_report(tmp_path, phase="post")
+
+
+def test_deduplicated_pre_run_report(tmp_path: Path) -> None:
+    vault_dir = tmp_path / "vault"
+
+    @capsula.run(ignore_config=True, vault_dir=vault_dir)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(deduplicate=True), mode="pre")
+    @capsula.context(capsula.EnvVarContext("HOME"), mode="pre")
+    @capsula.context(capsula.FunctionContext.builder(), mode="pre")
+    def f(x: int) -> Path:  # noqa: ARG001
+        return capsula.Run.get_current().run_dir
+
+    run_dirs = [f(1), f(2)]
+    blobs = list((vault_dir / ".blobs" / "pre-run").glob("*.json"))
+    assert len(blobs) == 1
+
+    raw_report = capsula.load_report(run_dirs[1], resolve_pre_run_blob=False)
+    assert raw_report["__pre_run_blob"]["fingerprint"] == blobs[0].name.removesuffix(".json")
+    assert "env" not in raw_report
+    assert raw_report["function"]["f"]["bound_args"] == {"x": 2}
+
+    report = capsula.load_report(run_dirs[1])
+    assert report["function"]["f"]["bound_args"] == {"x": 2}
+    assert "HOME" in report["env"]
+
+    groups = capsula.group_runs_by_environment(vault_dir)
+    assert len(groups) == 1
+    assert set(groups[raw_report["__pre_run_blob"]["fingerprint"]]) == set(run_dirs)
+
+
+def test_deduplicated_pre_run_report_with_copied_file(tmp_path: Path) -> None:
+    vault_dir = tmp_path / "vault"
+    config_file = tmp_path / "config.toml"
+    config_file.write_text("lr = 0.1\n")
+
+    @capsula.run(ignore_config=True, vault_dir=vault_dir)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(deduplicate=True), mode="pre")
+    @capsula.context(capsula.FileContext.builder(config_file, copy=True), mode="pre")
+    def f() -> Path:
+        return capsula.Run.get_current().run_dir
+
+    run_dirs = [f(), f()]
+    # The copies are in the run directories, but the environment is the same
+    assert len(list((vault_dir / ".blobs" / "pre-run").glob("*.json"))) == 1
+    for run_dir in run_dirs:
+        copied_to = capsula.load_report(run_dir)["file"][str(config_file)]["copied_to"]
+        assert copied_to == [str(run_dir / "config.toml")]
+    assert len(capsula.group_runs_by_environment(vault_dir)) == 1
+
+
+def test_group_runs_by_environment_without_deduplication(tmp_path: Path) -> None:
+    vault_dir = tmp_path / "vault"
+
+    @capsula.run(ignore_config=True, vault_dir=vault_dir)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="pre")
+    @capsula.context(capsula.FunctionContext.builder(), mode="pre")
+    def f(x: int) -> Path:  # noqa: ARG001
+        return capsula.Run.get_current().run_dir
+
+    run_dirs = {f(1), f(2)}
+    groups = capsula.group_runs_by_environment(vault_dir)
+    assert len(groups) == 1
+    assert set(next(iter(groups.values()))) == run_dirs
+    assert len(capsula.group_runs_by_environment(vault_dir, volatile_keys=[])) == 2
+
+
+def test_split_volatile() -> None:
+    nested = {"env": {"HOME": "/home", "JOB_ID": "1"}, "cwd": "/work"}
+    stable, volatile = split_volatile(nested, [("env", "JOB_ID"), ("missing", "key")])
+    assert stable == {"env": {"HOME": "/home"}, "cwd": "/work"}
+    assert volatile == {"env": {"JOB_ID": "1"}}
+    assert nested["env"] == {"HOME": "/home", "JOB_ID": "1"}
+    assert merge_nested(stable, volatile) == nested
+    assert split_volatile({"env": {"JOB_ID": "1"}}, [("env", "JOB_ID")])[0] == {}
+
+
+def test_split_volatile_wildcard() -> None:
+    nested = {"file": {"a": {"hash": "x", "copied_to": ["/run/1/a"]}, "b": {"hash": "y"}}}
+    stable, volatile = split_volatile(nested, [("file", "*", "copied_to")])
+    assert stable == {"file": {"a": {"hash": "x"}, "b": {"hash": "y"}}}
+    assert volatile == {"file": {"a": {"copied_to": ["/run/1/a"]}}}
+    assert merge_nested(stable, volatile) == nested
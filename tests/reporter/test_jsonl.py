@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import orjson
+
+import capsula
+from capsula._utils import ExceptionInfo
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_records_are_written_before_the_run_finishes() -> None:
+    @capsula.run(ignore_config=True)
+    @capsula.watcher(capsula.TimeWatcher("duration"))
+    @capsula.reporter(capsula.JsonLinesReporter.builder(), mode="in")
+    def f() -> Path:
+        run_dir = capsula.Run.get_current().run_dir
+        capsula.record("loss", 0.5)
+        capsula.record(("metrics", "accuracy"), 0.9)
+        # The records are already on disk while the function is still running
+        assert capsula.JsonLinesReporter.load(run_dir / "in-run-report.jsonl") == {
+            "loss": 0.5,
+            "metrics": {"accuracy": 0.9},
+        }
+        return run_dir
+
+    run_dir = f()
+    report = capsula.JsonLinesReporter.load(run_dir / "in-run-report.jsonl")
+    assert report["loss"] == 0.5
+    assert report["metrics"] == {"accuracy": 0.9}
+    assert "duration" in report["time"]
+    # Each item is written exactly once
+    lines = (run_dir / "in-run-report.jsonl").read_bytes().splitlines()
+    assert len(lines) == 3
+
+
+def test_load_ignores_truncated_line(tmp_path: Path) -> None:
+    path = tmp_path / "report.jsonl"
+    path.write_bytes(
+        orjson.dumps({"key": ["a"], "value": 1}) + b"\n" + orjson.dumps({"key": ["b", "c"], "value": [1, 2]})[:10],
+    )
+    assert capsula.JsonLinesReporter.load(path) == {"a": 1}
+
+
+def test_report_fails(tmp_path: Path) -> None:
+    path = tmp_path / "report.jsonl"
+    capsule = capsula.Capsule({"a": 1}, {("b", "c"): ExceptionInfo.from_exception(ValueError("invalid"))})
+    capsula.JsonLinesReporter(path).report(capsule)
+    assert capsula.JsonLinesReporter.load(path) == {
+        "a": 1,
+        "__fails": {"b": {"c": {"exc_type": "ValueError", "exc_value": "invalid", "traceback": None}}},
+    }
+
+
+def test_report_unserializable_value(tmp_path: Path) -> None:
+    path = tmp_path / "report.jsonl"
+    reporter = capsula.JsonLinesReporter(path)
+    reporter.report_item("before", object())
+    reporter.report(capsula.Capsule({"a": object(), "b": 2}, {}))
+    report = capsula.JsonLinesReporter.load(path)
+    # The other items are still written, and the file is closed
+    assert report["b"] == 2
+    assert set(report["__fails"]) == {"before", "a"}
+    assert report["__fails"]["a"]["exc_type"] == "TypeError"
+    assert reporter._file is None
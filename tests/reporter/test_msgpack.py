@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import capsula
+
+pytest.importorskip("msgpack")
+
+
+def test_round_trip_preserves_types(tmp_path: Path) -> None:
+    data: dict[str | tuple[str, ...], Any] = {
+        ("time", "duration"): timedelta(days=1, seconds=2, microseconds=3),
+        ("file", "path"): Path("/tmp/file.txt"),  # noqa: S108
+        "started_at": datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc),
+        "naive": datetime(2026, 10, 17, 12, 0),  # noqa: DTZ001
+        "blob": b"\x00\x01",
+        "values": [1, 2.5, None, "x"],
+        "pair": (1, "a"),
+    }
+    path = tmp_path / "report.msgpack"
+    capsula.MsgpackReporter(path).report(capsula.Capsule(data, {}))
+
+    assert capsula.MsgpackReporter.load(path) == {
+        "time": {"duration": timedelta(days=1, seconds=2, microseconds=3)},
+        "file": {"path": Path("/tmp/file.txt")},  # noqa: S108
+        "started_at": datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc),
+        "naive": datetime(2026, 10, 17, 12, 0),  # noqa: DTZ001
+        "blob": b"\x00\x01",
+        "values": [1, 2.5, None, "x"],
+        # Tuples are not distinguished from lists
+        "pair": [1, "a"],
+    }
+
+
+def test_run_with_msgpack_reporter() -> None:
+    @capsula.run(ignore_config=True)
+    @capsula.watcher(capsula.TimeWatcher("duration"))
+    @capsula.watcher(capsula.UncaughtExceptionWatcher("exception"))
+    @capsula.reporter(capsula.MsgpackReporter.builder(), mode="in")
+    def f() -> Path:
+        capsula.record("path", Path("output.txt"))
+        return capsula.Run.get_current().run_dir
+
+    run_dir = f()
+    report = capsula.load_report(run_dir, phase="in")
+    assert isinstance(report["time"]["duration"], timedelta)
+    assert report["exception"]["exception"] == {"exc_type": None, "exc_value": None, "traceback": None}
+    assert report["path"] == Path("output.txt")
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import orjson
+import pytest
+
+import capsula
+from capsula._run import RunDtoCommand
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def square_and_record(x: int) -> int:
+    capsula.record(("squares", str(x)), x * x)
+    return x * x
+
+
+@capsula.run(ignore_config=True, record_channel=True)
+@capsula.reporter(capsula.JsonDumpReporter.builder(), mode="in")
+def parallel_squares(n: int) -> Path:
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        pool.map(square_and_record, range(n))
+    capsula.record("n", n)
+    return capsula.Run.get_current().run_dir
+
+
+def test_record_from_pool_workers() -> None:
+    run_dir = parallel_squares(4)
+    in_run_report = orjson.loads((run_dir / "in-run-report.json").read_bytes())
+    assert in_run_report["n"] == 4
+    assert in_run_report["squares"] == {str(x): x * x for x in range(4)}
+
+
+def test_record_from_subprocess() -> None:
+    @capsula.run(ignore_config=True, record_channel=True)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="in")
+    def f() -> Path:
+        subprocess.run(
+            [sys.executable, "-c", "import capsula; capsula.record(['child', 'value'], [1, 2.5, 'x'])"],
+            check=True,
+        )
+        return capsula.Run.get_current().run_dir
+
+    run_dir = f()
+    in_run_report = orjson.loads((run_dir / "in-run-report.json").read_bytes())
+    assert in_run_report["child"]["value"] == [1, 2.5, "x"]
+    assert not (run_dir / "record.sock").exists()
+
+
+def test_record_without_channel_in_child_raises() -> None:
+    with pytest.raises(RuntimeError, match="No active encapsulator found"):
+        capsula.record("key", "value")
+
+
+def test_record_from_command(tmp_path: Path) -> None:
+    # A command that uses the `capsula record` CLI and a raw line of JSON written to the socket
+    script = (
+        "import os, socket, subprocess, sys\n"
+        "cli = [sys.executable, '-c', 'from capsula._cli import app; app()', 'record']\n"
+        "subprocess.run([*cli, 'metrics.loss', '0.5'], check=True)\n"
+        "subprocess.run([*cli, 'label', 'not json'], check=True)\n"
+        "with socket.socket(socket.AF_UNIX) as sock:\n"
+        "    sock.connect(os.environ['CAPSULA_RECORD_SOCKET'])\n"
+        '    sock.sendall(b\'{"key": "raw", "value": {"a": 1}}\\n\')\n'
+    )
+    run_dto = RunDtoCommand(
+        run_name_factory=lambda _x, _y, _z: "command_run",
+        vault_dir=tmp_path,
+        record_channel=True,
+        command=(sys.executable, "-c", script),
+    )
+    run_dto.add_reporter(capsula.JsonDumpReporter.builder(), mode="in")
+    result, params = capsula.Run(run_dto).exec_command()
+    assert result.returncode == 0, result.stderr
+
+    in_run_report = orjson.loads((params.run_dir / "in-run-report.json").read_bytes())
+    assert in_run_report["metrics"]["loss"] == 0.5
+    assert in_run_report["label"] == "not json"
+    assert in_run_report["raw"] == {"a": 1}
+
+
+def test_record_from_concurrent_commands(tmp_path: Path) -> None:
+    # The commands overlap, so each must see the socket of its own run
+    script = (
+        "import os, sys, time\n"
+        "from capsula._channel import send_record\n"
+        "time.sleep(0.2)\n"
+        "send_record(os.environ['CAPSULA_RECORD_SOCKET'], 'index', int(sys.argv[1]))\n"
+    )
+
+    def exec_command(index: int) -> tuple[int, Path]:
+        run_dto = RunDtoCommand(
+            run_name_factory=lambda _x, _y, _z: f"command_run_{index}",
+            vault_dir=tmp_path,
+            record_channel=True,
+            command=(sys.executable, "-c", script, str(index)),
+        )
+        run_dto.add_reporter(capsula.JsonDumpReporter.builder(), mode="in")
+        result, params = capsula.Run(run_dto).exec_command()
+        assert result.returncode == 0, result.stderr
+        return index, params.run_dir
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(exec_command, range(4)))
+
+    for index, run_dir in results:
+        in_run_report = orjson.loads((run_dir / "in-run-report.json").read_bytes())
+        assert in_run_report == {"index": index}
+    assert "CAPSULA_RECORD_SOCKET" not in os.environ
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import os
+import shlex
+import sys
+import time
+from pathlib import Path
+
+import orjson
+import pytest
+from typer.testing import CliRunner
+
+import capsula
+from capsula._cli import FINALIZE_LOG_NAME, app
+from capsula._run import RunDtoCommand
+
+# Wide enough for the summary tables not to wrap
+runner = CliRunner(env={"COLUMNS": "1000"})
+
+
+@pytest.fixture(autouse=True)
+def _python_on_path(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Run names are derived from the first argument of the commands, which must not be an absolute path
+    monkeypatch.setenv("PATH", f"{Path(sys.executable).parent}{os.pathsep}{os.environ['PATH']}")
+
+
+def _python_command(code: str) -> str:
+    return shlex.join([Path(sys.executable).name, "-c", code])
+
+
+def _table_rows(output: str, labels: list[str]) -> list[str]:
+    """Labels in the order of the rows of the summary table in `output`."""
+    lines = [line for line in output.splitlines() if any(label in line for label in labels)]
+    return [next(label for label in labels if label in line) for line in lines]
+
+
+def test_run_batch(tmp_path: Path) -> None:
+    batch_file = tmp_path / "commands.txt"
+    # The first command finishes last, but its row comes first
+    batch_file.write_text(
+        "\n".join(
+            [
+                "# comment",
+                _python_command("import time; time.sleep(0.5); print('first')"),
+                "",
+                _python_command("print('second')"),
+                _python_command("print('third')"),
+            ],
+        ),
+    )
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "--batch",
+            str(batch_file),
+            "--max-workers",
+            "3",
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--ignore-config",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "3 of 3 commands succeeded, 0 failed" in result.output
+    assert _table_rows(result.output, ["first", "second", "third"]) == ["first", "second", "third"]
+
+    # One run directory for each command, and one for the shared pre-run capsule
+    run_dirs = [path for path in (tmp_path / "vault").iterdir() if path.is_dir()]
+    assert len(run_dirs) == 4
+
+
+def test_run_batch_failure_exit_code(tmp_path: Path) -> None:
+    commands = [_python_command("raise SystemExit(3)"), _python_command("print('ok')")]
+    result = runner.invoke(
+        app,
+        ["run", "--batch", "-", "--vault-dir", str(tmp_path), "--ignore-config"],
+        input="\n".join(commands),
+    )
+    assert result.exit_code == 1
+    assert "1 of 2 commands succeeded, 1 failed" in result.output
+
+
+def test_run_batch_rejects_command(tmp_path: Path) -> None:
+    result = runner.invoke(
+        app,
+        ["run", "--batch", "-", "--vault-dir", str(tmp_path), "--ignore-config", "--", "echo", "hello"],
+        input="",
+    )
+    assert result.exit_code != 0
+    assert "cannot be given with --batch" in result.output
+
+
+def test_run_batch_record_channel(tmp_path: Path) -> None:
+    code = "import os, sys, time; time.sleep(0.2); from capsula._channel import send_record; "
+    commands = [
+        _python_command(code + f"send_record(os.environ['CAPSULA_RECORD_SOCKET'], 'index', {index})")
+        for index in range(3)
+    ]
+    (tmp_path / "capsula.toml").write_text('[in-run]\nreporters = [{ type = "JsonDumpReporter" }]\n')
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "--batch",
+            "-",
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--config-path",
+            str(tmp_path / "capsula.toml"),
+            "--record-channel",
+        ],
+        input="\n".join(commands),
+    )
+    assert result.exit_code == 0, result.output
+
+    indices = sorted(
+        orjson.loads(report.read_bytes())["index"] for report in (tmp_path / "vault").glob("*/in-run-report.json")
+    )
+    assert indices == [0, 1, 2]
+
+
+def test_sweep_grid(tmp_path: Path) -> None:
+    code = "import pathlib, sys; pathlib.Path(sys.argv[1], sys.argv[2] + '-' + sys.argv[3]).touch()"
+    result = runner.invoke(
+        app,
+        [
+            "sweep",
+            "-p",
+            "x=1,2",
+            "-p",
+            "y=a,b,c",
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--ignore-config",
+            "--",
+            *shlex.split(_python_command(code)),
+            str(tmp_path),
+            "{x}",
+            "{y}",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "6 of 6 commands succeeded, 0 failed" in result.output
+    assert sorted(path.name for path in tmp_path.iterdir() if path.is_file()) == [
+        "1-a",
+        "1-b",
+        "1-c",
+        "2-a",
+        "2-b",
+        "2-c",
+    ]
+    labels = [f"x={x}, y={y}" for x in (1, 2) for y in "abc"]
+    assert _table_rows(result.output, labels) == labels
+
+
+def test_sweep_keeps_other_braces(tmp_path: Path) -> None:
+    (tmp_path / "input.txt").write_text("input")
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    result = runner.invoke(
+        app,
+        [
+            "sweep",
+            "-p",
+            "i=0,1",
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--ignore-config",
+            "--",
+            "find",
+            str(tmp_path),
+            "-maxdepth",
+            "1",
+            "-name",
+            "input.txt",
+            "-exec",
+            "cp",
+            "{}",
+            str(output_dir / "{i}"),
+            ";",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "2 of 2 commands succeeded, 0 failed" in result.output
+    assert sorted(path.name for path in output_dir.iterdir()) == ["0", "1"]
+    assert (output_dir / "0").read_text() == "input"
+
+
+def test_sweep_max_workers(tmp_path: Path) -> None:
+    # Each command records the interval in which it ran
+    code = (
+        "import pathlib, sys, time; start = time.time(); time.sleep(0.3); "
+        "pathlib.Path(sys.argv[1], sys.argv[2]).write_text(str(start) + ' ' + str(time.time()))"
+    )
+    result = runner.invoke(
+        app,
+        [
+            "sweep",
+            "-p",
+            "i=0,1,2,3,4,5",
+            "--max-workers",
+            "2",
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--ignore-config",
+            "--",
+            *shlex.split(_python_command(code)),
+            str(tmp_path),
+            "{i}",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    intervals = [tuple(map(float, path.read_text().split())) for path in tmp_path.iterdir() if path.is_file()]
+    assert len(intervals) == 6
+    for start, _ in intervals:
+        assert sum(other_start <= start < other_end for other_start, other_end in intervals) <= 2
+
+
+def test_sweep_failure_exit_code(tmp_path: Path) -> None:
+    result = runner.invoke(
+        app,
+        [
+            "sweep",
+            "-p",
+            "code=0,3,0",
+            "--vault-dir",
+            str(tmp_path),
+            "--ignore-config",
+            "--",
+            *shlex.split(_python_command("import sys; sys.exit(int(sys.argv[1]))")),
+            "{code}",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "2 of 3 commands succeeded, 1 failed" in result.output
+
+
+def _write_post_run_config(tmp_path: Path, post_run_context: str) -> Path:
+    config_path = tmp_path / "capsula.toml"
+    config_path.write_text(
+        f'[post-run]\ncontexts = [{post_run_context}]\nreporters = [{{ type = "JsonDumpReporter" }}]\n',
+    )
+    return config_path
+
+
+def test_run_detach_post_run(tmp_path: Path) -> None:
+    sleep = _python_command("import time; time.sleep(3)")
+    config_path = _write_post_run_config(tmp_path, f'{{ type = "CommandContext", command = "{sleep}" }}')
+    start = time.perf_counter()
+    result = runner.invoke(
+        app,
+        [
+            "run",
+            "--detach-post-run",
+            "--run-name",
+            "detached",
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--config-path",
+            str(config_path),
+            "--",
+            *shlex.split(_python_command("raise SystemExit(3)")),
+        ],
+    )
+    # The return code of the command is returned before the slow post-run context finishes
+    assert time.perf_counter() - start < 3
+    assert result.exit_code == 3, result.output
+    run_dir = tmp_path / "vault" / "detached"
+    assert not capsula.is_run_complete(run_dir)
+
+    deadline = time.monotonic() + 60
+    while not capsula.is_run_complete(run_dir) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert capsula.is_run_complete(run_dir), (run_dir / FINALIZE_LOG_NAME).read_text()
+    post_run_report = capsula.load_report(run_dir, phase="post")
+    assert post_run_report["command"][sleep]["returncode"] == 0
+
+
+def test_finalize(tmp_path: Path) -> None:
+    config_path = _write_post_run_config(tmp_path, '{ type = "CwdContext" }')
+    command = tuple(shlex.split(_python_command("print('hello')")))
+    run_dto = RunDtoCommand(run_name_factory=lambda _x, _y, _z: "run", vault_dir=tmp_path / "vault", command=command)
+    _, params = capsula.Run(run_dto).exec_command(post_run=False)
+    assert not capsula.is_run_complete(params.run_dir)
+
+    result = runner.invoke(
+        app,
+        [
+            "finalize",
+            "--run-name",
+            params.run_name,
+            "--run-dir",
+            str(params.run_dir),
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--config-path",
+            str(config_path),
+            "--",
+            *command,
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert capsula.is_run_complete(params.run_dir)
+    assert "cwd" in orjson.loads((params.run_dir / "post-run-report.json").read_bytes())
+
+
+def test_finalize_missing_run_dir(tmp_path: Path) -> None:
+    run_dir = tmp_path / "vault" / "missing"
+    result = runner.invoke(
+        app,
+        [
+            "finalize",
+            "--run-name",
+            "missing",
+            "--run-dir",
+            str(run_dir),
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--ignore-config",
+            "--",
+            "echo",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "does not exist" in result.output
+    assert not run_dir.exists()
+
+
+def test_finalize_invalid_config(tmp_path: Path) -> None:
+    run_dir = tmp_path / "vault" / "run"
+    run_dir.mkdir(parents=True)
+    config_path = tmp_path / "capsula.toml"
+    config_path.write_text("[post-run\n")
+    result = runner.invoke(
+        app,
+        [
+            "finalize",
+            "--run-name",
+            "run",
+            "--run-dir",
+            str(run_dir),
+            "--vault-dir",
+            str(tmp_path / "vault"),
+            "--config-path",
+            str(config_path),
+            "--",
+            "echo",
+        ],
+    )
+    assert result.exit_code == 1
+    assert "Failed to load the configuration of the run" in result.output
+    assert not capsula.is_run_complete(run_dir)
+    assert not (run_dir / "post-run-report.json").exists()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+import capsula
+from capsula import _client
+from capsula._daemon import CapsulaDaemon
+from capsula._run import RunDtoCommand, default_run_name_factory
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets are required")
+
+
+@pytest.fixture
+def daemon(tmp_path: Path) -> Iterator[CapsulaDaemon]:
+    def build_run_dto() -> RunDtoCommand:
+        run_dto = RunDtoCommand(run_name_factory=default_run_name_factory, vault_dir=tmp_path / "vault")
+        run_dto.add_context(capsula.PlatformContext(), mode="pre")
+        run_dto.add_context(capsula.CwdContext(), mode="pre")
+        run_dto.add_reporter(capsula.JsonDumpReporter.builder(), mode="all")
+        return run_dto
+
+    (tmp_path / "pyproject.toml").touch()
+    # The path of a Unix domain socket must be short
+    socket_dir = Path(tempfile.mkdtemp(prefix="capsula-"))
+    capsula_daemon = CapsulaDaemon(build_run_dto, socket_path=socket_dir / "daemon.sock")
+    thread = threading.Thread(target=capsula_daemon.serve_forever, daemon=True)
+    thread.start()
+    while not capsula_daemon.socket_path.exists():
+        pass
+    yield capsula_daemon
+    capsula_daemon.shutdown()
+    thread.join()
+    shutil.rmtree(socket_dir)
+
+
+def test_daemon(daemon: CapsulaDaemon, tmp_path: Path) -> None:
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    env = {**os.environ, "GREETING": "hello"}
+    responses = [
+        _client.request(daemon.socket_path, ["sh", "-c", 'echo "$GREETING $0" && pwd', str(i)], cwd=work_dir, env=env)
+        for i in range(2)
+    ]
+
+    assert [response["returncode"] for response in responses] == [0, 0]
+    assert responses[0]["stdout"] == f"hello 0\n{work_dir}\n"
+    run_dirs = [Path(response["run_dir"]) for response in responses]
+    assert run_dirs[0] != run_dirs[1]
+
+    reports = [capsula.load_report(run_dir) for run_dir in run_dirs]
+    # The platform context is shared, while the working directory is captured for each request
+    assert reports[0]["shared_pre_run"] == reports[1]["shared_pre_run"]
+    assert "cwd" not in capsula.load_report(reports[0]["shared_pre_run"]["run_dir"])
+    assert reports[0]["cwd"] == str(work_dir)
+    assert all(capsula.is_run_complete(run_dir) for run_dir in run_dirs)
+    assert Path.cwd() != work_dir
+
+
+def test_daemon_error(daemon: CapsulaDaemon, tmp_path: Path) -> None:
+    response = _client.request(daemon.socket_path, ["capsula-no-such-command"], cwd=tmp_path, env=os.environ)
+    assert "capsula-no-such-command" in response["error"]
+
+
+def test_client_main(daemon: CapsulaDaemon, capsys: pytest.CaptureFixture[str]) -> None:
+    assert _client.main(["--socket", str(daemon.socket_path), "--", "sh", "-c", "echo out; exit 3"]) == 3
+    assert capsys.readouterr().out == "out\n"
+
+
+def test_client_as_script(daemon: CapsulaDaemon) -> None:
+    # The directory of the script comes first in `sys.path`, so its modules must not shadow the standard library
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, _client.__file__, "--socket", str(daemon.socket_path), "--", "echo", "hello"],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "hello\n"
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+import capsula
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+pa = pytest.importorskip("pyarrow")
+ds = pytest.importorskip("pyarrow.dataset")
+
+
+def _make_runs(vault_dir: Path, values: list[object]) -> None:
+    @capsula.run(ignore_config=True, vault_dir=vault_dir)
+    @capsula.context(capsula.EnvVarContext("HOME"), mode="pre")
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="all")
+    def f(value: object) -> None:
+        capsula.record(("metrics", "value"), value)
+        capsula.record("history", [1, 2, 3])
+
+    for value in values:
+        f(value)
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_export_runs(tmp_path: Path, export_format: str) -> None:
+    vault_dir = tmp_path / "vault"
+    # The integer column is promoted to float when a float appears in a later batch
+    _make_runs(vault_dir, [1, 2, 3.5])
+
+    output_dir = tmp_path / "dataset"
+    n_runs = capsula.export_runs(
+        vault_dir,
+        output_dir,
+        format=export_format,  # type: ignore[arg-type]
+        batch_size=2,
+        max_workers=1,
+    )
+    assert n_runs == 3
+    assert len(list(output_dir.glob(f"part-*.{export_format}"))) == 2
+
+    schema = pa.unify_schemas(
+        [ds.dataset(path, format=export_format).schema for path in output_dir.glob("part-*")],
+        promote_options="permissive",
+    )
+    table = ds.dataset(output_dir, format=export_format, schema=schema).to_table()
+    assert table.num_rows == 3
+    assert table.schema.field("in.metrics.value").type == pa.float64()
+    assert sorted(table.column("in.metrics.value").to_pylist()) == [1.0, 2.0, 3.5]
+    assert table.column("in.history").to_pylist() == ["[1,2,3]"] * 3
+    assert "pre.env.HOME" in table.column_names
+    assert "post.env.HOME" not in table.column_names
+
+
+def test_export_conflicting_types_and_processes(tmp_path: Path) -> None:
+    vault_dir = tmp_path / "vault"
+    _make_runs(vault_dir, [1, "one"])
+
+    output_dir = tmp_path / "dataset"
+    assert capsula.export_runs(vault_dir, output_dir, phases=("in",), max_workers=2) == 2
+    table = ds.dataset(output_dir, format="parquet").to_table()
+    # The type of the column is fixed by the first run, and the value of the other run is stored as null
+    assert table.column("in.metrics.value").null_count == 1
+
+
+def test_export_to_non_empty_directory(tmp_path: Path) -> None:
+    (tmp_path / "file").touch()
+    with pytest.raises(FileExistsError, match="is not empty"):
+        capsula.export_runs(tmp_path / "vault", tmp_path)
+
+
+def test_export_skips_shared_pre_run(tmp_path: Path) -> None:
+    vault_dir = tmp_path / "vault"
+    with capsula.session() as s:
+        _make_runs(vault_dir, [1, 2])
+
+    output_dir = tmp_path / "dataset"
+    assert capsula.export_runs(vault_dir, output_dir, phases=("pre", "in"), max_workers=1) == 2
+    table = ds.dataset(output_dir, format="parquet").to_table()
+    assert sorted(table.column("run_dir").to_pylist()) == sorted(map(str, s.run_dirs))
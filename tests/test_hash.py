@@ -1,9 +1,13 @@
+import hashlib
 import tempfile
 from pathlib import Path
 
 import pytest
 
+import capsula
 from capsula._backport import file_digest
+from capsula._exceptions import CapsulaConfigurationError
+from capsula._hash import compute_file_hash
 
 # Hashes of "Hello world!" for various algorithms
 _HELLO_WORLD_HASH = {
@@ -37,3 +41,44 @@ def test_compute_hash(algorithm: str) -> None:
         with tmpfile_path.open("rb") as f:
             digest = file_digest(f, algorithm).hexdigest()
         assert digest == _HELLO_WORLD_HASH[algorithm]
+
+
+def test_chunked_file_hash(tmp_path: Path) -> None:
+    data = bytes(range(256)) * 1000
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    chunk_size = 10_000
+
+    chunk_digests = b"".join(
+        hashlib.sha256(data[offset : offset + chunk_size]).digest() for offset in range(0, len(data), chunk_size)
+    )
+    hash_data = compute_file_hash(path, "sha256", chunk_size=chunk_size, max_workers=4)
+    assert hash_data == {
+        "algorithm": "sha256",
+        "digest": hashlib.sha256(chunk_digests).hexdigest(),
+        "chunk_size": chunk_size,
+    }
+    assert compute_file_hash(path, "sha256", chunk_size=chunk_size, max_workers=1) == hash_data
+    assert compute_file_hash(path, "sha256") == {"algorithm": "sha256", "digest": hashlib.sha256(data).hexdigest()}
+
+
+def test_xxhash_file_hash(tmp_path: Path) -> None:
+    xxhash = pytest.importorskip("xxhash")
+    path = tmp_path / "test.txt"
+    path.write_bytes(b"Hello world!")
+    assert compute_file_hash(path, "xxh3_128")["digest"] == xxhash.xxh3_128(b"Hello world!").hexdigest()
+
+
+def test_blake3_file_hash(tmp_path: Path) -> None:
+    blake3 = pytest.importorskip("blake3")
+    path = tmp_path / "test.txt"
+    path.write_bytes(b"Hello world!" * 100_000)
+    assert compute_file_hash(path, "blake3") == {
+        "algorithm": "blake3",
+        "digest": blake3.blake3(b"Hello world!" * 100_000).hexdigest(),
+    }
+
+
+def test_unsupported_hash_algorithm() -> None:
+    with pytest.raises(CapsulaConfigurationError, match="Unsupported hash algorithm"):
+        capsula.FileContext.builder("missing.txt", hash_algorithm="no-such-algorithm")
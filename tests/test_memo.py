@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import capsula
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+def test_memoize(tmp_path: Path) -> None:
+    calls: list[int] = []
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("1")
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault", memoize=True)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="in")
+    @capsula.context(capsula.FileContext.builder(input_file), mode="pre")
+    @capsula.context(capsula.FunctionContext.builder(ignore=("verbose",)), mode="pre")
+    def f(x: int, *, verbose: bool = False) -> dict[str, int]:  # noqa: ARG001
+        calls.append(x)
+        return {"x": x, "input": int(input_file.read_text())}
+
+    assert f(1) == {"x": 1, "input": 1}
+    # Ignored arguments are not part of the key
+    assert f(1, verbose=True) == {"x": 1, "input": 1}
+    assert calls == [1]
+    assert f(2) == {"x": 2, "input": 1}
+    assert calls == [1, 2]
+
+    input_file.write_text("2")
+    assert f(1) == {"x": 1, "input": 2}
+    assert calls == [1, 2, 1]
+
+    run_dirs = list(capsula.iter_run_dirs(tmp_path / "vault"))
+    assert len(run_dirs) == 4
+    hits = [report["memoized"]["hit"] for report in (capsula.load_report(run_dir, phase="in") for run_dir in run_dirs)]
+    assert sorted(hits) == [False, False, False, True]
+
+
+def test_memoize_custom_serializer(tmp_path: Path) -> None:
+    class TextSerializer:
+        suffix = ".txt"
+
+        def dump(self, result: str, path: Path) -> None:
+            path.write_text(result)
+
+        def load(self, path: Path) -> str:
+            return path.read_text()
+
+    calls = 0
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, memoize=True, memoize_serializer=TextSerializer())
+    def f(name: str) -> str:
+        nonlocal calls
+        calls += 1
+        return f"Hello, {name}!"
+
+    assert f("world") == f("world") == "Hello, world!"
+    assert calls == 1
+    assert len(list(tmp_path.glob("*/memoized-result.txt"))) == 1
+
+
+class _Data:
+    def __init__(self, values: list[int]) -> None:
+        self.values = values
+
+    def __repr__(self) -> str:
+        return f"_Data(n={len(self.values)})"
+
+
+def test_memoize_unserializable_arguments(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, memoize=True)
+    def total(data: _Data) -> int:
+        return sum(data.values)
+
+    # The arguments have the same `repr` but different values
+    assert total(_Data([1, 2, 3])) == 6
+    assert total(_Data([100, 200, 300])) == 600
+    assert "will not be memoized" in caplog.text
+    assert not (tmp_path / ".cache" / "memo").exists()
+
+
+def test_memoize_in_session(tmp_path: Path) -> None:
+    calls: list[str] = []
+    input_file = tmp_path / "input.txt"
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault", memoize=True)
+    @capsula.context(capsula.FileContext.builder(input_file), mode="pre")
+    def f() -> str:
+        calls.append(input_file.read_text())
+        return calls[-1]
+
+    with capsula.session():
+        input_file.write_text("1")
+        assert f() == "1"
+        assert f() == "1"
+        # The changed input file is a cache miss
+        input_file.write_text("2")
+        assert f() == "2"
+    assert calls == ["1", "2"]
+
+
+def test_memoize_with_shared_pre_run(tmp_path: Path) -> None:
+    calls: list[str] = []
+    input_file = tmp_path / "input.txt"
+    input_file.write_text("1")
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault", memoize=True)
+    @capsula.context(capsula.FileContext.builder(input_file), mode="pre")
+    def f() -> str:
+        calls.append(input_file.read_text())
+        return calls[-1]
+
+    # The shared pre-run capsule, as in a sweep, contains the hash of the original input file
+    shared = f.shared_pre_run()
+    assert f.call_with_shared_pre_run(shared) == "1"
+    input_file.write_text("2")
+    assert f.call_with_shared_pre_run(shared) == "2"
+    assert calls == ["1", "2"]
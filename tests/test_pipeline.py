@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import orjson
+import pytest
+
+import capsula
+from capsula._pipeline import PIPELINE_FILE_NAME
+
+
+@capsula.run(ignore_config=True)
+def double(src: str, dst: str) -> None:
+    value = int(Path(src).read_text())
+    Path(dst).write_text(str(value * 2))
+
+
+def _make_stages(tmp_path: Path, calls: list[str]) -> list[capsula.Stage]:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault")
+    def preprocess() -> None:
+        calls.append("preprocess")
+        (tmp_path / "processed").mkdir(exist_ok=True)
+        (tmp_path / "processed" / "data.txt").write_text((tmp_path / "raw.txt").read_text().upper())
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault")
+    def train(suffix: str) -> None:
+        calls.append("train")
+        (tmp_path / "model.txt").write_text((tmp_path / "processed" / "data.txt").read_text() + suffix)
+
+    return [
+        capsula.Stage(train, inputs=["processed/data.txt"], outputs=["model.txt"], kwargs={"suffix": "!"}),
+        capsula.Stage(preprocess, inputs=["raw.txt"], outputs=["processed"]),
+    ]
+
+
+def test_run_pipeline(tmp_path: Path) -> None:
+    (tmp_path / "raw.txt").write_text("abc")
+    calls: list[str] = []
+    results = capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+
+    assert calls == ["preprocess", "train"]
+    assert (tmp_path / "model.txt").read_text() == "ABC!"
+    assert not any(result.skipped for result in results.values())
+
+    train_dir = results["train"].run_dir
+    assert train_dir is not None
+    link = orjson.loads((train_dir / PIPELINE_FILE_NAME).read_bytes())
+    assert link["stage"] == "train"
+    assert link["upstream"] == {"preprocess": str(results["preprocess"].run_dir)}
+
+
+def test_run_pipeline_skips_up_to_date_stages(tmp_path: Path) -> None:
+    (tmp_path / "raw.txt").write_text("abc")
+    calls: list[str] = []
+    first = capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+    second = capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+
+    assert calls == ["preprocess", "train"]
+    assert all(result.skipped for result in second.values())
+    assert second["train"].run_dir == first["train"].run_dir
+
+
+def test_run_pipeline_reruns_changed_stages(tmp_path: Path) -> None:
+    (tmp_path / "raw.txt").write_text("abc")
+    calls: list[str] = []
+    capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+
+    # A modified output makes the stage out of date
+    (tmp_path / "model.txt").write_text("tampered")
+    capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+    assert calls == ["preprocess", "train", "train"]
+
+    (tmp_path / "raw.txt").write_text("xyz")
+    capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+    assert calls == ["preprocess", "train", "train", "preprocess", "train"]
+    assert (tmp_path / "model.txt").read_text() == "XYZ!"
+
+
+def test_run_pipeline_failed_upstream(tmp_path: Path) -> None:
+    # Reading a directory as a text file fails
+    (tmp_path / "raw.txt").mkdir()
+    calls: list[str] = []
+    results = capsula.run_pipeline(_make_stages(tmp_path, calls), root=tmp_path, max_workers=1)
+
+    assert calls == ["preprocess"]
+    assert isinstance(results["preprocess"].exception, IsADirectoryError)
+    assert isinstance(results["train"].exception, capsula.CapsulaError)
+    assert results["train"].run_dir is None
+
+
+def test_run_pipeline_cycle(tmp_path: Path) -> None:
+    stages = [
+        capsula.Stage(double, inputs=["a"], outputs=["b"], name="ab"),
+        capsula.Stage(double, inputs=["b"], outputs=["a"], name="ba"),
+    ]
+    with pytest.raises(capsula.CapsulaConfigurationError, match="cyclic"):
+        capsula.run_pipeline(stages, root=tmp_path)
+
+
+class _Threshold:
+    def __init__(self, value: float) -> None:
+        self.value = value
+
+
+def test_run_pipeline_unserializable_kwargs(tmp_path: Path) -> None:
+    # Keying the stage by `repr` would skip it even though the value has changed
+    stages = [capsula.Stage(double, outputs=["b"], kwargs={"threshold": _Threshold(0.5)})]
+    with pytest.raises(capsula.CapsulaConfigurationError, match="Keyword arguments of stage double"):
+        capsula.run_pipeline(stages, root=tmp_path)
+
+
+def test_run_pipeline_in_process_pool(tmp_path: Path) -> None:
+    (tmp_path / "x.txt").write_text("1")
+    (tmp_path / "y.txt").write_text("10")
+    stages = [
+        capsula.Stage(
+            double,
+            inputs=[name],
+            outputs=[f"2{name}"],
+            kwargs={"src": str(tmp_path / name), "dst": str(tmp_path / f"2{name}")},
+            name=f"double_{name}",
+        )
+        for name in ("x.txt", "y.txt")
+    ]
+    results = capsula.run_pipeline(stages, root=tmp_path, max_workers=2)
+
+    assert (tmp_path / "2x.txt").read_text() == "2"
+    assert (tmp_path / "2y.txt").read_text() == "20"
+    assert all(result.run_dir is not None and result.run_dir.is_dir() for result in results.values())
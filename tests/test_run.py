@@ -1,6 +1,16 @@
 import logging
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
 
 import capsula
+from capsula import _run
+from capsula._capsule import LazyCapsule
+from capsula._run import generate_run_id
 
 logger = logging.getLogger(__name__)
 
@@ -12,3 +22,127 @@ def test_default_run_dir() -> None:
         return x + y
 
     f(1, 2)
+
+
+def test_run_name_collision_retries(tmp_path: Path) -> None:
+    run_names = iter(["collided", "fresh"])
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, run_name_factory=lambda _info, _s, _t: next(run_names))
+    def f() -> str:
+        return capsula.current_run_name()
+
+    (tmp_path / "collided").mkdir()
+    assert f() == "fresh"
+
+
+def test_run_name_collision_fixed_name_aborts(tmp_path: Path) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, run_name_factory=lambda _info, _s, _t: "fixed")
+    def f() -> None:
+        pass
+
+    (tmp_path / "fixed").mkdir()
+    with pytest.raises(FileExistsError):
+        f()
+
+
+def test_generate_run_id_is_sortable() -> None:
+    timestamps = [datetime(2026, 10, 17, 0, 0, 0, microsecond, tzinfo=timezone.utc) for microsecond in (0, 1000, 2000)]
+    run_ids = [generate_run_id(timestamp) for timestamp in timestamps]
+    assert all(len(run_id) == 26 for run_id in run_ids)
+    assert run_ids == sorted(run_ids)
+    assert len({generate_run_id(timestamps[0]) for _ in range(1000)}) == 1000
+
+
+@capsula.run(ignore_config=True)
+def add(x: int, y: int) -> tuple[int, Path]:
+    return x + y, capsula.Run.get_current().run_dir
+
+
+def test_run_pickle_by_reference() -> None:
+    assert pickle.loads(pickle.dumps(add)) is add  # noqa: S301
+
+
+def test_run_in_process_pool() -> None:
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(add, [1, 2], [10, 20]))
+    assert [result for result, _ in results] == [11, 22]
+    assert all(run_dir.is_dir() for _, run_dir in results)
+
+
+def test_local_run_cannot_be_pickled() -> None:
+    @capsula.run(ignore_config=True)
+    def f() -> None:
+        pass
+
+    with pytest.raises(TypeError, match="not defined at the top level"):
+        pickle.dumps(f)
+
+
+class _BlockingContext(capsula.ContextBase):
+    """Side-effect-free context that blocks until the function has started."""
+
+    def __init__(self, started: threading.Event) -> None:
+        self._started = started
+
+    @property
+    def side_effect_free(self) -> bool:
+        return True
+
+    def encapsulate(self) -> bool:
+        return self._started.wait(timeout=10)
+
+    def default_key(self) -> str:
+        return "blocking"
+
+
+def test_overlap_pre_run(tmp_path: Path) -> None:
+    started = threading.Event()
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, overlap_pre_run=True)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="pre")
+    @capsula.context(_BlockingContext(started), mode="pre")
+    @capsula.context(capsula.EnvVarContext("HOME"), mode="pre")
+    def f() -> Path:
+        started.set()
+        return capsula.Run.get_current().run_dir
+
+    run_dir = f()
+    report = capsula.load_report(run_dir)
+    # The context would have timed out if it had been encapsulated before the function
+    assert report["blocking"] is True
+    assert list(report) == ["blocking", "env"]
+
+
+def test_overlap_pre_run_passes_lazy_capsule(tmp_path: Path) -> None:
+    started = threading.Event()
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, overlap_pre_run=True)
+    @capsula.context(_BlockingContext(started), mode="pre")
+    @capsula.pass_pre_run_capsule
+    def f(pre_run_capsule: capsula.Capsule) -> bool:
+        assert isinstance(pre_run_capsule, LazyCapsule)
+        started.set()
+        return pre_run_capsule.data["blocking"]  # type: ignore[no-any-return]
+
+    assert f() is True
+
+
+def test_overlap_pre_run_failure_runs_post_run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def failing_encapsulate_context(context: capsula.ContextBase) -> capsula.Capsule:  # noqa: ARG001
+        msg = "background encapsulation failed"
+        raise RuntimeError(msg)
+
+    monkeypatch.setattr(_run, "_encapsulate_context", failing_encapsulate_context)
+    run_dirs: list[Path] = []
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, overlap_pre_run=True)
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="post")
+    @capsula.context(capsula.EnvVarContext("HOME"), mode="post")
+    @capsula.context(capsula.PlatformContext(), mode="pre")
+    def f() -> None:
+        run_dirs.append(capsula.Run.get_current().run_dir)
+
+    with pytest.raises(RuntimeError, match="background encapsulation failed"):
+        f()
+    assert capsula.is_run_complete(run_dirs[0])
+    assert "HOME" in capsula.load_report(run_dirs[0], phase="post")["env"]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import orjson
+
+import capsula
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+def test_session(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    n_built: list[str] = []
+    original_init = capsula.PlatformContext.__init__
+
+    def counting_init(self: capsula.PlatformContext) -> None:
+        n_built.append("platform")
+        original_init(self)
+
+    monkeypatch.setattr(capsula.PlatformContext, "__init__", counting_init)
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault")
+    @capsula.context(lambda _params: capsula.PlatformContext(), mode="pre")
+    @capsula.context(capsula.FunctionContext.builder(), mode="pre")
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="pre")
+    def f(x: int) -> Path:  # noqa: ARG001
+        return capsula.Run.get_current().run_dir
+
+    with capsula.session() as s:
+        run_dirs = [f(x) for x in range(3)]
+
+    assert n_built == ["platform"]
+    assert s.run_dirs == run_dirs
+    assert len(s.session_dirs) == 1
+
+    shared_report = orjson.loads((s.session_dirs[0] / "pre-run-report.json").read_bytes())
+    assert "function" not in shared_report
+    for x, run_dir in enumerate(run_dirs):
+        report = orjson.loads((run_dir / "pre-run-report.json").read_bytes())
+        assert report["function"]["f"]["bound_args"] == {"x": x}
+        assert report["platform"] == shared_report["platform"]
+        assert report["shared_pre_run"]["run_dir"] == str(s.session_dirs[0])
+
+    # Outside the session, the contexts are encapsulated for each call
+    report = orjson.loads((f(3) / "pre-run-report.json").read_bytes())
+    assert "shared_pre_run" not in report
+    assert n_built == ["platform", "platform"]
+
+
+def test_nested_session_is_independent(tmp_path: Path) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault")
+    @capsula.context(capsula.CpuContext(), mode="pre")
+    def f() -> None:
+        pass
+
+    with capsula.session() as outer:
+        f()
+        with capsula.session() as inner:
+            f()
+        f()
+
+    assert len(outer.run_dirs) == 2
+    assert len(inner.run_dirs) == 1
+    assert set(outer.session_dirs).isdisjoint(inner.session_dirs)
+    assert capsula.Session.get_current() is None
+
+
+def test_session_recaptures_changing_contexts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    input_file = tmp_path / "input.txt"
+
+    @capsula.run(ignore_config=True, vault_dir=tmp_path / "vault")
+    @capsula.context(capsula.EnvVarContext("CAPSULA_TEST_VALUE"), mode="pre")
+    @capsula.context(capsula.FileContext(input_file, compute_hash=True), mode="pre")
+    @capsula.context(capsula.PlatformContext(), mode="pre")
+    @capsula.reporter(capsula.JsonDumpReporter.builder(), mode="pre")
+    def f() -> Path:
+        return capsula.Run.get_current().run_dir
+
+    with capsula.session() as s:
+        run_dirs = []
+        for value in ("a", "b"):
+            input_file.write_text(value)
+            monkeypatch.setenv("CAPSULA_TEST_VALUE", value)
+            run_dirs.append(f())
+
+    shared_report = orjson.loads((s.session_dirs[0] / "pre-run-report.json").read_bytes())
+    assert list(shared_report) == ["platform"]
+    reports = [orjson.loads((run_dir / "pre-run-report.json").read_bytes()) for run_dir in run_dirs]
+    assert [report["env"]["CAPSULA_TEST_VALUE"] for report in reports] == ["a", "b"]
+    hashes = [report["file"][str(input_file)]["hash"]["digest"] for report in reports]
+    assert hashes[0] != hashes[1]
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import orjson
+
+import capsula
+
+
+@capsula.run(ignore_config=True)
+@capsula.context(capsula.PlatformContext(), mode="pre")
+@capsula.context(capsula.FunctionContext.builder(), mode="pre")
+@capsula.reporter(capsula.JsonDumpReporter.builder(), mode="all")
+def add(x: int, y: int) -> int:
+    if x < 0:
+        msg = "x must be non-negative"
+        raise ValueError(msg)
+    capsula.record("sum", x + y)
+    return x + y
+
+
+def test_grid_points() -> None:
+    assert capsula.grid_points(x=[0, 1], y=["a"]) == [{"x": 0, "y": "a"}, {"x": 1, "y": "a"}]
+
+
+def test_random_points_is_reproducible() -> None:
+    points = capsula.random_points(5, seed=0, x=[0, 1, 2], y=lambda rng: rng.random())
+    assert points == capsula.random_points(5, seed=0, x=[0, 1, 2], y=lambda rng: rng.random())
+    assert all(point["x"] in {0, 1, 2} for point in points)
+
+
+def test_sweep() -> None:
+    results = capsula.sweep(add, capsula.grid_points(x=[-1, 1, 2], y=[10]), max_workers=2)
+    assert [r.result for r in results] == [None, 11, 12]
+    assert isinstance(results[0].exception, ValueError)
+
+    run_dirs = [r.run_dir for r in results]
+    assert all(run_dir is not None for run_dir in run_dirs)
+    assert len(set(run_dirs)) == 3
+
+    for result in results[1:]:
+        assert result.run_dir is not None
+        pre_run_report = orjson.loads((result.run_dir / "pre-run-report.json").read_bytes())
+        assert pre_run_report["function"]["add"]["bound_args"] == result.params
+        shared_run_dir = pre_run_report["shared_pre_run"]["run_dir"]
+        shared_report = orjson.loads((Path(shared_run_dir) / "pre-run-report.json").read_bytes())
+        assert "function" not in shared_report
+        assert pre_run_report["platform"] == shared_report["platform"]
+        in_run_report = orjson.loads((result.run_dir / "in-run-report.json").read_bytes())
+        assert in_run_report["sum"] == result.result
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
+import errno
+import os
+import sys
 from typing import TYPE_CHECKING, Any
 
 import pytest
 
-from capsula._utils import ExceptionInfo, search_for_project_root, to_flat_dict, to_nested_dict
+import capsula
+from capsula._copy import copy_file
+from capsula._utils import (
+    ExceptionInfo,
+    atomic_copy_file,
+    atomic_write_bytes,
+    search_for_project_root,
+    to_flat_dict,
+    to_nested_dict,
+)
 
 if TYPE_CHECKING:
     from collections.abc import Hashable, Mapping, Sequence
@@ -67,6 +79,11 @@ def test_flat_dict_various(input_dict: Mapping[Hashable, Any], expected_output:
         ({("a",): 1}, {"a": 1}),
         # Test for empty dictionary
         ({}, {}),
+        # Test for siblings sharing a prefix of more than one key
+        (
+            {("a", "b", "c"): 1, ("a", "b", "d"): 2, ("a", "e"): 3},
+            {"a": {"b": {"c": 1, "d": 2}, "e": 3}},
+        ),
     ],
 )
 def test_to_nested_dict(flat_dict: Mapping[Sequence[Hashable], Any], expected_nested_dict: dict[Hashable, Any]) -> None:
@@ -82,6 +99,9 @@ def test_to_nested_dict(flat_dict: Mapping[Sequence[Hashable], Any], expected_ne
         {("a",): 1, ("a", "b"): 2},
         # Test for conflicting nested and flat keys
         {("a", "b"): 2, ("a",): 1},
+        # Test for key conflicts below the top level
+        {("a", "b"): 1, ("a", "b", "c"): 2},
+        {("a", "b", "c"): 1, ("a", "b"): 2},
     ],
 )
 def test_to_nested_dict_conflicts(
@@ -91,6 +111,19 @@ def test_to_nested_dict_conflicts(
         to_nested_dict(flat_dict)
 
 
+def test_to_nested_dict_does_not_modify_values() -> None:
+    value = {"x": 1}
+    assert to_nested_dict({("a",): value, ("a", "y"): 2}) == {"a": {"x": 1, "y": 2}}
+    assert value == {"x": 1}
+
+
+def test_to_nested_dict_round_trip_deep_keys() -> None:
+    flat_dict: dict[Sequence[Hashable], Any] = {
+        (*(f"k{i % 7}_{j}" for j in range(i % 5 + 1)), f"leaf{i}"): i for i in range(2_000)
+    }
+    assert to_flat_dict(to_nested_dict(flat_dict)) == flat_dict
+
+
 def test_search_for_project_root_found(tmp_path: Path) -> None:
     # Create a temporary directory simulating a project root
     project_root = tmp_path
@@ -120,3 +153,65 @@ def test_search_for_project_root_not_found(tmp_path: Path) -> None:
     # Test that searching in a directory structure without pyproject.toml raises FileNotFoundError
     with pytest.raises(FileNotFoundError, match="Project root not found."):
         search_for_project_root(start_dir)
+
+
+@pytest.mark.parametrize("fsync", [False, True])
+def test_atomic_write_bytes(tmp_path: Path, fsync: bool) -> None:  # noqa: FBT001
+    path = tmp_path / "report.json"
+    atomic_write_bytes(path, b"old", fsync=fsync)
+    atomic_write_bytes(path, b"new", fsync=fsync)
+    assert path.read_bytes() == b"new"
+    # No temporary files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["SHA256SUMS", "report.json"]
+    assert capsula.verify_digests(tmp_path) == []
+
+
+def test_atomic_write_bytes_failure_keeps_old_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "report.json"
+    atomic_write_bytes(path, b"old")
+
+    def fail_replace(_self: Path, _target: Path) -> None:
+        raise OSError
+
+    monkeypatch.setattr(type(path), "replace", fail_replace)
+    with pytest.raises(OSError):  # noqa: PT011
+        atomic_write_bytes(path, b"new")
+    monkeypatch.undo()
+    assert path.read_bytes() == b"old"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["SHA256SUMS", "report.json"]
+
+
+def test_verify_digests_detects_partial_file(tmp_path: Path) -> None:
+    src = tmp_path / "src.txt"
+    src.write_text("content")
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    atomic_copy_file(src, run_dir / "copy.txt")
+    atomic_write_bytes(run_dir / "report.json", b"{}")
+    assert capsula.verify_digests(run_dir) == []
+
+    (run_dir / "copy.txt").write_text("cont")
+    (run_dir / "report.json").unlink()
+    assert sorted(capsula.verify_digests(run_dir)) == [run_dir / "copy.txt", run_dir / "report.json"]
+
+
+@pytest.mark.parametrize("size", [0, 1, 3 * 2**20 + 1])
+def test_copy_file(tmp_path: Path, size: int) -> None:
+    data = bytes(i % 251 for i in range(size))
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    copy_file(src, tmp_path / "dst.bin")
+    assert (tmp_path / "dst.bin").read_bytes() == data
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Kernel-side copying is used only on Linux")
+def test_copy_file_falls_back(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def unsupported(*_args: Any) -> int:
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported)
+    monkeypatch.setattr(os, "sendfile", unsupported)
+    src = tmp_path / "src.bin"
+    src.write_bytes(b"content" * 1000)
+    copy_file(src, tmp_path / "dst.bin")
+    assert (tmp_path / "dst.bin").read_bytes() == b"content" * 1000
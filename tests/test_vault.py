@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import pytest
+
+import capsula
+from capsula._exceptions import CapsulaConfigurationError
+from capsula._run import RunDtoCommand, default_run_name_factory
+from capsula._vault import get_run_dir, record_vault_layout
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from capsula._vault import VaultLayout
+
+_TIMESTAMP = datetime(2026, 10, 17, 12, 0, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("layout", ["flat", "date", "hash"])
+def test_find_run_dir(tmp_path: Path, layout: VaultLayout) -> None:
+    record_vault_layout(tmp_path, layout)
+    run_dir = get_run_dir(tmp_path, "my_run", layout=layout, timestamp=_TIMESTAMP)
+    run_dir.mkdir(parents=True)
+    assert run_dir.name == "my_run"
+    assert capsula.find_run_dir(tmp_path, "my_run") == run_dir
+
+
+def test_date_layout(tmp_path: Path) -> None:
+    run_dir = get_run_dir(tmp_path, "my_run", layout="date", timestamp=_TIMESTAMP)
+    local_timestamp = _TIMESTAMP.astimezone()
+    assert run_dir == tmp_path / local_timestamp.strftime("%Y/%m/%d") / "my_run"
+
+
+def test_find_run_dir_not_found(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError, match="Run missing not found"):
+        capsula.find_run_dir(tmp_path, "missing")
+
+
+def test_iter_run_dirs_mixed_layouts(tmp_path: Path) -> None:
+    (tmp_path / ".gitignore").write_text("*\n")
+    expected = set()
+    for layout, name in (("flat", "run_a"), ("date", "run_b"), ("hash", "run_c"), ("hash", "run_d")):
+        record_vault_layout(tmp_path, layout)  # type: ignore[arg-type]
+        run_dir = get_run_dir(tmp_path, name, layout=layout, timestamp=_TIMESTAMP)  # type: ignore[arg-type]
+        run_dir.mkdir(parents=True)
+        expected.add(run_dir)
+    assert set(capsula.iter_run_dirs(tmp_path)) == expected
+
+
+def test_flat_runs_named_like_shards(tmp_path: Path) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, run_name_factory=lambda _info, _random, _timestamp: name)
+    def f() -> None:
+        pass
+
+    run_dirs = []
+    for name in ("2024", "ab"):
+        f()
+        run_dirs.append(tmp_path / name)
+    # Without a sharded layout in the vault, they are runs rather than shards
+    assert sorted(capsula.iter_run_dirs(tmp_path)) == run_dirs
+    assert capsula.find_run_dir(tmp_path, "ab") == tmp_path / "ab"
+
+
+def test_invalid_vault_layout() -> None:
+    with pytest.raises(CapsulaConfigurationError, match="vault-layout must be one of"):
+        capsula.run(vault_layout="hashed")  # type: ignore[arg-type]
+
+
+def test_run_with_sharded_layout(tmp_path: Path) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path, vault_layout="hash")
+    def f() -> str:
+        return capsula.current_run_name()
+
+    run_name = f()
+    run_dir = capsula.find_run_dir(tmp_path, run_name)
+    assert run_dir.parent.parent == tmp_path
+    assert list(capsula.iter_run_dirs(tmp_path)) == [run_dir]
+
+
+def test_is_run_complete(tmp_path: Path) -> None:
+    @capsula.run(ignore_config=True, vault_dir=tmp_path)
+    def f() -> Path:
+        run_dir = capsula.Run.get_current().run_dir
+        assert not capsula.is_run_complete(run_dir)
+        return run_dir
+
+    assert capsula.is_run_complete(f())
+
+
+def test_exec_command_without_post_run(tmp_path: Path) -> None:
+    run_dto = RunDtoCommand(run_name_factory=default_run_name_factory, vault_dir=tmp_path, command=("true",))
+    run: capsula.Run[[], None] = capsula.Run(run_dto)
+    result, params = run.exec_command(post_run=False)
+    assert result.returncode == 0
+    assert not capsula.is_run_complete(params.run_dir)
+
+    run.post_run(params)
+    assert capsula.is_run_complete(params.run_dir)
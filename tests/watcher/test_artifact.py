@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+import capsula
+from capsula._hash import compute_file_hash
+from capsula._watcher import _artifact
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from capsula._hash import HashData
+
+
+def test_artifact_watcher(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    hashed_paths: list[Path] = []
+
+    def counting_compute_file_hash(path: Path, *args: object, **kwargs: object) -> HashData:
+        hashed_paths.append(path)
+        return compute_file_hash(path, *args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(_artifact, "compute_file_hash", counting_compute_file_hash)
+
+    output_dir = tmp_path / "outputs"
+    watcher = capsula.ArtifactWatcher(output_dir, interval=0.05)
+    with watcher.watch():
+        output_dir.mkdir()
+        (output_dir / "sub").mkdir()
+        (output_dir / "sub" / "early.txt").write_text("early")
+        (output_dir / "removed.txt").write_text("removed")
+        time.sleep(0.5)
+        # The early file has been hashed in the background
+        assert hashed_paths.count(output_dir / "sub" / "early.txt") == 1
+        (output_dir / "removed.txt").unlink()
+        (output_dir / "late.txt").write_text("late")
+
+    assert hashed_paths.count(output_dir / "sub" / "early.txt") == 1
+    assert hashed_paths.count(output_dir / "late.txt") == 1
+    data = watcher.encapsulate()
+    assert data["path"] == output_dir
+    assert data["files"] == {
+        "late.txt": {"size": 4, "hash": {"algorithm": "sha256", "digest": hashlib.sha256(b"late").hexdigest()}},
+        "sub/early.txt": {"size": 5, "hash": {"algorithm": "sha256", "digest": hashlib.sha256(b"early").hexdigest()}},
+    }
+    assert watcher.default_key() == ("artifacts", str(output_dir))
+
+
+def test_artifact_watcher_records_errors(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def failing_compute_file_hash(path: Path, *args: object, **kwargs: object) -> HashData:
+        if path.name == "locked.txt":
+            raise PermissionError(path)
+        return compute_file_hash(path, *args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(_artifact, "compute_file_hash", failing_compute_file_hash)
+
+    watcher = capsula.ArtifactWatcher(tmp_path, interval=0.05)
+    with watcher.watch():
+        (tmp_path / "locked.txt").write_text("locked")
+        time.sleep(0.3)
+        # The thread survives the error and keeps hashing the other files
+        (tmp_path / "ok.txt").write_text("ok")
+        time.sleep(0.3)
+        assert "ok.txt" in watcher.encapsulate()["files"]
+
+    data = watcher.encapsulate()
+    assert set(data["files"]) == {"ok.txt"}
+    assert set(data.get("fails", {})) == {"locked.txt"}
+    assert data["fails"]["locked.txt"].exc_type is PermissionError
+
+
+def test_artifact_watcher_does_not_hide_the_exception(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def failing_scan(self: capsula.ArtifactWatcher) -> dict[str, tuple[int, int]]:  # noqa: ARG001
+        msg = "scan failed"
+        raise RuntimeError(msg)
+
+    monkeypatch.setattr(capsula.ArtifactWatcher, "_scan", failing_scan)
+
+    watcher = capsula.ArtifactWatcher(tmp_path, interval=0.05)
+
+    def run() -> None:
+        with watcher.watch():
+            time.sleep(0.2)
+            msg = "from the function"
+            raise ValueError(msg)
+
+    with pytest.raises(ValueError, match="from the function"):
+        run()
+
+    data = watcher.encapsulate()
+    assert data["files"] == {}
+    assert data.get("fails", {})["."].exc_type is RuntimeError
+
+
+def test_artifact_watcher_encapsulate_while_polling(tmp_path: Path) -> None:
+    for i in range(200):
+        (tmp_path / f"{i}.txt").write_text(str(i))
+
+    watcher = capsula.ArtifactWatcher(tmp_path, interval=0.001)
+    with watcher.watch():
+        # Each snapshot is consistent while the polling thread adds the files to the catalog
+        sizes = [len(watcher.encapsulate()["files"]) for _ in range(2000)]
+    assert sizes == sorted(sizes)
+    assert len(watcher.encapsulate()["files"]) == 200